@@ -2,13 +2,15 @@ import os
 import re
 import json
 from google import genai
+from engines.agent_runtime import LogRelay, run
+from engines.request_scheduler import PRIORITY_INTERACTIVE, estimate_tokens, get_scheduler
 
 class FileBasedAgent:
     def __init__(self, client, model_id, docs=None, log_callback=None):
         self.client = client
         self.model_id = model_id
         self.docs = docs or {}
-        self.log_callback = log_callback
+        self.log_callback = LogRelay(log_callback) if log_callback else None
         self.token_usage = {'total': 0}
 
     def log(self, msg):
@@ -22,6 +24,13 @@ class FileBasedAgent:
         Executes File-Based Context retrieval.
         Returns: (response_text, token_stats)
         """
+        return run(
+            self.acompletion(user_query, chat_history=chat_history, verify_enabled=verify_enabled),
+            relay=self.log_callback,
+        )
+
+    async def acompletion(self, user_query, chat_history=None, verify_enabled=False):
+        """Coroutine form of completion()."""
         # Use all docs passed in directly (no summaries needed)
         available_docs = self.docs
         
@@ -58,8 +67,10 @@ class FileBasedAgent:
             Return ONLY the JSON list. If no specific document is needed, return all filenames.
             """
 
-            router_chat = self.client.chats.create(model=self.model_id)
-            router_response = router_chat.send_message(router_prompt)
+            router_chat = self.client.aio.chats.create(model=self.model_id)
+            async with get_scheduler().aslot(PRIORITY_INTERACTIVE, estimate_tokens(router_prompt), model=self.model_id) as slot:
+                router_response = await router_chat.send_message(router_prompt)
+                slot.record(getattr(router_response, "usage_metadata", None))
             
             if hasattr(router_response, "usage_metadata") and router_response.usage_metadata:
                 self.token_usage['total'] += router_response.usage_metadata.total_token_count or 0
@@ -94,7 +105,7 @@ class FileBasedAgent:
                     formatted_history.append({"role": role, "parts": [{"text": m["content"]}]})
 
         self.log("Generating answer...")
-        chat = self.client.chats.create(
+        chat = self.client.aio.chats.create(
             model=self.model_id,
             config=genai.types.GenerateContentConfig(
                 temperature=0,
@@ -102,7 +113,11 @@ class FileBasedAgent:
             ),
             history=formatted_history,
         )
-        response = chat.send_message(user_query)
+        history_text = [p["text"] for turn in formatted_history for p in turn["parts"]]
+        tokens = estimate_tokens(system_prompt_text, user_query, *history_text)
+        async with get_scheduler().aslot(PRIORITY_INTERACTIVE, tokens, model=self.model_id) as slot:
+            response = await chat.send_message(user_query)
+            slot.record(getattr(response, "usage_metadata", None))
         self.log("Answer received.")
 
         # Token usage
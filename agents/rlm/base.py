@@ -7,6 +7,14 @@ This module provides:
                                 variable.
   * execute_sandbox_code()   -- run Python code inside a restricted namespace
                                 and return a structured REPLResult dict.
+  * SnippetProfiler / RunProfile -- optional per-line timing, peak memory
+                                and llm_query accounting for REPL snippets
+                                (RLM_PROFILE_REPL).
+  * get_navigator(context)   -- a CorpusNavigator (file table, bounded
+                                line index, heading outline, inverted index)
+                                built once per corpus generation, whose
+                                list_files / read_file / search / outline
+                                methods are injected into the REPL.
 
 The shape of the result mirrors the reference RLM's REPLResult (stdout,
 stderr, execution_time) so the agent loop can truncate long outputs and
@@ -14,8 +22,15 @@ surface stderr cleanly.
 """
 
 import io
+import bisect
 import contextlib
+import hashlib
+import re
+import sys
+import threading
 import time
+import tracemalloc
+from collections import OrderedDict, defaultdict
 
 
 # ---------------------------------------------------------------------------
@@ -132,7 +147,405 @@ def build_corpus(docs):
     return "\n".join(parts)
 
 
-def execute_sandbox_code(code, repl_globals):
+# ---------------------------------------------------------------------------
+# Corpus navigation
+# ---------------------------------------------------------------------------
+
+_FILE_OPEN_REGEX = re.compile(r"^<file name='(.*)'>$")
+_FILE_CLOSE = "</file>"
+# A markdown heading marker, or a code fence (headings inside fences are code
+# comments). load_document() flattens newlines, so a heading usually sits
+# mid-line right after the previous paragraph rather than at a line start.
+_MARKER_REGEX = re.compile(r"```|(?<!\S)(#{1,6})[ \t]+(?=\S)")
+_WORD_REGEX = re.compile(r"\w+")
+
+# Longest navigator line, in characters. A corpus file is usually a single
+# physical line, so lines are cut at whitespace to this width and every
+# search hit / read_file range stays a bounded window.
+_LINE_CHARS = 200
+# Longest heading text returned by outline().
+_HEADING_CHARS = 80
+
+# Corpus generations kept in memory (one per distinct corpus string).
+_NAVIGATOR_CACHE_SIZE = 4
+_navigators = OrderedDict()
+_navigators_lock = threading.Lock()
+
+
+def _split_line(line, in_fence):
+    """
+    Cut one physical line into navigator lines.
+
+    Returns ([(start, end, heading_level), ...], in_fence): character spans
+    of `line` at most _LINE_CHARS long, each starting at a markdown heading
+    (heading_level > 0) or where the previous span was cut at whitespace.
+    """
+    breaks = {0: 0}
+    for m in _MARKER_REGEX.finditer(line):
+        if m.group(1) is None:
+            in_fence = not in_fence
+        elif not in_fence:
+            breaks[m.start()] = len(m.group(1))
+    cuts = sorted(breaks) + [len(line)]
+
+    spans = []
+    for a, b in zip(cuts, cuts[1:]):
+        level = breaks[a]
+        while b - a > _LINE_CHARS:
+            cut = line.rfind(" ", a + 1, a + _LINE_CHARS)
+            if cut < 0:
+                cut = a + _LINE_CHARS
+            spans.append((a, cut, level))
+            a, level = cut, 0
+        spans.append((a, b, level))
+    return spans, in_fence
+
+
+class CorpusNavigator:
+    """
+    Precomputed structure over a build_corpus() string.
+
+    A "line" here is a navigator line: a physical line of `context`, cut at
+    markdown headings and wrapped at whitespace to at most _LINE_CHARS
+    characters. Corpus documents arrive with their newlines flattened
+    (trace_engine.clean_extracted_text), so without the cuts a file would be
+    one line and every hit or range would return the whole file.
+
+      files        : {name: {"start", "end", "first_line", "end_line"}} —
+                     char offsets of the content in `context` and the
+                     content's line range (0-based, end exclusive)
+      lines        : text of every line (stripped)
+      line_starts  : char offset in `context` where every line starts
+      line_ends    : char offset in `context` where every line ends
+      outlines     : {name: [(line_no, "## Heading"), ...]} (1-based, per file)
+      index        : {word: [global line, ...]} inverted index over content
+      key          : sha1 of `context`, identifying the corpus generation
+
+    The REPL helpers (list_files, read_file, search, outline) are bound
+    methods of this object, so each exploration step is a lookup instead of
+    a regex pass over the whole corpus.
+    """
+
+    def __init__(self, context, key=None):
+        self.context = context
+        self.key = key or _corpus_key(context)
+        self.lines = []
+        self.line_starts = []
+        self.line_ends = []
+
+        self.files = {}
+        self.outlines = {}
+        self._file_starts = []   # (first_line, name), sorted, for line -> file lookup
+        index = defaultdict(list)
+
+        name, first, in_fence, offset = None, 0, False, 0
+        for raw in context.split("\n"):
+            line_offset, offset = offset, offset + len(raw) + 1
+            if name is None:
+                m = _FILE_OPEN_REGEX.match(raw)
+                self._add_line(raw, line_offset, 0, len(raw))
+                if m:
+                    name, first, in_fence = m.group(1), len(self.lines), False
+                    self.outlines[name] = []
+                continue
+            if raw == _FILE_CLOSE:
+                self.files[name] = {
+                    "start": self.line_starts[first] if first < len(self.lines) else line_offset,
+                    "end": line_offset - 1,   # the newline before </file>
+                    "first_line": first,
+                    "end_line": len(self.lines),
+                }
+                self._file_starts.append((first, name))
+                self._add_line(raw, line_offset, 0, len(raw))
+                name = None
+                continue
+            spans, in_fence = _split_line(raw, in_fence)
+            for a, b, level in spans:
+                i = self._add_line(raw, line_offset, a, b)
+                if level:
+                    self.outlines[name].append((i - first + 1, self._heading(self.lines[i], level)))
+                for word in set(_WORD_REGEX.findall(self.lines[i].lower())):
+                    index[word].append(i)
+        self.index = dict(index)
+
+    # -- internal helpers ---------------------------------------------------
+
+    def _add_line(self, raw, offset, a, b):
+        self.lines.append(raw[a:b].strip())
+        self.line_starts.append(offset + a)
+        self.line_ends.append(offset + b)
+        return len(self.lines) - 1
+
+    @staticmethod
+    def _heading(text, level):
+        """'## Title' from a line that starts with a heading marker, shortened to a label."""
+        text = text[level:].strip().rstrip("#").strip()
+        if len(text) > _HEADING_CHARS:
+            cut = text.rfind(" ", 0, _HEADING_CHARS)
+            text = text[:cut if cut > 0 else _HEADING_CHARS].rstrip() + " …"
+        return f"{'#' * level} {text}"
+
+    def _resolve(self, name):
+        """Exact name, else a unique suffix / basename match (e.g. 'grace.md')."""
+        if name in self.files:
+            return name
+        matches = [f for f in self.files if f.endswith("/" + name) or f.endswith(name)]
+        if len(matches) == 1:
+            return matches[0]
+        if not matches:
+            raise KeyError(f"No file named {name!r}. Use list_files() to see the available names.")
+        raise KeyError(f"{name!r} is ambiguous: {matches}")
+
+    def _file_of_line(self, line):
+        pos = bisect.bisect_right(self._file_starts, (line, "\uffff")) - 1
+        if pos < 0:
+            return None, 0
+        first, name = self._file_starts[pos]
+        return (name, first) if line < self.files[name]["end_line"] else (None, 0)
+
+    # -- REPL helpers -------------------------------------------------------
+
+    def list_files(self):
+        """Return [(name, number_of_lines), ...] for every file in the corpus."""
+        return [(n, f["end_line"] - f["first_line"]) for n, f in self.files.items()]
+
+    def outline(self, name):
+        """Return the markdown headings of `name` as [(line_no, heading), ...]."""
+        return list(self.outlines[self._resolve(name)])
+
+    def read_file(self, name, start=1, end=None):
+        """
+        Return lines `start`..`end` (1-based, inclusive) of `name` as one
+        string, with the file's original spacing. With no range, returns
+        the whole file.
+        """
+        f = self.files[self._resolve(name)]
+        total = f["end_line"] - f["first_line"]
+        start = max(1, start)
+        end = total if end is None else min(end, total)
+        if start > end:
+            return ""
+        return self.context[self.line_starts[f["first_line"] + start - 1]:
+                            self.line_ends[f["first_line"] + end - 1]].strip()
+
+    def search(self, term, max_results=20):
+        """
+        Case-insensitive search via the inverted index.
+        Returns [(file, line_no, line_text), ...] — line_no is 1-based within
+        the file and line_text is that line (at most _LINE_CHARS characters).
+        Lines containing the exact phrase come first, then lines with all its words.
+        """
+        words = _WORD_REGEX.findall(term.lower())
+        if not words:
+            return []
+        postings = sorted((self.index.get(w, []) for w in set(words)), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        phrase = term.lower()
+        exact, loose = [], []
+        for i in sorted(candidates):
+            (exact if phrase in self.lines[i].lower() else loose).append(i)
+
+        results = []
+        for i in exact + loose:
+            name, first = self._file_of_line(i)
+            if name is not None:
+                results.append((name, i - first + 1, self.lines[i]))
+                if len(results) >= max_results:
+                    break
+        return results
+
+    def grep(self, pattern, context_lines=0, max_matches=20):
+        """Regex search over corpus lines. Returns ["Line N: text", ...] (N is global)."""
+        regex = re.compile(pattern)
+        matches = []
+        for i, line in enumerate(self.lines):
+            if regex.search(line):
+                start = max(0, i - context_lines)
+                end = min(len(self.lines), i + context_lines + 1)
+                matches.append(f"Line {i+1}: " + "\n".join(self.lines[start:end]))
+                if len(matches) >= max_matches:
+                    break
+        return matches if matches else [f"Pattern '{pattern}' not found."]
+
+    def repl_helpers(self):
+        """Functions to inject into a REPL namespace."""
+        return {
+            "list_files": self.list_files,
+            "read_file": self.read_file,
+            "search": self.search,
+            "outline": self.outline,
+        }
+
+
+def _corpus_key(context):
+    return hashlib.sha1(context.encode("utf-8", errors="replace")).hexdigest()
+
+
+def get_navigator(context):
+    """
+    Return the CorpusNavigator for `context`, building it only the first
+    time this corpus generation (identified by content hash) is seen.
+    """
+    key = _corpus_key(context)
+    with _navigators_lock:
+        nav = _navigators.get(key)
+        if nav is not None:
+            _navigators.move_to_end(key)
+            return nav
+    nav = CorpusNavigator(context, key)
+    with _navigators_lock:
+        _navigators[key] = nav
+        while len(_navigators) > _NAVIGATOR_CACHE_SIZE:
+            _navigators.popitem(last=False)
+    return nav
+
+
+# ---------------------------------------------------------------------------
+# Snippet profiling
+# ---------------------------------------------------------------------------
+
+# Filename profiled snippets are compiled under; only these frames are traced.
+_REPL_FILENAME = "<repl>"
+# Hottest lines kept per snippet / per run summary.
+_PROFILE_TOP_LINES = 3
+
+# tracemalloc is process-global, but Insight sub-queries profile snippets
+# concurrently when they run in-process. Profilers share one tracing session:
+# the first starts it, the last stops it, and the peak is only reset when no
+# other snippet is being measured.
+_tracemalloc_lock = threading.Lock()
+_active_profilers = set()
+_tracemalloc_owned = False
+
+
+class SnippetProfiler:
+    """
+    Per-line wall time and peak memory for one REPL snippet.
+
+    sys.settrace only follows frames compiled from the snippet, so a line's
+    time includes the library calls it makes (a regex over the whole corpus,
+    an llm_query round-trip) but not the tracing overhead of their internals.
+    tracemalloc reports the snippet's peak allocation. If other snippets
+    were profiled in this process at the same time, the peak covers their
+    allocations too and the result is flagged "peak_memory_shared".
+
+        with SnippetProfiler(code) as prof:
+            exec(prof.compiled, namespace)
+        prof.result()  -> {"peak_memory_kb", "peak_memory_shared", "lines": [(line_no, hits, seconds, source)]}
+    """
+
+    def __init__(self, code):
+        self.source = code.splitlines()
+        self.compiled = compile(code, _REPL_FILENAME, "exec")
+        self.lines = defaultdict(lambda: [0, 0.0])   # line_no -> [hits, seconds]
+        self._last = None                           # (line_no, started_at)
+        self.peak_memory = 0
+        self.peak_memory_shared = False
+
+    def _global_trace(self, frame, event, arg):
+        return self._line_trace if frame.f_code.co_filename == _REPL_FILENAME else None
+
+    def _line_trace(self, frame, event, arg):
+        now = time.perf_counter()
+        if self._last is not None:
+            self.lines[self._last[0]][1] += now - self._last[1]
+            self._last = None
+        if event == "line":
+            self.lines[frame.f_lineno][0] += 1
+            self._last = (frame.f_lineno, now)
+        return self._line_trace
+
+    def __enter__(self):
+        global _tracemalloc_owned
+        with _tracemalloc_lock:
+            if _active_profilers:
+                for other in _active_profilers:
+                    other.peak_memory_shared = True
+                self.peak_memory_shared = True
+            else:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _tracemalloc_owned = True
+                tracemalloc.reset_peak()
+            _active_profilers.add(self)
+        sys.settrace(self._global_trace)
+        return self
+
+    def __exit__(self, *exc):
+        sys.settrace(None)
+        if self._last is not None:
+            self.lines[self._last[0]][1] += time.perf_counter() - self._last[1]
+            self._last = None
+        global _tracemalloc_owned
+        with _tracemalloc_lock:
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            _active_profilers.discard(self)
+            if not _active_profilers and _tracemalloc_owned:
+                tracemalloc.stop()
+                _tracemalloc_owned = False
+        return False
+
+    def result(self):
+        hot = sorted(self.lines.items(), key=lambda kv: kv[1][1], reverse=True)[:_PROFILE_TOP_LINES]
+        return {
+            "peak_memory_kb": self.peak_memory // 1024,
+            "peak_memory_shared": self.peak_memory_shared,
+            "lines": [
+                (no, hits, secs, self.source[no - 1].strip() if 0 < no <= len(self.source) else "")
+                for no, (hits, secs) in hot
+            ],
+        }
+
+
+class RunProfile:
+    """Aggregates snippet profiles and llm_query calls over one agent run."""
+
+    def __init__(self):
+        self.snippets = 0
+        self.exec_seconds = 0.0
+        self.peak_memory_kb = 0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+        self.hot_lines = defaultdict(lambda: [0, 0.0])   # source -> [hits, seconds]
+        self._lock = threading.Lock()
+
+    def add_llm_call(self, seconds, prompts=1):
+        with self._lock:
+            self.llm_calls += prompts
+            self.llm_seconds += seconds
+
+    def add_snippet(self, result):
+        """Record an execute result; returns a one-line summary of the snippet."""
+        profile = result.get("profile") or {}
+        with self._lock:
+            self.snippets += 1
+            self.exec_seconds += result.get("execution_time", 0.0)
+            self.peak_memory_kb = max(self.peak_memory_kb, profile.get("peak_memory_kb", 0))
+            for _, hits, secs, src in profile.get("lines", []):
+                self.hot_lines[src][0] += hits
+                self.hot_lines[src][1] += secs
+        bound = "≤" if profile.get("peak_memory_shared") else ""
+        line = f"⏱️ snippet {result.get('execution_time', 0.0):.2f}s, peak {bound}{profile.get('peak_memory_kb', 0)} KB"
+        if profile.get("lines"):
+            no, hits, secs, src = profile["lines"][0]
+            line += f"; hottest L{no} ({secs:.2f}s, {hits} hits): {src[:80]}"
+        return line
+
+    def summary(self):
+        with self._lock:
+            avg = self.llm_seconds / self.llm_calls if self.llm_calls else 0.0
+            parts = [
+                f"⏱️ REPL profile: {self.snippets} snippets, {self.exec_seconds:.2f}s executing, "
+                f"peak {self.peak_memory_kb} KB; llm_query x{self.llm_calls} "
+                f"({self.llm_seconds:.2f}s, avg {avg:.2f}s)"
+            ]
+            hot = sorted(self.hot_lines.items(), key=lambda kv: kv[1][1], reverse=True)[:_PROFILE_TOP_LINES]
+            for src, (hits, secs) in hot:
+                parts.append(f"   {secs:.2f}s / {hits} hits: {src[:100]}")
+        return "\n".join(parts)
+
+
+def execute_sandbox_code(code, repl_globals, profile=False):
     """
     Execute `code` in the persistent `repl_globals` namespace.
 
@@ -141,6 +554,7 @@ def execute_sandbox_code(code, repl_globals):
             "stdout": str,
             "stderr": str,
             "execution_time": float,   # seconds
+            "profile": dict,           # only with profile=True (SnippetProfiler.result())
         }
 
     Persistence: variables the LLM defines in one turn (e.g. `buffers = []`)
@@ -155,22 +569,31 @@ def execute_sandbox_code(code, repl_globals):
 
     stdout_buf = io.StringIO()
     stderr_buf = io.StringIO()
+    profiler = None
 
     t0 = time.perf_counter()
     try:
         with contextlib.redirect_stdout(stdout_buf), contextlib.redirect_stderr(stderr_buf):
-            exec(code, repl_globals)
+            if profile:
+                profiler = SnippetProfiler(code)
+                with profiler:
+                    exec(profiler.compiled, repl_globals)
+            else:
+                exec(code, repl_globals)
         stdout = stdout_buf.getvalue()
         stderr = stderr_buf.getvalue()
     except Exception as e:
         stdout = stdout_buf.getvalue()
         stderr = stderr_buf.getvalue() + f"\n{type(e).__name__}: {e}"
 
-    return {
+    result = {
         "stdout": stdout,
         "stderr": stderr,
         "execution_time": time.perf_counter() - t0,
     }
+    if profiler is not None:
+        result["profile"] = profiler.result()
+    return result
 
 
 def format_execution_result(result):
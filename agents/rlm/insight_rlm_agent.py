@@ -3,15 +3,22 @@ Insight-Aware RLM Agent (v2)
 Implements the 4-phase state machine: EXPLORE → INCUBATE → ILLUMINATE → SYNTHESIZE
 with episodic memory, impasse detection, context pruning, and recursive decomposition.
 
+Phases run as coroutines on the shared agent runtime loop (engines/agent_runtime.py)
+using the SDK's async client; solve() / completion() are the sync entry points.
+
 WIP
 
 """
 
+import asyncio
 import re
 import io
 import json
 import random
 import contextlib
+import threading
+import time
+from collections import defaultdict
 from google import genai
 from google.genai import types
 from agents.rlm.prompts.insight_rlm_prompts import (
@@ -22,37 +29,110 @@ from agents.rlm.prompts.insight_rlm_prompts import (
     VERIFY_PROMPT,
     SYNTHESIZE_PROMPT,
 )
-from agents.rlm.base import build_corpus, execute_sandbox_code
+from agents.rlm.base import RunProfile, build_corpus, get_navigator
+from agents.rlm.llm_memo import LLMMemo
+from agents.rlm.novelty import NoveltyIndex, OutputTracker, sketch
+from agents.rlm.sandbox_pool import get_sandbox_pool
+from config.app_config import RLM_PROFILE_REPL, SUB_LLM_MAX_CONCURRENCY
+from engines.agent_runtime import LogRelay, call_sync, gather_bounded, run
+from engines.request_scheduler import PRIORITY_INTERACTIVE, estimate_tokens, get_scheduler
 
 # ── Config ──────────────────────────────────────────────────────────────────
 MAX_DEPTH = 2              # Recursive solve depth limit
-MAX_STEPS_PER_PHASE = 8    # Steps in EXPLORE before forced incubation
+MAX_STEPS_PER_PHASE = 8    # Upper bound on steps per EXPLORE / ILLUMINATE phase
 MAX_INCUBATIONS = 2        # Max incubation retries before giving up
 STAGNATION_LIMIT = 3       # Consecutive no-finding steps → impasse
+OUTPUT_REPEAT_THRESHOLD = 0.85    # Estimated word-set Jaccard at which outputs count as repeats
+FINDING_DUPLICATE_THRESHOLD = 0.8 # ...and at which a new finding duplicates a stored one
+MAX_PARALLEL_SUBQUERIES = 3   # Sub-queries solved at once per decomposition
+MAX_CONCURRENT_CALLS = 4      # Model calls in flight across the whole solve tree
+
+# ── Budget (see BudgetController) ──
+RUN_TOKEN_BUDGET = 60000      # Tokens for one top-level solve, all depths included
+LATENCY_SLO_SECONDS = 90      # Wall-clock target for one top-level solve
+# Relative share of the remaining budget each phase may use.
+PHASE_SHARE = {"explore": 0.45, "incubate": 0.1, "illuminate": 0.3, "synthesize": 0.15}
+SYNTHESIS_RESERVE_TOKENS = 4000   # Kept back so an answer can always be synthesized
+SYNTHESIS_RESERVE_SECONDS = 10.0  # Until a synthesis has been timed
 
 
 class EpisodicMemory:
     """
     Persistent memory that survives context resets.
     Paper §3.3.3 — stores findings, failures, and insights across phases.
+
+    Sub-queries solved concurrently each get a child() memory: it starts
+    with the parent's findings and failures, and everything it learns is
+    published back to the parent under the parent's lock. A child's own
+    lists are only written by its own solve, so they can be shared with its
+    REPL namespace safely.
+
+    Findings are de-duplicated by MinHash (see agents/rlm/novelty.py): a
+    finding that near-duplicates a stored one is dropped in O(1) instead of
+    an exact scan of the list.
     """
 
-    def __init__(self):
-        self.findings = []
-        self.failed_approaches = []
+    def __init__(self, parent=None):
+        self.parent = parent
+        self._lock = threading.Lock()
+        self.findings = list(parent.findings) if parent else []
+        self.failed_approaches = list(parent.failed_approaches) if parent else []
         self.insights = []
+        self._finding_index = NoveltyIndex(FINDING_DUPLICATE_THRESHOLD)
+        for f in self.findings:
+            self._finding_index.add(sketch(str(f)))
+        self._checked = len(self.findings)   # findings[_checked:] were appended by the REPL
+        self._failures = set(self.failed_approaches)
+        self._insights = set()
+
+    def child(self):
+        return EpisodicMemory(parent=self)
+
+    def reconcile(self):
+        """
+        Check findings the REPL appended directly (findings.append): drop
+        near-duplicates, index and publish the rest. Returns the kept ones.
+        """
+        with self._lock:
+            fresh = self.findings[self._checked:]
+            del self.findings[self._checked:]
+            kept = [f for f in fresh if f and self._finding_index.add_if_novel(str(f))]
+            self.findings.extend(kept)
+            self._checked = len(self.findings)
+        if self.parent:
+            for f in kept:
+                self.parent.log_finding(f)
+        return kept
 
     def log_finding(self, finding):
-        if finding and finding not in self.findings:
+        """Store `finding` unless it near-duplicates a stored one. Returns True if stored."""
+        self.reconcile()
+        with self._lock:
+            if not finding or not self._finding_index.add_if_novel(str(finding)):
+                return False
             self.findings.append(finding)
+            self._checked = len(self.findings)
+        if self.parent:
+            self.parent.log_finding(finding)
+        return True
 
     def log_failure(self, approach):
-        if approach and approach not in self.failed_approaches:
+        with self._lock:
+            if not approach or approach in self._failures:
+                return
+            self._failures.add(approach)
             self.failed_approaches.append(approach)
+        if self.parent:
+            self.parent.log_failure(approach)
 
     def store_insight(self, insight):
-        if insight and insight not in self.insights:
+        with self._lock:
+            if not insight or insight in self._insights:
+                return
+            self._insights.add(insight)
             self.insights.append(insight)
+        if self.parent:
+            self.parent.store_insight(insight)
 
     def findings_summary(self):
         if not self.findings:
@@ -81,16 +161,102 @@ class EpisodicMemory:
         return "\n\n".join(parts) if parts else "(empty memory)"
 
 
+class BudgetController:
+    """
+    Token and wall-clock budget for one top-level solve.
+
+    Tracks tokens (read from the agent's live token_usage) and time per
+    (phase, depth). Each phase may use its PHASE_SHARE of whatever is left
+    across itself and the phases after it, so a cheap EXPLORE leaves more
+    for ILLUMINATE, and steps_for() turns that allowance into a step count
+    using the observed cost of a step. must_synthesize() turns true when
+    continuing would leave too little time (LATENCY_SLO_SECONDS) or tokens
+    for the final synthesis, and the solve loop then synthesizes from what
+    it has.
+
+    Concurrent sub-queries share the token counter, so per-phase token
+    figures are approximate when sub-solves overlap; run totals are exact.
+    """
+
+    PHASES = ("explore", "incubate", "illuminate", "synthesize")
+
+    def __init__(self, token_usage, token_budget=RUN_TOKEN_BUDGET, latency_slo=LATENCY_SLO_SECONDS):
+        self.token_usage = token_usage
+        self.token_budget = token_budget
+        self.latency_slo = latency_slo
+        self.started = time.monotonic()
+        self.spent = defaultdict(lambda: [0, 0.0, 0])   # (phase, depth) -> [tokens, seconds, steps]
+        self.step_tokens = 2000.0          # EWMA cost of one model step
+        self.step_seconds = 4.0
+        self.synthesis_seconds = SYNTHESIS_RESERVE_SECONDS
+
+    def tokens_left(self):
+        return self.token_budget - self.token_usage["total"]
+
+    def seconds_left(self):
+        return self.latency_slo - (time.monotonic() - self.started)
+
+    def allowance(self, phase):
+        """(tokens, seconds) this phase may use out of what is left."""
+        later = self.PHASES[self.PHASES.index(phase):]
+        share = PHASE_SHARE[phase] / sum(PHASE_SHARE[p] for p in later)
+        return max(0, self.tokens_left()) * share, max(0.0, self.seconds_left()) * share
+
+    def steps_for(self, phase, depth):
+        """Step cap for a phase: its allowance divided by the observed cost of a step."""
+        tokens, seconds = self.allowance(phase)
+        steps = min(MAX_STEPS_PER_PHASE, tokens // self.step_tokens, seconds // self.step_seconds)
+        return max(1, int(steps))
+
+    def count_step(self, phase, depth):
+        self.spent[(phase, depth)][2] += 1
+
+    def must_synthesize(self):
+        """True once only the synthesis reserve (tokens or SLO time) is left."""
+        return (self.tokens_left() <= SYNTHESIS_RESERVE_TOKENS
+                or self.seconds_left() <= self.synthesis_seconds)
+
+    @contextlib.contextmanager
+    def track(self, phase, depth):
+        """Account the tokens and time spent inside the block to (phase, depth)."""
+        tokens0, t0 = self.token_usage["total"], time.monotonic()
+        steps0 = self.spent[(phase, depth)][2]
+        try:
+            yield
+        finally:
+            tokens = self.token_usage["total"] - tokens0
+            seconds = time.monotonic() - t0
+            entry = self.spent[(phase, depth)]
+            entry[0] += tokens
+            entry[1] += seconds
+            steps = entry[2] - steps0
+            if steps:
+                self.step_tokens = 0.7 * self.step_tokens + 0.3 * (tokens / steps)
+                self.step_seconds = 0.7 * self.step_seconds + 0.3 * (seconds / steps)
+            if phase == "synthesize":
+                self.synthesis_seconds = max(self.synthesis_seconds, seconds)
+
+    def summary(self):
+        parts = [f"{phase}@{depth}: {tokens} tok / {seconds:.1f}s"
+                 for (phase, depth), (tokens, seconds, _) in sorted(self.spent.items(), key=lambda kv: kv[0][1])]
+        return (f"⏱️ Budget: {self.token_usage['total']}/{self.token_budget} tokens, "
+                f"{time.monotonic() - self.started:.1f}s/{self.latency_slo}s — " + ", ".join(parts))
+
+
 class InsightRLMAgent:
     """
     Insight-Aware RLM Controller.
     Implements EXPLORE → INCUBATE → ILLUMINATE → SYNTHESIZE with recursive depth.
     """
 
-    def __init__(self, client, model_id, docs=None, log_callback=None):
+    def __init__(self, client, model_id, docs=None, log_callback=None, corpus=None):
         self.client = client
         self.model_id = model_id
-        self.log_callback = log_callback
+        # Relay so logs from the runtime loop and sandbox threads reach the UI.
+        self.log_callback = LogRelay(log_callback) if log_callback else None
+
+        if corpus is not None:
+            docs = corpus.raw_docs
 
         # DEBUG: Verify docs
         if self.log_callback:
@@ -99,10 +265,28 @@ class InsightRLMAgent:
              else:
                  self.log_callback(f"🛠️ InsightRLMAgent Init. Docs passed? {bool(docs)}")
 
-        self.corpus = build_corpus(docs)
+        if corpus is not None:
+            # Shared CorpusSnapshot views — no per-turn copies.
+            self.corpus = corpus.context
+            self.navigator = corpus.navigator
+        else:
+            self.corpus = build_corpus(docs)
+            self.navigator = get_navigator(self.corpus)
 
         # Cumulative token usage across ALL calls (main + sub-agents + recursive)
         self.token_usage = {"input": 0, "output": 0, "total": 0}
+        # Concurrent sub-agent calls update token_usage from the runtime loop.
+        self._token_lock = threading.Lock()
+        # Sandbox worker leased for the current top-level solve.
+        self._sandbox = None
+        # REPL snippet / llm_query profile for the current solve (RLM_PROFILE_REPL).
+        self.profile = None
+        # Identical prompts across steps, phases and depths are answered once.
+        self.memo = LLMMemo(model_id, generation=self.navigator.key)
+        # Shared by every concurrent sub-solve of a run (reset in acompletion).
+        self._call_slots = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
+        # Token / latency budget for the current top-level solve.
+        self.budget = BudgetController(self.token_usage)
 
     # ── Logging ─────────────────────────────────────────────────────────────
 
@@ -115,45 +299,45 @@ class InsightRLMAgent:
 
     def _update_tokens(self, usage_metadata):
         if usage_metadata:
-            self.token_usage["input"] += usage_metadata.prompt_token_count or 0
-            self.token_usage["output"] += usage_metadata.candidates_token_count or 0
-            self.token_usage["total"] += usage_metadata.total_token_count or 0
+            with self._token_lock:
+                self.token_usage["input"] += usage_metadata.prompt_token_count or 0
+                self.token_usage["output"] += usage_metadata.candidates_token_count or 0
+                self.token_usage["total"] += usage_metadata.total_token_count or 0
 
     # ── REPL Sandbox (reused pattern from original RLM) ─────────────────────
 
     def _build_repl_globals(self, memory: EpisodicMemory):
-        """Create a fresh REPL namespace with CORPUS and tools injected."""
-        
-        def grep(pattern, context_lines=0):
-            """Search corpus for regex pattern and return matching lines."""
-            matches = []
-            lines = self.corpus.split('\n')
-            count = 0 
-            for i, line in enumerate(lines):
-                if re.search(pattern, line):
-                    start = max(0, i - context_lines)
-                    end = min(len(lines), i + context_lines + 1)
-                    matches.append(f"Line {i+1}: " + "\n".join(lines[start:end]))
-                    count += 1
-                    if count >= 20: break
-            return matches if matches else [f"Pattern '{pattern}' not found."]
-
-        return {
+        """Create a fresh REPL namespace (on the leased sandbox worker) with CORPUS and tools injected."""
+        return self._sandbox.namespace({
             "CORPUS": self.corpus,
             "llm_query": self._llm_query,
             "llm_query_batched": self._llm_query_batched,
-            "grep": grep,
+            "grep": self.navigator.grep,
+            **self.navigator.repl_helpers(),  # list_files / read_file / search / outline
             "findings": memory.findings,             # Mutable — shared ref
             "failed_approaches": memory.failed_approaches,  # Mutable — shared ref
             "re": re,
             "random": random,
-        }
+        })
 
     def execute_code(self, code, repl_globals):
-        """Execute code in the sandbox. Captures stdout/stderr."""
-        return execute_sandbox_code(code, repl_globals)
+        """Execute code in the sandbox. Returns stdout, plus 'Execution Error: ...' on failure."""
+        result = repl_globals.execute(code, profile=self.profile is not None)
+        if self.profile:
+            self.log(f"   {self.profile.add_snippet(result)}")
+        if result["stderr"].strip():
+            return f"{result['stdout']}Execution Error: {result['stderr'].strip()}"
+        return result["stdout"]
+
+    async def _aexecute_code(self, code, repl_globals, memory):
+        # Off the loop: user code may block, and its llm_query calls re-enter the loop.
+        output = await asyncio.to_thread(self.execute_code, code, repl_globals)
+        memory.reconcile()
+        return output
 
     # ── Sub-Agent LLM Calls ─────────────────────────────────────────────────
+    # llm_query / llm_query_batched are called from REPL code on a sandbox
+    # thread, so they stay sync and hand the request back to the runtime loop.
 
     def _llm_query(self, prompt_text=""):
         """Stateless sub-agent call (injected into REPL as llm_query)."""
@@ -163,13 +347,10 @@ class InsightRLMAgent:
         query_preview = prompt_text.strip()[:150].replace('\n', ' ')
         self.log(f"   🤖 Sub-agent query: {query_preview}{'...' if len(prompt_text) > 150 else ''}")
         try:
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=prompt_text,
-                config=types.GenerateContentConfig(temperature=0),
-            )
-            self._update_tokens(response.usage_metadata)
-            result = response.text
+            t0 = time.perf_counter()
+            result = call_sync(self._memo_generate(prompt_text))
+            if self.profile:
+                self.profile.add_llm_call(time.perf_counter() - t0)
             result_preview = result.strip()[:200].replace('\n', ' ')
             self.log(f"   📨 Sub-agent response: {result_preview}{'...' if len(result) > 200 else ''}")
             return result
@@ -178,60 +359,82 @@ class InsightRLMAgent:
             return f"Error in llm_query: {e}"
 
     def _llm_query_batched(self, prompts):
-        """Sequential batched sub-agent calls."""
+        """Concurrent batched sub-agent calls (bounded fan-out, results in order)."""
+        prompts = list(prompts)
         self.log(f"   🤖 Delegating analysis to sub-agents ({len(prompts)} chunks to process)...")
-        results = []
-        for i, p in enumerate(prompts):
-            self.log(f"   📄 Processing chunk {i+1}/{len(prompts)}...")
-            results.append(self._sub_query_silent(p))
+        t0 = time.perf_counter()
+        results = call_sync(self._sub_query_batched(prompts))
+        if self.profile:
+            self.profile.add_llm_call(time.perf_counter() - t0, len(prompts))
+        failed = sum(1 for r in results if isinstance(r, str) and r.startswith("Error in llm_query"))
+        self.log(f"   📄 Processed {len(prompts) - failed}/{len(prompts)} chunks"
+                 + (f" ({failed} failed)" if failed else ""))
         return results
 
-    def _sub_query_silent(self, prompt_text):
+    async def _sub_query_silent(self, prompt_text):
         """Sub-agent call without individual logging (used by batched)."""
         try:
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=prompt_text,
-                config=types.GenerateContentConfig(temperature=0),
-            )
-            self._update_tokens(response.usage_metadata)
-            return response.text
+            return await self._memo_generate(prompt_text)
         except Exception as e:
             return f"Error in llm_query: {e}"
 
+    async def _sub_query_batched(self, prompts):
+        results = await gather_bounded(
+            [self._sub_query_silent(p) for p in prompts], SUB_LLM_MAX_CONCURRENCY
+        )
+        return [r if not isinstance(r, BaseException) else f"Error in llm_query: {r}" for r in results]
+
     # ── LLM Chat Helper ─────────────────────────────────────────────────────
 
-    def _chat_turn(self, history):
+    async def _chat_turn(self, history):
         """Send the full history to the LLM and get a response."""
         past = history[:-1]
-        chat = self.client.chats.create(
+        chat = self.client.aio.chats.create(
             model=self.model_id,
             config=types.GenerateContentConfig(temperature=0),
             history=past,
         )
         last_msg = history[-1]["parts"][0]["text"]
-        response = chat.send_message(last_msg)
+        transcript = [p["text"] for turn in history for p in turn["parts"]]
+        async with self._call_slots, \
+                get_scheduler().aslot(PRIORITY_INTERACTIVE, estimate_tokens(*transcript),
+                                      model=self.model_id) as slot:
+            response = await chat.send_message(last_msg)
+            slot.record(response.usage_metadata)
         self._update_tokens(response.usage_metadata)
         return response.text
 
     # ── Simple LLM generation (no chat history) ─────────────────────────────
 
-    def _generate(self, prompt):
-        """Single-shot generation for incubation/verification/synthesis."""
-        try:
-            response = self.client.models.generate_content(
+    async def _scheduled_generate(self, prompt):
+        """One generate_content call admitted by the shared request scheduler."""
+        async with self._call_slots, \
+                get_scheduler().aslot(PRIORITY_INTERACTIVE, estimate_tokens(prompt),
+                                      model=self.model_id) as slot:
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt,
                 config=types.GenerateContentConfig(temperature=0),
             )
-            self._update_tokens(response.usage_metadata)
-            return response.text
+            slot.record(response.usage_metadata)
+        self._update_tokens(response.usage_metadata)
+        return response
+
+    async def _memo_generate(self, prompt):
+        """_scheduled_generate() text, reused for identical prompts (see llm_memo)."""
+        return await self.memo.call(prompt, lambda: self._scheduled_generate(prompt))
+
+    async def _generate(self, prompt):
+        """Single-shot generation for incubation/verification/synthesis."""
+        try:
+            return await self._memo_generate(prompt)
         except Exception as e:
             return f"Error: {e}"
 
     # ── Impasse Detection ──────────────────────────────────────────────
 
-    def _detect_impasse(self, recent_outputs, stagnation_count, step):
+    def _detect_impasse(self, recent_outputs, stagnation_count, step, max_steps=MAX_STEPS_PER_PHASE,
+                        tracker=None):
         """
         Approximate impasse detection (API-level, no Gnosis/EAS).
         Returns (is_stuck, reason).
@@ -240,12 +443,9 @@ class InsightRLMAgent:
         if stagnation_count >= STAGNATION_LIMIT:
             return True, f"No new findings in {STAGNATION_LIMIT} consecutive steps"
 
-        # 2. Repetition: last 3 outputs are very similar (simple check)
-        if len(recent_outputs) >= 3:
-            last_three = recent_outputs[-3:]
-            # Check if outputs are nearly identical (crude but effective)
-            if all(self._rough_similarity(last_three[0], o) > 0.85 for o in last_three[1:]):
-                return True, "Outputs are repeating (loop detected)"
+        # 2. Repetition: last 3 outputs are near-identical (MinHash sketches)
+        if tracker is not None and tracker.looping():
+            return True, "Outputs are repeating (loop detected)"
 
         # 3. Error loop: consecutive execution errors
         if len(recent_outputs) >= 2:
@@ -253,28 +453,11 @@ class InsightRLMAgent:
                 return True, "Consecutive execution errors"
 
         # 4. Forced incubation at step limit
-        if step >= MAX_STEPS_PER_PHASE - 1:
-            return True, f"Reached step limit ({MAX_STEPS_PER_PHASE})"
+        if step >= max_steps - 1:
+            return True, f"Reached step limit ({max_steps})"
 
         return False, ""
 
-    def _rough_similarity(self, a, b):
-        """Quick similarity check using character overlap ratio."""
-        if not a or not b:
-            return 0.0
-        a_clean = a.strip().lower()
-        b_clean = b.strip().lower()
-        if a_clean == b_clean:
-            return 1.0
-        # Use set intersection on words
-        words_a = set(a_clean.split())
-        words_b = set(b_clean.split())
-        if not words_a or not words_b:
-            return 0.0
-        intersection = words_a & words_b
-        union = words_a | words_b
-        return len(intersection) / len(union) if union else 0.0
-
     # ── Random Chunk Injection (Opportunistic Assimilation) ────────────
 
     def _get_random_chunk(self, size=500):
@@ -313,9 +496,15 @@ class InsightRLMAgent:
         code_lower = code.lower()
 
         # File listing
-        if 're.findall' in code_lower and 'file' in code_lower and 'name' in code_lower:
+        if 'list_files(' in code_lower or ('re.findall' in code_lower and 'file' in code_lower and 'name' in code_lower):
             return 'Listing available files in the corpus'
 
+        # Navigation helpers
+        helper_match = re.search(r'(read_file|outline|search)\(\s*["\'](.{1,60}?)["\']', code)
+        if helper_match and 'llm_query' not in code_lower:
+            verb = {'read_file': 'Reading file', 'outline': 'Outlining file', 'search': 'Searching for'}[helper_match.group(1)]
+            return f'{verb}: "{helper_match.group(2)}"'
+
         # Map-reduce batch analysis
         if 'llm_query_batched' in code_lower:
             return 'Running map-reduce analysis across multiple files'
@@ -398,7 +587,7 @@ class InsightRLMAgent:
             return first
         return output[:150]
 
-    def _explore(self, query, memory, depth):
+    async def _explore(self, query, memory, depth):
         """
         EXPLORE phase: write and execute code to search CORPUS.
         Returns: (result_type, data)
@@ -423,15 +612,20 @@ class InsightRLMAgent:
         ]
 
         recent_outputs = []
+        tracker = OutputTracker(OUTPUT_REPEAT_THRESHOLD)
         stagnation_count = 0
         prev_findings_count = len(memory.findings)
 
-        for step in range(MAX_STEPS_PER_PHASE):
+        max_steps = self.budget.steps_for("explore", depth)
+        for step in range(max_steps):
+            if self.budget.must_synthesize():
+                return "impasse", "Token/latency budget exhausted"
+            self.budget.count_step("explore", depth)
             self.log(f"{indent}")
-            self.log(f"{indent}📌 **Step {step + 1} of {MAX_STEPS_PER_PHASE}**")
+            self.log(f"{indent}📌 **Step {step + 1} of {max_steps}**")
 
             try:
-                content = self._chat_turn(history)
+                content = await self._chat_turn(history)
                 history.append({"role": "model", "parts": [{"text": content}]})
                 
                 # Show what the model is thinking (summarized)
@@ -462,10 +656,11 @@ class InsightRLMAgent:
                     code = code_match.group(1).strip()
                     action_desc = self._describe_code_action(code)
                     self.log(f"{indent}   ⚙️ Action: {action_desc}")
-                    output = self.execute_code(code, repl_globals)
+                    output = await self._aexecute_code(code, repl_globals, memory)
                     output_summary = self._summarize_output(output)
                     self.log(f"{indent}   📋 Result: {output_summary}")
                     recent_outputs.append(output)
+                    novel = tracker.observe(output)
 
                     # Track findings and stagnation
                     if len(memory.findings) > prev_findings_count:
@@ -476,8 +671,8 @@ class InsightRLMAgent:
                             self.log(f"{indent}   💡 Finding: {f_preview}")
                         stagnation_count = 0
                         prev_findings_count = len(memory.findings)
-                    elif output and len(output.strip()) > 100 and 'Execution Error' not in output:
-                        # Model got useful output but didn't record it — auto-record
+                    elif novel and output and len(output.strip()) > 100 and 'Execution Error' not in output:
+                        # Model got new, useful output but didn't record it — auto-record
                         auto_finding = output.strip()[:500]
                         memory.log_finding(f"[Auto-recorded from step {step+1}] {auto_finding}")
                         f_preview = auto_finding[:200] + ('...' if len(auto_finding) > 200 else '')
@@ -494,11 +689,13 @@ class InsightRLMAgent:
                 else:
                     stagnation_count += 1
                     recent_outputs.append(content[:500])
+                    tracker.observe(content[:500])
                     self.log(f"{indent}   ⏳ No code generated — nudging model to continue...")
                     history.append({"role": "user", "parts": [{"text": "Continue. Write Python code to search CORPUS, or output <FINAL> if you have the answer, or <IMPASSE> if stuck."}]})
 
                 # ── Impasse detection ──
-                is_stuck, reason = self._detect_impasse(recent_outputs, stagnation_count, step)
+                is_stuck, reason = self._detect_impasse(recent_outputs, stagnation_count, step, max_steps,
+                                                     tracker)
                 if is_stuck:
                     self.log(f"{indent}   🚧 Impasse detected: {reason}")
                     memory.log_failure(f"EXPLORE step {step + 1}: {reason}")
@@ -508,12 +705,13 @@ class InsightRLMAgent:
                 self.log(f"{indent}   ❌ Error: {e}")
                 history.append({"role": "user", "parts": [{"text": f"Error: {e}"}]})
                 recent_outputs.append(f"Error: {e}")
+                tracker.observe(f"Error: {e}")
 
         return "impasse", "Exhausted EXPLORE steps"
 
     # ── Phase II: INCUBATE ──────────────────────────────────────────────────
 
-    def _incubate(self, query, memory, depth):
+    async def _incubate(self, query, memory, depth):
         """
         INCUBATE phase: reset context, inject noise, generate new strategy.
         Paper §5.1-5.2: Context Pruning + Opportunistic Assimilation.
@@ -542,7 +740,7 @@ class InsightRLMAgent:
         )
 
         self.log(f"{indent}   🔄 Generating new strategy...")
-        content = self._generate(prompt)
+        content = await self._generate(prompt)
 
         # Extract strategy
         strat_match = re.search(r"<STRATEGY>(.*?)</STRATEGY>", content, re.DOTALL)
@@ -558,7 +756,7 @@ class InsightRLMAgent:
 
     # ── Phase III: ILLUMINATE ───────────────────────────────────────────────
 
-    def _illuminate(self, query, strategy, memory, depth):
+    async def _illuminate(self, query, strategy, memory, depth):
         """
         ILLUMINATE phase: attempt recursive decomposition or direct re-solve.
         Paper §6.1: Representational Change through decomposition.
@@ -586,10 +784,14 @@ class InsightRLMAgent:
         history = [{"role": "user", "parts": [{"text": prompt}]}]
 
         # Give it a few steps to work with the new strategy
-        for step in range(MAX_STEPS_PER_PHASE):
+        max_steps = self.budget.steps_for("illuminate", depth)
+        for step in range(max_steps):
+            if self.budget.must_synthesize():
+                return "impasse", "Token/latency budget exhausted"
+            self.budget.count_step("illuminate", depth)
             self.log(f"{indent}")
-            self.log(f"{indent}📌 **Illuminate Step {step + 1} of {MAX_STEPS_PER_PHASE}**")
-            content = self._chat_turn(history)
+            self.log(f"{indent}📌 **Illuminate Step {step + 1} of {max_steps}**")
+            content = await self._chat_turn(history)
             history.append({"role": "model", "parts": [{"text": content}]})
             
             intent = self._summarize_model_intent(content)
@@ -610,14 +812,18 @@ class InsightRLMAgent:
                         sub_queries = json.loads(sq_match.group(1).strip())
                         if isinstance(sub_queries, list) and len(sub_queries) > 0:
                             self.log(f"{indent}   🔀 Decomposing into {len(sub_queries)} sub-queries:")
-                            # Recursive solve each sub-query
-                            sub_insights = []
                             for i, sq in enumerate(sub_queries):
                                 sq_preview = sq[:100] + ('...' if len(sq) > 100 else '')
                                 self.log(f"{indent}   📎 Sub-query {i + 1}/{len(sub_queries)}: \"{sq_preview}\"")
-                                result = self.solve(sq, depth=depth + 1)
-                                sub_insights.append(f"[Sub-query: {sq}]\n{result}")
-                                self.log(f"{indent}   ✓ Sub-query {i + 1} resolved")
+                            # Solve sub-queries concurrently; each shares findings through a child memory.
+                            results = await gather_bounded(
+                                [self._solve_subquery(sq, i, depth, memory) for i, sq in enumerate(sub_queries)],
+                                MAX_PARALLEL_SUBQUERIES,
+                            )
+                            sub_insights = [
+                                f"[Sub-query: {sq}]\n{r if not isinstance(r, BaseException) else f'Failed: {r}'}"
+                                for sq, r in zip(sub_queries, results)
+                            ]
                             return "insights", sub_insights
                     except json.JSONDecodeError:
                         self.log(f"{indent}   ⚠️ Could not parse decomposition — retrying...")
@@ -636,7 +842,7 @@ class InsightRLMAgent:
                 code = code_match.group(1).strip()
                 action_desc = self._describe_code_action(code)
                 self.log(f"{indent}   ⚙️ Action: {action_desc}")
-                output = self.execute_code(code, repl_globals)
+                output = await self._aexecute_code(code, repl_globals, memory)
                 output_summary = self._summarize_output(output)
                 self.log(f"{indent}   📋 Result: {output_summary}")
                 history.append({"role": "user", "parts": [{"text": f"Observation:\n{output}"}]})
@@ -679,7 +885,7 @@ class InsightRLMAgent:
 
     # ── Verification ─────────────────────────────────────────────────
 
-    def _verify_answer(self, query, answer, memory):
+    async def _verify_answer(self, query, answer, memory):
         """
         Verify that a proposed answer is consistent with findings.
         Returns True if the answer passes verification.
@@ -706,7 +912,7 @@ class InsightRLMAgent:
             findings_summary=memory.findings_summary(),
         )
 
-        content = self._generate(prompt)
+        content = await self._generate(prompt)
 
         if "<VERDICT>PASS</VERDICT>" in content:
             self.log("✅ Verification passed — answer is consistent with findings")
@@ -721,7 +927,7 @@ class InsightRLMAgent:
 
     # ── Synthesis ──────────────────────────────────────────────────────
 
-    def _synthesize(self, query, insights):
+    async def _synthesize(self, query, insights):
         """Combine multiple insights into a single coherent answer."""
         self.log("")
         self.log("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
@@ -736,7 +942,7 @@ class InsightRLMAgent:
             insights_text=insights_text,
         )
 
-        content = self._generate(prompt)
+        content = await self._generate(prompt)
 
         # Extract FINAL
         match = re.search(r"<FINAL>(.*?)(?:</FINAL>|$)", content, re.DOTALL)
@@ -748,11 +954,34 @@ class InsightRLMAgent:
 
     # ── Master Control Loop ──────────────────────────────────────────
 
+    async def _solve_subquery(self, sub_query, index, depth, memory):
+        result = await self.asolve(sub_query, depth=depth + 1, parent_memory=memory)
+        self.log(f"{'│ ' * depth}   ✓ Sub-query {index + 1} resolved")
+        return result
+
     def solve(self, query, depth=0):
+        """Sync wrapper around asolve() for callers outside the runtime loop."""
+        return run(self.asolve(query, depth), relay=self.log_callback)
+
+    async def asolve(self, query, depth=0, parent_memory=None):
         """
         The master recursive solve loop.
         Returns the answer string (no token stats — those are on self.token_usage).
         """
+        if depth == 0 and self._sandbox is None:
+            # One sandbox worker per top-level solve; sub-queries reuse it.
+            self._sandbox = await asyncio.to_thread(get_sandbox_pool().lease, self.corpus)
+            self.profile = RunProfile() if RLM_PROFILE_REPL else None
+            self.budget = BudgetController(self.token_usage)
+            try:
+                return await self.asolve(query, depth)
+            finally:
+                self._sandbox.release()
+                self._sandbox = None
+                if self.profile:
+                    self.log(self.profile.summary())
+                self.log(self.budget.summary())
+
         indent = '│ ' * depth
         if depth > MAX_DEPTH:
             self.log(f"{indent}⛔ Recursion depth limit reached — returning partial result")
@@ -763,15 +992,20 @@ class InsightRLMAgent:
             self.log(f"   Query: \"{query[:120]}{'...' if len(query) > 120 else ''}\"")
             self.log("")
 
-        memory = EpisodicMemory()
+        if depth > 0 and self.budget.must_synthesize():
+            self.log(f"{indent}⛔ Budget spent — skipping sub-query")
+            return "Not resolved: the run's token/latency budget was exhausted."
+
+        memory = parent_memory.child() if parent_memory else EpisodicMemory()
         incubation_count = 0
 
         # ── Phase I: EXPLORE ──
-        result_type, data = self._explore(query, memory, depth)
+        with self.budget.track("explore", depth):
+            result_type, data = await self._explore(query, memory, depth)
 
         if result_type == "final":
             # Verify before accepting
-            if depth == 0 and self._verify_answer(query, data, memory):
+            if depth == 0 and await self._verify_answer(query, data, memory):
                 return data
             elif depth > 0:
                 return data  # Skip verification for sub-queries to save tokens
@@ -782,19 +1016,22 @@ class InsightRLMAgent:
                 result_type = "impasse"
 
         # ── Phase II + III: INCUBATE → ILLUMINATE loop ──
-        while result_type == "impasse" and incubation_count < MAX_INCUBATIONS:
+        while (result_type == "impasse" and incubation_count < MAX_INCUBATIONS
+               and not self.budget.must_synthesize()):
             incubation_count += 1
             self.log(f"{indent}")
             self.log(f"{indent}🔄 **Retry attempt {incubation_count} of {MAX_INCUBATIONS}**")
 
             # Phase II: INCUBATE — generate new strategy
-            strategy = self._incubate(query, memory, depth)
+            with self.budget.track("incubate", depth):
+                strategy = await self._incubate(query, memory, depth)
 
             # Phase III: ILLUMINATE — execute new strategy / decompose
-            result_type, data = self._illuminate(query, strategy, memory, depth)
+            with self.budget.track("illuminate", depth):
+                result_type, data = await self._illuminate(query, strategy, memory, depth)
 
             if result_type == "final":
-                if depth == 0 and not self._verify_answer(query, data, memory):
+                if depth == 0 and not await self._verify_answer(query, data, memory):
                     memory.log_failure(f"Illuminated answer failed verification")
                     result_type = "impasse"
                     continue
@@ -804,13 +1041,18 @@ class InsightRLMAgent:
                 # Sub-queries returned insights — synthesize
                 for ins in data:
                     memory.store_insight(ins)
-                return self._synthesize(query, data)
+                with self.budget.track("synthesize", depth):
+                    return await self._synthesize(query, data)
 
         # ── Fallback: synthesize whatever we have ──
         if memory.findings:
             self.log(f"{indent}")
-            self.log(f"{indent}⚠️ Could not find a complete answer, but have partial findings")
-            return self._synthesize(query, [memory.findings_summary()])
+            if result_type == "impasse" and self.budget.must_synthesize():
+                self.log(f"{indent}⏱️ Budget nearly spent — synthesizing early from partial findings")
+            else:
+                self.log(f"{indent}⚠️ Could not find a complete answer, but have partial findings")
+            with self.budget.track("synthesize", depth):
+                return await self._synthesize(query, [memory.findings_summary()])
         
         return "I was unable to find a conclusive answer after multiple reasoning attempts."
 
@@ -821,8 +1063,18 @@ class InsightRLMAgent:
         Main entry point (matches RLMAgent's interface).
         Returns (answer_text, token_stats).
         """
+        return run(self.acompletion(user_query), relay=self.log_callback)
+
+    async def acompletion(self, user_query):
+        """Coroutine form of completion()."""
         self.token_usage = {"input": 0, "output": 0, "total": 0}
+        self.memo = LLMMemo(self.model_id, generation=self.navigator.key)
+        self._call_slots = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
+
+        answer = await self.asolve(user_query, depth=0)
 
-        answer = self.solve(user_query, depth=0)
+        self.memo.report(self.token_usage)
+        if self.memo.hits:
+            self.log(f"♻️ Reused {self.memo.hits} identical sub-agent answers (~{self.memo.tokens_saved} tokens saved)")
 
         return answer, self.token_usage
@@ -0,0 +1,138 @@
+"""
+LLM memo — reuse identical temperature-0 sub-LLM responses.
+
+RLM models often send the same llm_query prompt more than once: again in a
+later step, in ILLUMINATE after EXPLORE, or from a recursive solve at
+another depth. Every call is temperature 0, so the answer can be reused:
+
+  * each run gets an LLMMemo keyed by (model, sha256(prompt), temperature=0);
+    identical prompts in flight at the same time (e.g. duplicates inside one
+    llm_query_batched) share a single request;
+  * with RLM_MEMO_SHARED, responses also go to a process-wide LRU
+    (RLM_MEMO_SHARED_SIZE entries) keyed additionally by the corpus
+    generation, so later runs over the same corpus reuse them and an edit
+    to data/ starts fresh. When the CorpusStore publishes a document change,
+    the previous generation's entries are dropped rather than left to age
+    out of the LRU.
+
+Only successful responses are stored. A blocked or empty response (whose
+.text is None) is returned as "" and not stored. Hits and the tokens they
+saved are reported next to token_usage (memo_hits, memo_tokens_saved).
+
+Usage:
+    memo = LLMMemo(model_id, generation=navigator.key)
+    text = await memo.call(prompt, lambda: self._agenerate(prompt))
+    memo.report(token_usage)
+"""
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+
+from config.app_config import RLM_MEMO_SHARED, RLM_MEMO_SHARED_SIZE
+from engines.corpus_snapshot import get_corpus_store
+
+# All memoized calls use temperature 0; the key records it explicitly.
+_TEMPERATURE = 0
+
+_shared = OrderedDict()    # (generation, key) -> (text, total_tokens)
+_shared_lock = threading.Lock()
+
+
+def _shared_get(skey):
+    with _shared_lock:
+        entry = _shared.get(skey)
+        if entry is not None:
+            _shared.move_to_end(skey)
+        return entry
+
+
+def _shared_put(skey, entry):
+    with _shared_lock:
+        _shared[skey] = entry
+        _shared.move_to_end(skey)
+        while len(_shared) > RLM_MEMO_SHARED_SIZE:
+            _shared.popitem(last=False)
+
+
+def _entry(response):
+    """(text, total_tokens) of a response; text is "" when it was blocked or empty."""
+    usage = response.usage_metadata
+    return response.text or "", getattr(usage, "total_token_count", 0) or 0
+
+
+def forget_generation(generation):
+    """Drop every shared entry recorded for a corpus generation."""
+    with _shared_lock:
+        for skey in [skey for skey in _shared if skey[0] == generation]:
+            del _shared[skey]
+
+
+def _on_corpus_change(names, previous, snapshot):
+    navigator = previous.built_navigator()
+    if navigator is not None:
+        forget_generation(navigator.key)
+
+
+get_corpus_store().subscribe(_on_corpus_change)
+
+
+class LLMMemo:
+    """Per-run response memo, optionally backed by the process-wide LRU."""
+
+    def __init__(self, model_id, generation=None, shared=RLM_MEMO_SHARED):
+        self.model_id = model_id
+        self.generation = generation
+        self.shared = shared and generation is not None
+        self.hits = 0
+        self.tokens_saved = 0
+        self._local = {}       # key -> (text, total_tokens)
+        self._inflight = {}    # key -> asyncio.Task
+
+    def key(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8", errors="replace")).hexdigest()
+        return f"{self.model_id}:{_TEMPERATURE}:{digest}"
+
+    def _hit(self, entry):
+        self.hits += 1
+        self.tokens_saved += entry[1]
+        return entry[0]
+
+    async def call(self, prompt, fetch):
+        """
+        Return the response text for `prompt` ("" if the response had no
+        text), awaiting `fetch()` (a coroutine factory returning a
+        GenerateContentResponse) only on a miss. Exceptions from fetch()
+        propagate and are not cached.
+        """
+        key = self.key(prompt)
+        entry = self._local.get(key)
+        if entry is None and self.shared:
+            entry = _shared_get((self.generation, key))
+            if entry is not None:
+                self._local[key] = entry
+        if entry is not None:
+            return self._hit(entry)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            response = await asyncio.shield(task)
+            return self._hit(_entry(response))
+
+        task = self._inflight[key] = asyncio.ensure_future(fetch())
+        try:
+            response = await asyncio.shield(task)
+        finally:
+            self._inflight.pop(key, None)
+
+        entry = _entry(response)
+        if entry[0]:
+            self._local[key] = entry
+            if self.shared:
+                _shared_put((self.generation, key), entry)
+        return entry[0]
+
+    def report(self, token_usage):
+        """Add memo hit counts to a token_usage dict."""
+        token_usage["memo_hits"] = self.hits
+        token_usage["memo_tokens_saved"] = self.tokens_saved
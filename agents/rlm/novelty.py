@@ -0,0 +1,115 @@
+"""
+Novelty tracking for the Insight RLM — MinHash sketches of outputs and findings.
+
+Impasse detection used to recompute a word-set Jaccard over the last three
+full outputs every step, and EpisodicMemory de-duplicated findings with an
+exact `in` check over the whole list (which also let near-identical findings
+through). Here every text is reduced once, on arrival, to a fixed-size
+MinHash signature of its word set:
+
+  * similarity(a, b) estimates the Jaccard of the two word sets by comparing
+    NUM_PERM integers, whatever the texts' lengths;
+  * NoveltyIndex buckets signatures by LSH bands, so "is this a near-duplicate
+    of anything seen before?" only compares against the few signatures that
+    share a band;
+  * OutputTracker keeps the last few output signatures of a phase to flag
+    loops, and an index of all of them to flag repeats of older outputs.
+"""
+import hashlib
+import random
+import re
+from collections import defaultdict, deque
+
+NUM_PERM = 32
+BANDS = 8                      # BANDS * ROWS == NUM_PERM
+ROWS = NUM_PERM // BANDS
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240229)   # fixed: sketches are comparable across runs
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_WORD_REGEX = re.compile(r"\w+")
+
+
+def _token_hash(token):
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def sketch(text):
+    """MinHash signature of the lower-cased word set of `text` (None if it has no words)."""
+    words = set(_WORD_REGEX.findall(text.lower())) if text else None
+    if not words:
+        return None
+    hashes = [_token_hash(w) for w in words]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures (0.0 if either is missing)."""
+    if sig_a is None or sig_b is None:
+        return 0.0
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+
+class NoveltyIndex:
+    """LSH index of signatures answering near-duplicate queries without a full scan."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self._sketches = []
+        self._buckets = [defaultdict(list) for _ in range(BANDS)]
+
+    def __len__(self):
+        return len(self._sketches)
+
+    def _bands(self, sig):
+        for band in range(BANDS):
+            yield band, sig[band * ROWS:(band + 1) * ROWS]
+
+    def nearest(self, sig):
+        """Highest similarity between `sig` and any indexed signature sharing a band."""
+        if sig is None:
+            return 0.0
+        candidates = set()
+        for band, key in self._bands(sig):
+            candidates.update(self._buckets[band].get(key, ()))
+        return max((similarity(sig, self._sketches[i]) for i in candidates), default=0.0)
+
+    def add(self, sig):
+        if sig is None:
+            return
+        idx = len(self._sketches)
+        self._sketches.append(sig)
+        for band, key in self._bands(sig):
+            self._buckets[band][key].append(idx)
+
+    def add_if_novel(self, text):
+        """Index `text` and return True, or return False if it near-duplicates an indexed text."""
+        sig = sketch(text)
+        if sig is not None and self.nearest(sig) >= self.threshold:
+            return False
+        self.add(sig)
+        return True
+
+
+class OutputTracker:
+    """Per-phase output novelty: loops over the last `window` outputs and repeats of any earlier one."""
+
+    def __init__(self, threshold=0.85, window=3):
+        self.threshold = threshold
+        self.recent = deque(maxlen=window)
+        self.index = NoveltyIndex(threshold)
+
+    def observe(self, text):
+        """Record an output. Returns False if it near-duplicates an earlier output."""
+        sig = sketch(text)
+        novel = self.index.nearest(sig) < self.threshold
+        self.index.add(sig)
+        self.recent.append(sig)
+        return novel
+
+    def looping(self):
+        """True when the last `window` outputs are all near-identical to the oldest of them."""
+        if len(self.recent) < self.recent.maxlen:
+            return False
+        first = self.recent[0]
+        return all(similarity(first, sig) > self.threshold for sig in list(self.recent)[1:])
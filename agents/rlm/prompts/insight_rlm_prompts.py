@@ -17,6 +17,10 @@ You DO NOT see CORPUS in your prompt. You must write Python code to inspect it.
 IMPORTANT: Do NOT assume any specific filenames exist. Always start by listing files first.
 
 AVAILABLE REPL TOOLS:
+- `list_files()` (function): Returns [(name, n_lines), ...] for every file. Instant. A "line" is at most 200 characters (long paragraphs are wrapped).
+- `outline(name)` (function): Markdown headings of a file as [(line_no, heading), ...].
+- `read_file(name, start=1, end=None)` (function): Lines start..end (1-based, inclusive) of a file. `name` may be a basename.
+- `search(term)` (function): Indexed case-insensitive word/phrase search. Returns [(file, line_no, line_text), ...] where line_text is the matching line only; read around a hit with read_file(file, line_no - 5, line_no + 15). Prefer this over grep for plain keywords.
 - `grep(pattern, context_lines=0)` (function): Search for regex in corpus. Returns list of strings.
 - `llm_query(prompt)` (function): Ask a sub-agent a reasoning question. Returns string.
 - `llm_query_batched(prompts)` (function): Send a list of prompts. Returns list of strings.
@@ -54,29 +58,24 @@ Example:
 NAVIGATION STRATEGIES (choose the best one):
 1. File Listing & Lookup ("Map") - ALWAYS START HERE
    ```python
-   import re
-   files = re.findall(r"<file name='(.*?)'>", CORPUS)
-   print(f"Available Files: {files}")
+   print(f"Available Files: {list_files()}")
    ```
 
 2. Extract a specific file (use actual filenames from step 1):
    ```python
-   pattern = r"<file name='ACTUAL_FILENAME_HERE'>\\n(.*?)\\n</file>"
-   match = re.search(pattern, CORPUS, re.DOTALL)
-   if match: print(match.group(1)[:2000])
+   print(outline("ACTUAL_FILENAME_HERE"))
+   print(read_file("ACTUAL_FILENAME_HERE")[:2000])
    ```
 
 3. Keyword scan across all files:
    ```python
-   sections = re.split(r"</file>", CORPUS)
-   for s in sections:
-       if "keyword" in s.lower():
-           print(s[:500])
+   for name, line, text in search("keyword"):
+       print(name, line, text)
    ```
 
 4. Map-Reduce with sub-agents:
    ```python
-   chunks = [c for c in CORPUS.split("</file>") if c.strip()]
+   chunks = [read_file(name) for name, _ in list_files()]
    prompts = [f"Extract info about X from: {c[:1000]}" for c in chunks]
    results = llm_query_batched(prompts)
    for r in results:
@@ -173,7 +172,7 @@ CONTEXT:
 - Failed approaches: {failed_summary}
 
 AVAILABLE REPL TOOLS (same as EXPLORE):
-- `CORPUS`, `llm_query()`, `llm_query_batched()`, `findings`, `failed_approaches`, `re`, `random`
+- `CORPUS`, `list_files()`, `outline()`, `read_file()`, `search()`, `grep()`, `llm_query()`, `llm_query_batched()`, `findings`, `failed_approaches`, `re`, `random`
 
 YOUR TASK:
 If the strategy requires breaking the problem into parts, output sub-queries:
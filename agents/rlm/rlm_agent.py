@@ -8,14 +8,30 @@ The main loop:
   4. If code blocks found -> execute ALL of them, append observations.
   5. Otherwise nudge the model to continue.
   6. After `max_steps`, ask the model one last time for a final answer
+
+The loop runs as a coroutine (`acompletion`) on the shared agent runtime
+loop using the SDK's async client; `completion` is the sync entry point.
 """
 
+import asyncio
 import re
+import threading
+import time
 
 from google.genai import types
 
 from agents.rlm.prompts.rlm_prompts import RLM_SYSTEM_PROMPT
-from agents.rlm.base import build_corpus, execute_sandbox_code, format_execution_result
+from agents.rlm.base import RunProfile, build_corpus, format_execution_result, get_navigator
+from agents.rlm.llm_memo import LLMMemo
+from agents.rlm.sandbox_pool import get_sandbox_pool
+from config.app_config import (
+    RLM_HISTORY_KEEP_RECENT,
+    RLM_HISTORY_TOKEN_BUDGET,
+    RLM_PROFILE_REPL,
+    SUB_LLM_MAX_CONCURRENCY,
+)
+from engines.agent_runtime import LogRelay, call_sync, gather_bounded, run
+from engines.request_scheduler import PRIORITY_INTERACTIVE, estimate_tokens, get_scheduler
 
 
 # ---------------------------------------------------------------------------
@@ -30,8 +46,10 @@ _CODE_BLOCK_REGEX = re.compile(
 _FINAL_VAR_REGEX = re.compile(r"^\s*FINAL_VAR\((.*?)\)", re.MULTILINE | re.DOTALL)
 _FINAL_REGEX = re.compile(r"^\s*FINAL\((.*?)\)", re.MULTILINE | re.DOTALL)
 
-# Keep REPL observations bounded so one runaway print() can't blow the context budget
-_MAX_OBSERVATION_CHARS = 20_000
+# Only a head/tail preview of each REPL output goes into the chat; the full
+# text stays in the REPL's `observations` list for the model to page through.
+_OBSERVATION_HEAD_CHARS = 3_000
+_OBSERVATION_TAIL_CHARS = 1_000
 
 
 def find_code_blocks(text):
@@ -61,10 +79,112 @@ def find_final_answer(text, repl_globals=None):
     return None
 
 
-def _truncate(text, limit=_MAX_OBSERVATION_CHARS):
-    if len(text) <= limit:
+def _preview(text, index, head=_OBSERVATION_HEAD_CHARS, tail=_OBSERVATION_TAIL_CHARS):
+    """Head/tail preview of observation `index`, pointing at the stored full text."""
+    if len(text) <= head + tail:
         return text
-    return text[:limit] + f"\n... [truncated {len(text) - limit} chars]"
+    omitted = len(text) - head - tail
+    return (
+        text[:head]
+        + f"\n... [{omitted} chars omitted — full output ({len(text)} chars) is in "
+        f"observations[{index}]; print a slice such as observations[{index}][{head}:{head + 2000}] "
+        "instead of re-running the code] ...\n"
+        + text[-tail:]
+    )
+
+
+# ---------------------------------------------------------------------------
+# History management
+# ---------------------------------------------------------------------------
+
+# Earlier observations are cut to this many chars once compacted.
+_COMPACT_HEAD_CHARS = 400
+
+
+def _compact_observation(text):
+    if len(text) <= _COMPACT_HEAD_CHARS:
+        return text
+    return (
+        text[:_COMPACT_HEAD_CHARS]
+        + f"\n... [compacted: {len(text) - _COMPACT_HEAD_CHARS} chars of this earlier "
+        "observation removed to save context; full REPL outputs remain in `observations`]"
+    )
+
+
+class ChatHistory:
+    """
+    One chat session reused across RLM steps, with observation compaction.
+
+    The Gemini API is stateless, so every step still sends the whole
+    transcript, and the REPL observation previews are what grow it. Once
+    the last prompt exceeds `budget` tokens, user turns older than the
+    `keep_recent` most recent exchanges are cut to a short head, and the
+    chat is rebuilt from the compacted transcript. Until then the same
+    chat object is reused instead of being re-created every step.
+    """
+
+    def __init__(self, client, model_id, system_instruction,
+                 budget=RLM_HISTORY_TOKEN_BUDGET, keep_recent=RLM_HISTORY_KEEP_RECENT):
+        self.client = client
+        self.model_id = model_id
+        self.system_instruction = system_instruction
+        self.budget = budget
+        self.keep_recent = keep_recent
+
+        # Gemini-format turns ([{role: "user"|"model", parts:[{text}]}])
+        self.turns = []
+        self.prompt_tokens = []     # prompt_token_count of each successful send
+        self._chat = None
+        self._compacted = 0         # turns[:_compacted] are already compacted
+
+    def estimate_tokens(self, next_user_msg):
+        texts = [p["text"] for turn in self.turns for p in turn["parts"]]
+        return estimate_tokens(self.system_instruction, next_user_msg, *texts)
+
+    def _chat_session(self):
+        if self._chat is None:
+            self._chat = self.client.aio.chats.create(
+                model=self.model_id,
+                config=types.GenerateContentConfig(
+                    temperature=0,
+                    system_instruction=self.system_instruction,
+                ),
+                history=list(self.turns),
+            )
+        return self._chat
+
+    async def send(self, next_user_msg):
+        """Send one user turn on the live chat. The caller holds the scheduler slot."""
+        response = await self._chat_session().send_message(next_user_msg)
+        self.turns.append({"role": "user", "parts": [{"text": next_user_msg}]})
+        self.turns.append({"role": "model", "parts": [{"text": response.text or ""}]})
+        usage = response.usage_metadata
+        self.prompt_tokens.append((usage.prompt_token_count or 0) if usage else 0)
+        return response
+
+    def append_failed(self, next_user_msg):
+        """Keep a user turn whose send failed, so the model sees what it asked."""
+        self.turns.append({"role": "user", "parts": [{"text": next_user_msg}]})
+        self._chat = None
+
+    def compact_if_needed(self):
+        """Compact old observations when the last prompt went over budget. Returns chars saved."""
+        if not self.prompt_tokens or self.prompt_tokens[-1] <= self.budget:
+            return 0
+        # Turn 0 is the opening query; never touch it or the recent exchanges.
+        end = len(self.turns) - 2 * self.keep_recent
+        saved = 0
+        for turn in self.turns[max(1, self._compacted):max(1, end)]:
+            if turn["role"] != "user":
+                continue
+            text = turn["parts"][0]["text"]
+            compacted = _compact_observation(text)
+            saved += len(text) - len(compacted)
+            turn["parts"] = [{"text": compacted}]
+        self._compacted = max(self._compacted, end)
+        if saved:
+            self._chat = None  # rebuilt from the compacted transcript on next send
+        return saved
 
 
 # ---------------------------------------------------------------------------
@@ -81,39 +201,62 @@ class RLMAgent:
     client      : google.genai.Client
     model_id    : model name string passed to `client.chats.create`
     docs        : dict[str, str] — the corpus (bundled into `context`)
+    corpus      : optional engines.corpus_snapshot.CorpusSnapshot; when given,
+                  its shared `context` string and navigator are used by
+                  reference instead of rebuilding them from `docs`
     log_callback: optional callable(str) for UI-visible debug logs
     max_steps   : hard iteration cap. Gold uses 30; portfolio defaults to 10
                   to stay under the 15K-TPM free-tier budget.
     """
 
-    def __init__(self, client, model_id, docs=None, log_callback=None, max_steps=10):
+    def __init__(self, client, model_id, docs=None, log_callback=None, max_steps=10, corpus=None):
         self.client = client
         self.model_id = model_id
         self.max_steps = max_steps
-        self.log_callback = log_callback
+        # Relay so logs from the runtime loop and sandbox threads reach the UI.
+        self.log_callback = LogRelay(log_callback) if log_callback else None
 
+        if corpus is not None:
+            docs = corpus.raw_docs
         if self.log_callback:
             if docs and isinstance(docs, dict):
                 self.log_callback(f"🛠️ RLMAgent init. Docs: {list(docs.keys())}")
             else:
                 self.log_callback(f"🛠️ RLMAgent init. Docs passed? {bool(docs)}")
 
-        # Bundle docs into the `context` string the model is taught to navigate.
-        self.context = build_corpus(docs)
+        if corpus is not None:
+            # Shared per corpus generation — no per-turn copies.
+            self.context = corpus.context
+            self.navigator = corpus.navigator
+        else:
+            # Bundle docs into the `context` string the model is taught to navigate.
+            self.context = build_corpus(docs)
+            # File table / line index / outline / inverted index, cached per corpus.
+            self.navigator = get_navigator(self.context)
 
         # Cumulative token usage across root + sub-LLM calls.
-        self.token_usage = {"input": 0, "output": 0, "total": 0}
-
-        # Persistent REPL namespace
+        self.token_usage = {"input": 0, "output": 0, "total": 0, "prompt_per_step": []}
+        # Sub-LLM calls update token_usage from the runtime loop.
+        self._token_lock = threading.Lock()
+        # REPL snippet / llm_query profile for the current run (RLM_PROFILE_REPL).
+        self.profile = None
+        # Identical sub-LLM prompts are answered once (per run + shared LRU).
+        self.memo = LLMMemo(model_id, generation=self.navigator.key)
+
+        # Initial REPL bindings; each run executes them in a leased sandbox worker.
         self.repl_globals = {
             "llm_query": self.llm_query_callback,
             "llm_query_batched": self.llm_query_batched_callback,
             "context": self.context,
             "re": re,  # pre-imported for convenience, matches what the prompt uses
+            **self.navigator.repl_helpers(),  # list_files / read_file / search / outline
+            # Full text of every REPL output this turn; the chat only sees previews.
+            "observations": [],
         }
 
+        self.chat_history = ChatHistory(client, model_id, RLM_SYSTEM_PROMPT)
         # Gemini-format chat history ([{role: "user"|"model", parts:[{text}]}])
-        self.history = []
+        self.history = self.chat_history.turns
 
     # ------------------------------------------------------------------
     # Logging + token accounting
@@ -127,67 +270,144 @@ class RLMAgent:
     def _update_tokens(self, usage_metadata):
         if not usage_metadata:
             return
-        self.token_usage["input"] += usage_metadata.prompt_token_count or 0
-        self.token_usage["output"] += usage_metadata.candidates_token_count or 0
-        self.token_usage["total"] += usage_metadata.total_token_count or 0
+        with self._token_lock:
+            self.token_usage["input"] += usage_metadata.prompt_token_count or 0
+            self.token_usage["output"] += usage_metadata.candidates_token_count or 0
+            self.token_usage["total"] += usage_metadata.total_token_count or 0
 
     # ------------------------------------------------------------------
     # Sub-LLM callbacks exposed to the REPL
     # ------------------------------------------------------------------
 
-    def llm_query_callback(self, prompt_text):
-        """One-shot sub-LLM call (Gold: _llm_query)."""
-        self.log(f"sub-LLM query: {str(prompt_text)[:60]}...")
-        try:
-            response = self.client.models.generate_content(
+    async def _agenerate(self, prompt_text):
+        """Scheduled sub-LLM call on the async client."""
+        async with get_scheduler().aslot(PRIORITY_INTERACTIVE, estimate_tokens(prompt_text),
+                                          model=self.model_id) as slot:
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt_text,
                 config=types.GenerateContentConfig(temperature=0),
             )
-            self._update_tokens(response.usage_metadata)
-            return response.text
+            slot.record(response.usage_metadata)
+        self._update_tokens(response.usage_metadata)
+        return response
+
+    async def _asub_query(self, prompt_text):
+        """Memoized sub-LLM call. Never raises."""
+        try:
+            return await self.memo.call(prompt_text, lambda: self._agenerate(prompt_text))
         except Exception as e:
             return f"Error in llm_query: {e}"
 
+    async def _asub_query_batched(self, prompts):
+        results = await gather_bounded(
+            [self._asub_query(p) for p in prompts], SUB_LLM_MAX_CONCURRENCY
+        )
+        return [r if not isinstance(r, BaseException) else f"Error in llm_query: {r}" for r in results]
+
+    # REPL code runs on a sandbox thread, so the helpers it calls are sync
+    # and hand the actual request back to the runtime loop.
+
+    def llm_query_callback(self, prompt_text):
+        """One-shot sub-LLM call (Gold: _llm_query)."""
+        self.log(f"sub-LLM query: {str(prompt_text)[:60]}...")
+        t0 = time.perf_counter()
+        result = call_sync(self._asub_query(prompt_text))
+        if self.profile:
+            self.profile.add_llm_call(time.perf_counter() - t0)
+        return result
+
     def llm_query_batched_callback(self, prompts):
-        """Sequential fan-out (Gold uses concurrent socket dispatch)."""
+        """Concurrent fan-out (Gold: concurrent socket dispatch), results in order."""
+        prompts = list(prompts)
         self.log(f"sub-LLM batched query x{len(prompts)}")
-        return [self.llm_query_callback(p) for p in prompts]
+        t0 = time.perf_counter()
+        results = call_sync(self._asub_query_batched(prompts))
+        if self.profile:
+            self.profile.add_llm_call(time.perf_counter() - t0, len(prompts))
+        failed = sum(1 for r in results if isinstance(r, str) and r.startswith("Error in llm_query"))
+        if failed:
+            self.log(f"sub-LLM batch: {failed}/{len(prompts)} failed")
+        return results
 
     def execute_code(self, code):
-        return execute_sandbox_code(code, self.repl_globals)
+        return self.repl_globals.execute(code, profile=self.profile is not None)
+
+    def _observation_store(self):
+        """
+        The `observations` list the REPL currently sees. Generated code may
+        rebind the name (e.g. `observations = observations[-3:]`), so it is
+        looked up per output, and recreated if it was deleted or replaced by
+        something that is not a list; preview indices then match what the
+        model can read.
+        """
+        store = self.repl_globals.get("observations")
+        if not isinstance(store, list):
+            store = self.repl_globals["observations"] = []
+        return store
+
+    async def _aexecute_code(self, code):
+        # Off the loop: user code may block, and its llm_query calls re-enter the loop.
+        return await asyncio.to_thread(self.execute_code, code)
 
     # ------------------------------------------------------------------
     # Main loop
     # ------------------------------------------------------------------
 
-    def _send(self, next_user_msg):
+    async def _asend(self, next_user_msg):
         """
-        Send `next_user_msg` to the model using a fresh chat seeded with the
-        prior history. Returns the model's response text.
+        Send `next_user_msg` on the agent's ChatHistory session and record
+        the round-trip. Returns the model's response text.
 
         Using system_instruction puts the system prompt in its own slot,
         as recommended by the Gemini SDK, rather than pasting it into the
         first user turn.
         """
-        chat = self.client.chats.create(
-            model=self.model_id,
-            config=types.GenerateContentConfig(
-                temperature=0,
-                system_instruction=RLM_SYSTEM_PROMPT,
-            ),
-            history=self.history,
-        )
-        response = chat.send_message(next_user_msg)
+        tokens = self.chat_history.estimate_tokens(next_user_msg)
+        async with get_scheduler().aslot(PRIORITY_INTERACTIVE, tokens, model=self.model_id) as slot:
+            response = await self.chat_history.send(next_user_msg)
+            slot.record(response.usage_metadata)
         self._update_tokens(response.usage_metadata)
+
+        prompt_tokens = self.chat_history.prompt_tokens[-1]
+        self.token_usage["prompt_per_step"].append(prompt_tokens)
+        self.log(f"prompt tokens this step: {prompt_tokens}")
+        saved = self.chat_history.compact_if_needed()
+        if saved:
+            self.log(f"history over {self.chat_history.budget} tokens: compacted {saved} chars of older observations")
         return response.text or ""
 
     def completion(self, user_query):
         """
         Run the recursive loop. Returns (final_answer_text, token_usage_dict).
+        Blocks the calling thread; the loop itself runs on the agent runtime.
         """
-        self.token_usage = {"input": 0, "output": 0, "total": 0}
-        self.history = []
+        return run(self.acompletion(user_query), relay=self.log_callback)
+
+    async def acompletion(self, user_query):
+        """Coroutine form of completion()."""
+        sandbox = await asyncio.to_thread(get_sandbox_pool().lease, self.context)
+        initial = self.repl_globals
+        self.profile = RunProfile() if RLM_PROFILE_REPL else None
+        self.memo = LLMMemo(self.model_id, generation=self.navigator.key)
+        try:
+            # Persistent REPL namespace for this run, living in the sandbox worker.
+            self.repl_globals = sandbox.namespace(initial)
+            return await self._acompletion(user_query)
+        finally:
+            self.repl_globals = initial
+            sandbox.release()
+            self.memo.report(self.token_usage)
+            if self.memo.hits:
+                self.log(f"♻️ sub-LLM memo: {self.memo.hits} hits, ~{self.memo.tokens_saved} tokens saved")
+            if self.profile:
+                self.log(self.profile.summary())
+
+    async def _acompletion(self, user_query):
+        self.token_usage = {"input": 0, "output": 0, "total": 0, "prompt_per_step": []}
+        self.chat_history = ChatHistory(self.client, self.model_id, RLM_SYSTEM_PROMPT)
+        self.history = self.chat_history.turns
+        self.repl_globals["observations"] = []
 
         # Opening user turn: the query + a nudge to start by exploring.
         opening = (
@@ -203,18 +423,16 @@ class RLMAgent:
             self.log(f"--- step {step + 1}/{self.max_steps} ---")
 
             try:
-                response_text = self._send(next_user_msg)
+                response_text = await self._asend(next_user_msg)
             except Exception as e:
                 # Record the error as an observation so the model can recover.
                 self.log(f"Model call failed: {e}")
-                self.history.append({"role": "user", "parts": [{"text": next_user_msg}]})
+                self.chat_history.append_failed(next_user_msg)
                 next_user_msg = f"Previous step failed with error: {e}. Try again."
                 continue
 
-            # Persist the round-trip in history before we parse, so that
-            # later chat.create() calls see this turn.
-            self.history.append({"role": "user", "parts": [{"text": next_user_msg}]})
-            self.history.append({"role": "model", "parts": [{"text": response_text}]})
+            # ChatHistory.send() has already persisted the round-trip, so the
+            # model sees this turn next step even if it fails to parse.
             self.log(f"model: {response_text[:500]}")
 
             # 1) Is this the final answer?
@@ -229,9 +447,12 @@ class RLMAgent:
                 observations = []
                 for code in code_blocks:
                     self.log("executing code...")
-                    result = self.execute_code(code)
-                    rendered = format_execution_result(result)
-                    rendered = _truncate(rendered)
+                    result = await self._aexecute_code(code)
+                    if self.profile:
+                        self.log(self.profile.add_snippet(result))
+                    store = self._observation_store()
+                    store.append(format_execution_result(result))
+                    rendered = _preview(store[-1], len(store) - 1)
                     self.log(f"REPL output:\n{rendered}")
                     observations.append(
                         f"Code executed:\n```python\n{code}\n```\n\nREPL output:\n{rendered}"
@@ -255,7 +476,7 @@ class RLMAgent:
             "Respond with a single line: FINAL(your answer)."
         )
         try:
-            fallback = self._send(fallback_prompt)
+            fallback = await self._asend(fallback_prompt)
             final = find_final_answer(fallback, self.repl_globals)
             if final is not None:
                 return final, self.token_usage
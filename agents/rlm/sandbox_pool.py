@@ -0,0 +1,628 @@
+"""
+Sandbox pool — process-isolated execution of model-written REPL code.
+
+execute_sandbox_code() runs code with exec() inside the Streamlit server, so
+one runaway `while True` or a 10 GB list stalls every visitor, and its
+redirect_stdout is process-global. The pool moves that execution into
+worker processes:
+
+  * Workers are forked from a clean forkserver (spawn on Windows) and kept
+    warm between agent runs (RLM_SANDBOX_POOL_SIZE idle, at most
+    RLM_SANDBOX_MAX_WORKERS alive counting idle ones).
+  * The corpus string is published once per generation in a SharedMemory
+    block; a worker maps it when leased instead of receiving it over the
+    pipe, and keeps its own CorpusNavigator, so list_files / read_file /
+    search / outline / grep run locally in the worker. Every lease holds a
+    reference on its generation, which stays published (for re-attaching
+    after a restart) until the last sandbox bound to it is released.
+  * Each snippet has a wall-clock cap (RLM_SANDBOX_TIMEOUT_SECONDS, time
+    spent waiting on llm_query excluded). On timeout or crash the worker is
+    killed and replaced; the REPL keeps its corpus and helpers but loses the
+    variables defined so far.
+  * Each worker's address space is capped with RLIMIT_AS
+    (RLM_SANDBOX_MEMORY_MB, POSIX only), so a huge allocation raises
+    MemoryError inside the snippet instead of swapping the server.
+
+Agents lease one worker per run and build namespaces on it from the same
+dicts they used before. Values are translated automatically: the corpus
+string and navigator methods are bound worker-side, modules are re-imported,
+other callables (llm_query, llm_query_batched) become proxies that call back
+into the agent, and lists/dicts/sets (observations, findings) are shared —
+pushed before every snippet and copied back in place afterwards.
+
+Usage:
+    sandbox = get_sandbox_pool().lease(context)
+    try:
+        repl = sandbox.namespace({"context": context, "llm_query": fn, ...})
+        result = repl.execute(code)        # {stdout, stderr, execution_time[, profile]}
+        value = repl.get("answer")         # FINAL_VAR lookups
+    finally:
+        sandbox.release()
+
+With RLM_SANDBOX_ENABLED off, or where worker processes cannot start, lease()
+returns an in-process sandbox with the same interface.
+"""
+import atexit
+import contextlib
+import hashlib
+import io
+import itertools
+import multiprocessing
+import pickle
+import threading
+import time
+import types
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+from agents.rlm.base import _SAFE_BUILTINS, CorpusNavigator, SnippetProfiler, execute_sandbox_code
+from config.app_config import (
+    RLM_SANDBOX_ENABLED, RLM_SANDBOX_POOL_SIZE, RLM_SANDBOX_MAX_WORKERS,
+    RLM_SANDBOX_TIMEOUT_SECONDS, RLM_SANDBOX_MEMORY_MB,
+)
+
+# Timeout for control messages (attach, open, get), which may build an index.
+_CONTROL_TIMEOUT_SECONDS = 30.0
+# Corpus generations kept published (parent) and decoded (worker).
+_CORPUS_GENERATIONS = 2
+_SHARED_CONTAINERS = (list, dict, set)
+
+
+# ---------------------------------------------------------------------------
+# Worker process
+# ---------------------------------------------------------------------------
+
+def _limit_memory(limit_mb):
+    try:
+        import resource
+    except ImportError:  # Windows: only the wall-clock cap applies
+        return
+    limit = limit_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _portable(value):
+    """`value` if it can cross the pipe, else its str()."""
+    try:
+        pickle.dumps(value)
+        return value
+    except Exception:
+        return str(value)
+
+
+def _host_proxy(conn, ns_id, name):
+    def proxy(*args, **kwargs):
+        conn.send(("call", ns_id, name, args, kwargs))
+        status, value = conn.recv()
+        if status == "raise":
+            raise RuntimeError(value)
+        return value
+    proxy.__name__ = name
+    return proxy
+
+
+def _build_namespace(conn, ns_id, spec, context, navigator):
+    ns = {"__builtins__": _SAFE_BUILTINS.copy()}
+    for name, (kind, payload) in spec.items():
+        if kind == "corpus":
+            ns[name] = context
+        elif kind == "nav":
+            ns[name] = getattr(navigator, payload)
+        elif kind == "module":
+            ns[name] = __import__(payload)
+        elif kind == "host":
+            ns[name] = _host_proxy(conn, ns_id, name)
+        else:
+            ns[name] = payload
+    return ns
+
+
+def _run_snippet(ns, code, shared, profile):
+    ns.update(shared)
+    stdout_buf = io.StringIO()
+    stderr_buf = io.StringIO()
+    profiler = None
+    t0 = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(stdout_buf), contextlib.redirect_stderr(stderr_buf):
+            if profile:
+                profiler = SnippetProfiler(code)
+                with profiler:
+                    exec(profiler.compiled, ns)
+            else:
+                exec(code, ns)
+        stderr = stderr_buf.getvalue()
+    except BaseException as e:  # incl. SystemExit: the worker must survive the snippet
+        stderr = stderr_buf.getvalue() + f"\n{type(e).__name__}: {e}"
+    result = {
+        "stdout": stdout_buf.getvalue(),
+        "stderr": stderr,
+        "execution_time": time.perf_counter() - t0,
+        "shared": {name: _portable(ns.get(name)) for name in shared},
+    }
+    if profiler is not None:
+        result["profile"] = profiler.result()
+    return result
+
+
+def _worker_main(conn, memory_limit_mb):
+    """Serve one lease at a time: attach, open namespaces, run snippets."""
+    _limit_memory(memory_limit_mb)
+    corpora = OrderedDict()      # key -> (context, navigator)
+    context, navigator = "", None
+    namespaces = {}
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            return
+        op = msg[0]
+        try:
+            if op == "attach":
+                _, key, shm_name, size = msg
+                if key not in corpora:
+                    shm = shared_memory.SharedMemory(name=shm_name)
+                    try:
+                        text = bytes(shm.buf[:size]).decode("utf-8")
+                    finally:
+                        shm.close()
+                    corpora[key] = (text, CorpusNavigator(text))
+                    while len(corpora) > _CORPUS_GENERATIONS:
+                        corpora.popitem(last=False)
+                corpora.move_to_end(key)
+                context, navigator = corpora[key]
+                conn.send(("ok", None))
+            elif op == "open":
+                _, ns_id, spec = msg
+                namespaces[ns_id] = _build_namespace(conn, ns_id, spec, context, navigator)
+                conn.send(("ok", None))
+            elif op == "exec":
+                _, ns_id, code, shared, profile = msg
+                conn.send(("ok", _run_snippet(namespaces[ns_id], code, shared, profile)))
+            elif op == "get":
+                _, ns_id, name = msg
+                ns = namespaces[ns_id]
+                if name in ns and name != "__builtins__":
+                    conn.send(("ok", _portable(ns[name])))
+                else:
+                    conn.send(("missing", name))
+            elif op == "reset":
+                namespaces.clear()
+        except (EOFError, OSError):
+            return
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+# ---------------------------------------------------------------------------
+# Parent side
+# ---------------------------------------------------------------------------
+
+class SandboxUnavailable(RuntimeError):
+    """The worker died or stopped answering; it has been replaced."""
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child, RLM_SANDBOX_MEMORY_MB),
+            name="rlm-sandbox", daemon=True,
+        )
+        self.process.start()
+        child.close()
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def kill(self):
+        with contextlib.suppress(Exception):
+            self.process.kill()
+            self.process.join(timeout=1)
+        with contextlib.suppress(Exception):
+            self.conn.close()
+
+
+class ProcessNamespace:
+    """
+    One REPL namespace living in a leased worker. Supports execute(), plus
+    `name in ns`, ns[name], ns.get(name) and ns[name] = value.
+    """
+
+    def __init__(self, sandbox, ns_id, initial):
+        self.sandbox = sandbox
+        self.ns_id = ns_id
+        self._spec = {}
+        self._host = {}
+        self._shared = {}
+        self._opened = None      # sandbox restart count when opened
+        for name, value in initial.items():
+            self._add(name, value)
+
+    def _add(self, name, value):
+        if isinstance(value, str) and value is self.sandbox.context:
+            self._spec[name] = ("corpus", None)
+        elif isinstance(value, types.ModuleType):
+            self._spec[name] = ("module", value.__name__)
+        elif isinstance(getattr(value, "__self__", None), CorpusNavigator):
+            self._spec[name] = ("nav", value.__func__.__name__)
+        elif callable(value):
+            self._spec[name] = ("host", None)
+            self._host[name] = value
+        else:
+            self._spec[name] = ("value", value)
+            if isinstance(value, _SHARED_CONTAINERS):
+                self._shared[name] = value
+
+    def _ensure_open(self):
+        self.sandbox._ensure_attached()
+        if self._opened != self.sandbox.restarts:
+            # Current values of shared containers, not the ones seen at init.
+            spec = {n: ("value", self._shared[n]) if n in self._shared else s
+                    for n, s in self._spec.items()}
+            self.sandbox._request(("open", self.ns_id, spec), self)
+            self._opened = self.sandbox.restarts
+
+    def execute(self, code, profile=False):
+        """Run `code` in the worker. Returns {stdout, stderr, execution_time[, profile]}."""
+        with self.sandbox.lock:
+            t0 = time.perf_counter()
+            try:
+                self._ensure_open()
+                result = self.sandbox._request(
+                    ("exec", self.ns_id, code, self._shared, profile), self,
+                    timeout=self.sandbox.timeout,
+                )
+            except SandboxUnavailable as e:
+                return {"stdout": "", "stderr": str(e), "execution_time": time.perf_counter() - t0}
+            for name, value in result.pop("shared").items():
+                _copy_into(self._shared[name], value)
+        return result
+
+    def __getitem__(self, name):
+        if name in self._shared:
+            return self._shared[name]
+        with self.sandbox.lock:
+            try:
+                self._ensure_open()
+                return self.sandbox._request(("get", self.ns_id, name), self)
+            except SandboxUnavailable:
+                raise KeyError(name)
+
+    def __setitem__(self, name, value):
+        self._add(name, value)
+        self._opened = None      # re-open with the new binding on next use
+
+    def __contains__(self, name):
+        try:
+            self[name]
+            return True
+        except KeyError:
+            return False
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+
+def _copy_into(target, value):
+    """Update a shared container in place so the agent's references stay valid."""
+    if type(value) is not type(target):
+        return
+    if isinstance(target, list):
+        target[:] = value
+    else:
+        target.clear()
+        target.update(value)
+
+
+class Sandbox:
+    """A worker leased for one agent run. Thread-safe; snippets run one at a time."""
+
+    def __init__(self, pool, worker, context, key, shm):
+        self.pool = pool
+        self.worker = worker
+        self.context = context
+        self.timeout = RLM_SANDBOX_TIMEOUT_SECONDS
+        self.lock = threading.RLock()
+        self.restarts = 0
+        self._key = key
+        self._shm = shm
+        self._ids = itertools.count()
+        self._attached = False
+        self._attach()
+
+    def _attach(self):
+        """Map the published corpus in the worker; raises SandboxUnavailable on failure."""
+        self._attached = False
+        try:
+            self._request(("attach", self._key, self._shm.name, self._shm.size_used), None)
+        except SandboxUnavailable:
+            raise
+        except Exception as e:
+            raise SandboxUnavailable(f"The sandbox could not load the corpus ({e}).")
+        self._attached = True
+
+    def _ensure_attached(self):
+        if not self._attached:
+            self._attach()
+
+    def namespace(self, initial):
+        """Create a namespace from a dict of initial bindings (see module docstring)."""
+        return ProcessNamespace(self, next(self._ids), dict(initial))
+
+    def _request(self, msg, ns, timeout=_CONTROL_TIMEOUT_SECONDS):
+        """
+        Send `msg` and wait for the reply, serving llm_query callbacks from
+        the worker meanwhile. Time spent in callbacks does not count against
+        `timeout`.
+        """
+        conn = self.worker.conn
+        deadline = time.monotonic() + timeout
+        try:
+            conn.send(msg)
+            while True:
+                if not conn.poll(max(0.0, deadline - time.monotonic())):
+                    self._restart()
+                    raise SandboxUnavailable(
+                        f"TimeoutError: REPL code exceeded the {timeout:.0f}s time limit. "
+                        "The sandbox was restarted; variables from earlier steps are lost "
+                        "(context and helpers are still available)."
+                    )
+                reply = conn.recv()
+                if reply[0] != "call":
+                    break
+                _, _, name, args, kwargs = reply
+                started = time.monotonic()
+                try:
+                    conn.send(("return", _portable(ns._host[name](*args, **kwargs))))
+                except Exception as e:
+                    conn.send(("raise", f"{type(e).__name__}: {e}"))
+                deadline += time.monotonic() - started
+        except (EOFError, OSError, BrokenPipeError):
+            self._restart()
+            raise SandboxUnavailable(
+                "MemoryError: the sandbox process was terminated (likely out of memory). "
+                "It was restarted; variables from earlier steps are lost."
+            )
+
+        status, value = reply
+        if status == "missing":
+            raise KeyError(value)
+        if status == "error":
+            raise RuntimeError(f"sandbox error: {value}")
+        return value
+
+    def _restart(self):
+        print(f"[Sandbox] restarting worker pid={self.worker.process.pid}")
+        self.worker.kill()
+        self.worker = self.pool._spawn()
+        self.restarts += 1
+        self._attach()
+
+    def release(self):
+        """Return the worker to the pool. The sandbox must not be used afterwards."""
+        with self.lock:
+            self.pool._checkin(self.worker)
+            self.pool._unpublish(self._shm)
+            self.worker = None
+
+
+class InlineNamespace(dict):
+    """In-process namespace with the ProcessNamespace interface."""
+
+    def execute(self, code, profile=False):
+        return execute_sandbox_code(code, self, profile)
+
+
+class InlineSandbox:
+    """Fallback when worker processes are disabled or unavailable."""
+
+    def __init__(self, context):
+        self.context = context
+
+    def namespace(self, initial):
+        return InlineNamespace(initial)
+
+    def release(self):
+        pass
+
+
+class _PublishedCorpus:
+    def __init__(self, context):
+        data = context.encode("utf-8")
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        self.shm.buf[:len(data)] = data
+        self.name = self.shm.name
+        self.size_used = len(data)
+        self.leases = 0          # sandboxes bound to this corpus (pool lock held)
+
+    def unlink(self):
+        with contextlib.suppress(Exception):
+            self.shm.close()
+            self.shm.unlink()
+
+
+class SandboxPool:
+    """Process-wide pool of sandbox workers (see module docstring)."""
+
+    def __init__(self, pool_size, max_workers):
+        self.pool_size = pool_size
+        self.max_workers = max_workers
+        self.enabled = RLM_SANDBOX_ENABLED
+        self._ctx = None
+        self._cond = threading.Condition()
+        self._idle = []
+        self._busy = 0
+        self._preforking = 0            # workers _top_up is starting right now
+        self._corpora = OrderedDict()   # key -> _PublishedCorpus
+
+    def _context(self):
+        if self._ctx is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                self._ctx = multiprocessing.get_context("forkserver")
+                # Keep the forkserver free of Streamlit: workers only need this module.
+                self._ctx.set_forkserver_preload([__name__])
+            else:
+                self._ctx = multiprocessing.get_context("spawn")
+        return self._ctx
+
+    def _spawn(self):
+        return _Worker(self._context())
+
+    def _publish(self, context):
+        """Publish `context` (once per generation) and take a lease on it."""
+        key = hashlib.sha1(context.encode("utf-8", errors="replace")).hexdigest()
+        with self._cond:
+            published = self._corpora.get(key)
+            if published is None:
+                published = self._corpora[key] = _PublishedCorpus(context)
+            self._corpora.move_to_end(key)
+            published.leases += 1
+            self._evict()
+            return key, published
+
+    def _unpublish(self, published):
+        """Drop a lease taken by _publish()."""
+        with self._cond:
+            published.leases -= 1
+            self._evict()
+
+    def _evict(self):
+        """
+        Unlink the oldest generations beyond _CORPUS_GENERATIONS. A generation
+        a sandbox is still bound to stays published (its worker re-attaches
+        by name after a restart) until its last lease is released.
+        """
+        excess = len(self._corpora) - _CORPUS_GENERATIONS
+        for key in list(self._corpora):
+            if excess <= 0:
+                break
+            if self._corpora[key].leases == 0:
+                self._corpora.pop(key).unlink()
+                excess -= 1
+
+    def _checkout(self):
+        with self._cond:
+            while True:
+                while self._idle:
+                    worker = self._idle.pop()
+                    if worker.alive():
+                        self._busy += 1
+                        return worker
+                    worker.kill()
+                if self._busy + self._preforking < self.max_workers:
+                    self._busy += 1
+                    break
+                self._cond.wait()
+        try:
+            return self._spawn()
+        except Exception:
+            with self._cond:
+                self._busy -= 1
+                self._cond.notify()
+            raise
+
+    def _checkin(self, worker):
+        keep = False
+        if worker is not None and worker.alive():
+            with contextlib.suppress(Exception):
+                worker.conn.send(("reset",))
+                keep = True
+        with self._cond:
+            self._busy -= 1
+            if keep and len(self._idle) < self.pool_size:
+                self._idle.append(worker)
+                worker = None
+            self._cond.notify()
+        if worker is not None:
+            worker.kill()
+
+    def _top_up(self):
+        """
+        Pre-fork idle workers so the next lease does not wait for a process
+        start. Leased, idle and starting workers together stay within
+        max_workers.
+        """
+        with self._cond:
+            live = self._busy + len(self._idle) + self._preforking
+            missing = min(self.pool_size - len(self._idle) - self._preforking,
+                          self.max_workers - live)
+            if missing <= 0:
+                return
+            self._preforking += missing
+        for started in range(missing):
+            try:
+                worker = self._spawn()
+            except Exception:
+                with self._cond:
+                    self._preforking -= missing - started
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._preforking -= 1
+                if len(self._idle) < self.pool_size:
+                    self._idle.append(worker)
+                    worker = None
+                self._cond.notify_all()
+            if worker is not None:
+                worker.kill()
+
+    def lease(self, context):
+        """
+        Lease a worker holding `context` for one agent run. Blocks while
+        RLM_SANDBOX_MAX_WORKERS runs are in flight. Call release() when done.
+        """
+        if not self.enabled:
+            return InlineSandbox(context)
+        published = None
+        try:
+            key, published = self._publish(context)
+            worker = self._checkout()
+        except Exception as e:
+            if published is not None:
+                self._unpublish(published)
+            print(f"[Sandbox] worker processes unavailable ({e}); running REPL code in-process")
+            self.enabled = False
+            return InlineSandbox(context)
+        try:
+            sandbox = Sandbox(self, worker, context, key, published)
+        except Exception as e:
+            self._checkin(None)
+            self._unpublish(published)
+            worker.kill()
+            if not isinstance(e, SandboxUnavailable):
+                raise
+            print(f"[Sandbox] {e} Running this run's REPL code in-process")
+            return InlineSandbox(context)
+        threading.Thread(target=self._top_up, name="rlm-sandbox-prefork", daemon=True).start()
+        return sandbox
+
+    def shutdown(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            corpora, self._corpora = list(self._corpora.values()), OrderedDict()
+        for worker in idle:
+            worker.kill()
+        for published in corpora:
+            published.unlink()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Return the process-wide sandbox pool shared by all Streamlit sessions."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool(RLM_SANDBOX_POOL_SIZE, RLM_SANDBOX_MAX_WORKERS)
+            atexit.register(_pool.shutdown)
+    return _pool
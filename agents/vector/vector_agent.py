@@ -1,5 +1,9 @@
+import asyncio
+
 from google import genai
 from .vector_store import VectorEngine
+from engines.agent_runtime import LogRelay, run
+from engines.request_scheduler import PRIORITY_INTERACTIVE, estimate_tokens, get_scheduler
 from config.app_config import (
     EMBEDDING_MODEL_ID, 
     VECTOR_CONFIDENCE_HIGH, 
@@ -8,12 +12,14 @@ from config.app_config import (
 )
 
 class VectorRAGAgent:
-    def __init__(self, client, model_id, api_key, docs=None, log_callback=None):
+    def __init__(self, client, model_id, api_key, docs=None, file_hashes=None, log_callback=None):
         self.client = client
         self.model_id = model_id
         self.api_key = api_key
         self.docs = docs or {}
-        self.log_callback = log_callback
+        # {filename: md5} for docs, from the CorpusSnapshot (skips re-hashing the corpus)
+        self.file_hashes = file_hashes
+        self.log_callback = LogRelay(log_callback) if log_callback else None
         self.token_usage = {'total': 0}
 
     def log(self, msg):
@@ -27,6 +33,10 @@ class VectorRAGAgent:
         Executes standard Vector RAG.
         Returns: (response_text, token_stats)
         """
+        return run(self.acompletion(user_query, verify_enabled), relay=self.log_callback)
+
+    async def acompletion(self, user_query, verify_enabled=False):
+        """Coroutine form of completion(). Index and search calls run off the loop."""
         ve = VectorEngine(
             api_key=self.api_key, 
             model_id=EMBEDDING_MODEL_ID,
@@ -34,15 +44,17 @@ class VectorRAGAgent:
         )
         self.log(f"Vector Database Status: {ve.count()} chunks indexed.")
 
-        if ve.is_stale(self.docs):
+        if ve.is_stale(self.docs, self.file_hashes):
             self.log("⚠️ Index is stale or empty — rebuilding...")
-            num_chunks = ve.build_index(self.docs, status_callback=self.log)
+            num_chunks = await asyncio.to_thread(
+                ve.build_index, self.docs, status_callback=self.log, file_hashes=self.file_hashes
+            )
             self.log(f"✅ Indexed {num_chunks} chunks from {len(self.docs)} files.")
         else:
             self.log("✅ Index is fresh. Using existing index.")
 
         self.log(f"🔍 Searching knowledge base for: '{user_query}'")
-        search_results = ve.search(user_query, k=5)
+        search_results = await asyncio.to_thread(ve.search, user_query, k=5)
         
         # Calculate Match Quality (Cosine distance: 0 is 100%, 1.0+ is 0%)
         matches = []
@@ -109,14 +121,17 @@ class VectorRAGAgent:
 
         self.log("Generating answer...")
         
-        chat = self.client.chats.create(
+        chat = self.client.aio.chats.create(
             model=self.model_id,
             config=genai.types.GenerateContentConfig(
                 temperature=0,
                 system_instruction=system_prompt
             ),
         )
-        response = chat.send_message("User Question: " + user_query)
+        async with get_scheduler().aslot(PRIORITY_INTERACTIVE, estimate_tokens(system_prompt, user_query),
+                                        model=self.model_id) as slot:
+            response = await chat.send_message("User Question: " + user_query)
+            slot.record(getattr(response, "usage_metadata", None))
         self.log("Answer received.")
 
         if hasattr(response, "usage_metadata") and response.usage_metadata:
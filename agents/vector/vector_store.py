@@ -1,26 +1,38 @@
 import os
-import re
-import time
 import hashlib
 from typing import Dict, List, Optional, Callable
 import chromadb
 from google import genai
 
+from engines.model_router import classify_error, retry_delay_seconds
+from engines.request_scheduler import (
+    PRIORITY_INDEXING,
+    PRIORITY_INTERACTIVE,
+    get_scheduler,
+)
 
-def _corpus_fingerprint(docs_dict: Dict[str, str], model_id: str) -> str:
+
+def _file_hash(content: str) -> str:
+    return hashlib.md5(content.encode(errors="replace")).hexdigest()
+
+
+def _corpus_fingerprint(docs_dict: Dict[str, str], model_id: str,
+                        file_hashes: Optional[Dict[str, str]] = None) -> str:
     """
     Compute a stable fingerprint for the given corpus and model.
 
     Includes the model_id so that switching embedding models correctly
-    invalidates old indices.
+    invalidates old indices. `file_hashes` ({filename: md5}, e.g. from a
+    CorpusSnapshot) skips re-hashing documents that were already hashed.
     """
+    file_hashes = file_hashes or {}
     h = hashlib.md5()
     h.update(model_id.encode())
     for fname in sorted(docs_dict.keys()):
         content = docs_dict[fname]
         h.update(fname.encode())
         h.update(str(len(content)).encode())
-        h.update(hashlib.md5(content.encode(errors="replace")).hexdigest().encode())
+        h.update((file_hashes.get(fname) or _file_hash(content)).encode())
     return h.hexdigest()
 
 
@@ -38,7 +50,7 @@ class VectorEngine:
             metadata={"hnsw:space": "cosine"}  # Cosine similarity
         )
 
-    def is_stale(self, docs_dict: Dict[str, str]) -> bool:
+    def is_stale(self, docs_dict: Dict[str, str], file_hashes: Optional[Dict[str, str]] = None) -> bool:
         """
         Return True if the persisted index does not match the current corpus.
 
@@ -51,33 +63,35 @@ class VectorEngine:
             return True
         meta = self.collection.metadata or {}
         stored = meta.get("corpus_fingerprint", "")
-        return stored != _corpus_fingerprint(docs_dict, self.model_id)
+        return stored != _corpus_fingerprint(docs_dict, self.model_id, file_hashes)
 
-    def get_embedding(self, text: str, max_retries: int = 5) -> List[float]:
+    def get_embedding(self, text: str, max_retries: int = 5,
+                      priority: int = PRIORITY_INTERACTIVE) -> List[float]:
         """
-        Embed `text` with automatic retry on 429 RESOURCE_EXHAUSTED.
+        Embed `text` through the shared request scheduler.
+
+        On 429 RESOURCE_EXHAUSTED the scheduler pauses this priority class for
+        the server-suggested delay and the call re-queues behind it, so query
+        embeddings and other sessions' answers are not stuck behind a sleep.
         """
+        scheduler = get_scheduler()
+        # Embeddings have no output tokens; ~4 chars per input token.
+        tokens = max(1, len(text) // 4)
         for attempt in range(max_retries):
             try:
-                result = self.genai_client.models.embed_content(
-                    model=self.model_id,
-                    contents=text
-                )
+                with scheduler.slot(priority, tokens, model=self.model_id):
+                    result = self.genai_client.models.embed_content(
+                        model=self.model_id,
+                        contents=text
+                    )
                 return result.embeddings[0].values
             except Exception as e:
-                msg = str(e)
-                if "429" in msg or "RESOURCE_EXHAUSTED" in msg:
-                    # Try to extract the suggested retry delay from the error
-                    # message. The API returns something like 'retryDelay': '33s'.
-                    delay_match = re.search(r"retryDelay.*?(\d+)s", msg)
-                    wait = int(delay_match.group(1)) if delay_match else (30 * (attempt + 1))
-                    # Add a small buffer so we don't hit the boundary again
-                    wait = min(wait + 2, 120)
+                if classify_error(e) == "rate_limit":
+                    wait = retry_delay_seconds(e)
                     if self.log_callback:
-                        self.log_callback(f"⏳ Rate limit hit. Waiting {wait}s before retry {attempt + 1}/{max_retries}...")
+                        self.log_callback(f"⏳ Rate limit hit. Re-queued for ~{wait}s (retry {attempt + 1}/{max_retries})...")
                     else:
-                        print(f"[VectorEngine] Rate limit. Sleeping {wait}s...")
-                    time.sleep(wait)
+                        print(f"[VectorEngine] Rate limit. Re-queued for ~{wait}s...")
                 else:
                     # Non-rate-limit error — surface immediately
                     self.last_error = f"{self.model_id}: {e}"
@@ -113,10 +127,13 @@ class VectorEngine:
 
         return chunks
 
-    def build_index(self, docs_dict: Dict[str, str], status_callback: Optional[Callable] = None) -> int:
+    def build_index(self, docs_dict: Dict[str, str], status_callback: Optional[Callable] = None,
+                    file_hashes: Optional[Dict[str, str]] = None) -> int:
         """
-        Incrementally builds the Vector Index. Only re-embeds files that have changed.
+        Incrementally builds the Vector Index. Only re-embeds files that have
+        changed, and within a changed file only chunks whose text changed.
         docs_dict: {filename: content_string}
+        file_hashes: optional precomputed {filename: md5} for docs_dict
         """
         import json
         meta = self.collection.metadata or {}
@@ -141,9 +158,10 @@ class VectorEngine:
                     metadata={"hnsw:space": "cosine"}
                 )
 
+        file_hashes = file_hashes or {}
         current_hashes = {}
         for filename, content in docs_dict.items():
-            current_hashes[filename] = hashlib.md5(content.encode(errors="replace")).hexdigest()
+            current_hashes[filename] = file_hashes.get(filename) or _file_hash(content)
 
         files_to_embed = []
         files_to_delete = []
@@ -163,6 +181,20 @@ class VectorEngine:
             if status_callback: status_callback("✅ Index is already up-to-date.")
             return 0
 
+        # Keep the embeddings of a changed file's chunks so unchanged chunk
+        # text is not re-embedded.
+        reusable = {}
+        for filename in files_to_embed:
+            if filename in stored_hashes:
+                old = self.collection.get(where={"source": filename}, include=["documents", "embeddings"])
+                # Newer chromadb returns embeddings as a 2-D numpy array, whose
+                # truth value is ambiguous: test for None explicitly.
+                old_docs = old.get("documents")
+                old_docs = [] if old_docs is None else list(old_docs)
+                old_embs = old.get("embeddings")
+                old_embs = [] if old_embs is None else list(old_embs)
+                reusable[filename] = dict(zip(old_docs, old_embs))
+
         # Delete stale chunks
         for filename in files_to_delete:
             if status_callback: status_callback(f"Removing old chunks for {filename}...")
@@ -180,12 +212,19 @@ class VectorEngine:
             content = docs_dict[filename]
             if status_callback: status_callback(f"Embedding {filename}...")
             chunks = self.chunk_text(content)
+            previous = reusable.get(filename, {})
+            reused = 0
             
             file_failed = False
             for i, chunk in enumerate(chunks):
                 chunk_id = hashlib.md5(f"{filename}_{i}".encode()).hexdigest()
-                emb = self.get_embedding(chunk)
-                if emb:
+                emb = previous.get(chunk)
+                if emb is not None:
+                    emb = [float(x) for x in emb]
+                    reused += 1
+                else:
+                    emb = self.get_embedding(chunk, priority=PRIORITY_INDEXING)
+                if emb is not None and len(emb) > 0:
                     ids.append(chunk_id)
                     documents.append(chunk)
                     embeddings.append(emb)
@@ -196,6 +235,8 @@ class VectorEngine:
                         status_callback(f"❌ Error embedding chunk: {self.last_error}")
                         self.last_error = None
             
+            if reused and status_callback:
+                status_callback(f"♻️ Reused {reused}/{len(chunks)} unchanged chunk embeddings for {filename}.")
             if file_failed:
                 failed_files.add(filename)
 
@@ -221,7 +262,7 @@ class VectorEngine:
             if filename not in failed_files:
                 stored_hashes[filename] = current_hashes[filename]
 
-        fingerprint = _corpus_fingerprint(docs_dict, self.model_id)
+        fingerprint = _corpus_fingerprint(docs_dict, self.model_id, file_hashes)
         
         self.collection.modify(metadata={
             "corpus_fingerprint": fingerprint,
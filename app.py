@@ -13,7 +13,7 @@ from config.app_config import (
 )
 from styles import APP_CSS, WARNING_STYLE
 from state import init_session_state, log_event
-from engines.trace_engine import load_corpus
+from engines.corpus_snapshot import get_corpus_store
 from utils.sidebar import render_sidebar
 
 from components.chat_renderer import render_chat_history, render_document_viewer
@@ -27,29 +27,12 @@ st.set_page_config(layout=PAGE_LAYOUT, page_title=PAGE_TITLE, page_icon=PAGE_ICO
 st.markdown(APP_CSS, unsafe_allow_html=True)
 
 # --- Data Ingestion ---
-def get_dir_mtime(dir_path: str = "data") -> float:
-    """Returns the latest modification time of any file in the directory."""
-    if not os.path.exists(dir_path):
-        return 0.0
-    max_mtime = 0.0
-    for root, _, files in os.walk(dir_path):
-        for f in files:
-            mtime = os.path.getmtime(os.path.join(root, f))
-            max_mtime = max(max_mtime, mtime)
-    return max_mtime
-
-@st.cache_data
-def get_cached_corpus(mtime: float):
-    return load_corpus()
-
-# By passing the latest mtime, the cache automatically invalidates if any file is edited manually!
-_raw_docs = get_cached_corpus(get_dir_mtime("data"))
-
-# Exclude internal-only files that are not meant for user-facing RAG retrieval.
-# portfolio_capabilities.md is used only by the Workflow Intelligence classifier;
-# including it causes the AI to see near-duplicate content and repeat answers.
-_INTERNAL_DOCS = {"data/portfolio_capabilities.md", "data\\portfolio_capabilities.md"}
-docs = {k: v for k, v in _raw_docs.items() if k not in _INTERNAL_DOCS}
+# Every rerun and session shares the store's current snapshot (no per-rerun
+# copy); CorpusSnapshot drops internal-only files such as
+# portfolio_capabilities.md and builds its views once. Files edited manually
+# are detected by mtime/size and reloaded individually.
+corpus = get_corpus_store().current()
+docs = corpus.docs
 
 # --- LLM Setup ---
 api_key = st.secrets.get("GOOGLE_API_KEY") or os.getenv("GOOGLE_API_KEY")
@@ -174,7 +157,7 @@ try:
         if pending_ckpt and pending_ckpt.get("status") == "user_responded":
             # User responded to a checkpoint — resume generation
             if client:
-                resume_from_checkpoint(client, agent_mode, docs, api_key)
+                resume_from_checkpoint(client, agent_mode, corpus, api_key)
             else:
                 st.error("AI model not configured.")
 
@@ -183,7 +166,7 @@ try:
                 prompt_text = st.session_state.messages[-1]["content"]
                 # Pre-generation checkpoint check (may set pending_checkpoint and rerun)
                 if not check_and_set_checkpoint(client, prompt_text):
-                    generate_answer(client, agent_mode, prompt_text, docs, api_key)
+                    generate_answer(client, agent_mode, prompt_text, corpus, api_key)
             else:
                 st.error("AI model not configured.")
 
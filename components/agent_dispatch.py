@@ -61,19 +61,19 @@ def _deduplicate_response(text):
     return text
 
 
-def _run_agent(client, agent_mode, prompt_text, docs, api_key, steps_log, status=None):
+def _run_agent(client, agent_mode, prompt_text, corpus, api_key, steps_log, status=None):
     """Run the selected agent and return (response_text, token_stats)."""
-    raw_docs = {k: v for k, v in docs.items() if "summaries/" not in k.replace("\\", "/")}
     logger = _make_logger(status, steps_log) if status else None
 
     if agent_mode == MODE_RLM:
         log_event("RLM Mode Selected")
-        agent = RLMAgent(client, MODEL_ID, docs=raw_docs, log_callback=logger)
+        agent = RLMAgent(client, MODEL_ID, corpus=corpus, log_callback=logger)
         response_text, token_stats = agent.completion(prompt_text)
 
     elif agent_mode == MODE_VECTOR_RAG:
         log_event("Vector RAG Mode Selected")
-        agent = VectorRAGAgent(client, MODEL_ID, api_key=api_key, docs=raw_docs, log_callback=logger)
+        agent = VectorRAGAgent(client, MODEL_ID, api_key=api_key, docs=corpus.raw_docs,
+                               file_hashes=corpus.file_hashes, log_callback=logger)
         response_text, token_stats = agent.completion(
             prompt_text,
             verify_enabled=st.session_state.verify_enabled
@@ -81,7 +81,7 @@ def _run_agent(client, agent_mode, prompt_text, docs, api_key, steps_log, status
 
     else:  # MODE_FILE_BASED
         log_event("File-Based Context Mode Selected")
-        agent = FileBasedAgent(client, MODEL_ID, docs=docs, log_callback=logger)
+        agent = FileBasedAgent(client, MODEL_ID, docs=corpus.docs, log_callback=logger)
         response_text, token_stats = agent.completion(
             user_query=prompt_text,
             chat_history=st.session_state.messages[:-1],
@@ -91,7 +91,7 @@ def _run_agent(client, agent_mode, prompt_text, docs, api_key, steps_log, status
     return response_text, token_stats
 
 
-def _run_post_generation(client, prompt_text, response_text, docs, steps_log, token_stats, status=None, force_concern_category=None):
+def _run_post_generation(client, prompt_text, response_text, corpus, steps_log, token_stats, status=None, force_concern_category=None):
     """Run trace engine + workflow intelligence, then append the response."""
     # Global deduplication guard
     response_text = _deduplicate_response(response_text)
@@ -102,7 +102,7 @@ def _run_post_generation(client, prompt_text, response_text, docs, steps_log, to
     if st.session_state.verify_enabled:
         if status: status.update(label="🔍 Verifying sources...", expanded=False)
         log_event("Verifying sources (Trace Engine)...")
-        traced_html, sources = find_maximal_matches(response_text, docs)
+        traced_html, sources = find_maximal_matches(response_text, corpus.docs)
 
     st.session_state.last_html_debug = traced_html
 
@@ -199,7 +199,7 @@ def check_and_set_checkpoint(client, prompt_text):
     return True  # unreachable after rerun, but semantically correct
 
 
-def resume_from_checkpoint(client, agent_mode, docs, api_key):
+def resume_from_checkpoint(client, agent_mode, corpus, api_key):
     """
     Resume generation after the user responded to a checkpoint.
     Builds an enriched prompt from the checkpoint + user decision, then
@@ -233,7 +233,7 @@ def resume_from_checkpoint(client, agent_mode, docs, api_key):
             
             _run_post_generation(
                 client, checkpoint["original_message"], response_text,
-                docs, steps_log, token_stats, status=None, force_concern_category=force_concern
+                corpus, steps_log, token_stats, status=None, force_concern_category=force_concern
             )
             return
 
@@ -241,19 +241,19 @@ def resume_from_checkpoint(client, agent_mode, docs, api_key):
         label = "🧠 Thinking..." if agent_mode == MODE_RLM else "🛠️ Generating Answer..."
         with st.status(label, expanded=True) as status:
             response_text, token_stats = _run_agent(
-                client, agent_mode, enriched_prompt, docs, api_key, steps_log, status=status
+                client, agent_mode, enriched_prompt, corpus, api_key, steps_log, status=status
             )
             st.session_state.turn_tokens += token_stats.get("total", 0)
                 
             _run_post_generation(
                 client, checkpoint["original_message"], response_text,
-                docs, steps_log, token_stats, status=status, force_concern_category=None
+                corpus, steps_log, token_stats, status=status, force_concern_category=None
             )
     except Exception as e:
         _handle_error(e)
 
 
-def generate_answer(client, agent_mode, prompt_text, docs, api_key):
+def generate_answer(client, agent_mode, prompt_text, corpus, api_key):
     """Dispatches the prompt to the selected agent model and manages the process UI."""
     try:
         steps_log = []
@@ -262,11 +262,11 @@ def generate_answer(client, agent_mode, prompt_text, docs, api_key):
         label = "🧠 Thinking..." if agent_mode == MODE_RLM else "🛠️ Generating Answer..."
         with st.status(label, expanded=True) as status:
             response_text, token_stats = _run_agent(
-                client, agent_mode, prompt_text, docs, api_key, steps_log, status=status
+                client, agent_mode, prompt_text, corpus, api_key, steps_log, status=status
             )
             st.session_state.turn_tokens += token_stats.get("total", 0)
             _run_post_generation(
-                client, prompt_text, response_text, docs, steps_log, token_stats, status=status
+                client, prompt_text, response_text, corpus, steps_log, token_stats, status=status
             )
     except Exception as e:
         _handle_error(e)
@@ -1,31 +1,86 @@
+import html
 import streamlit as st
 import streamlit.components.v1 as components
-import difflib
-from utils.guestbook_db import get_open_change_requests, update_change_request_status
+from utils.guestbook_db import (
+    get_open_change_requests, get_change_request_content, get_version_content,
+    update_change_request_status
+)
+from utils.text_delta import opcodes, grouped_opcodes
+from engines.corpus_snapshot import get_corpus_store
 
-def generate_html_diff(base_content, proposed_content):
-    differ = difflib.HtmlDiff()
-    html_diff = differ.make_file(
-        base_content.splitlines(), 
-        proposed_content.splitlines(), 
-        fromdesc="Live Document", 
-        todesc="Proposed Changes",
-        context=True,
-        numlines=3
-    )
-    # Add some CSS to make it look nicer inside Streamlit
-    custom_css = """
-    <style>
-        table.diff {font-family: Courier; border: medium; width: 100%;}
-        .diff_header {background-color: #e0e0e0; font-size: 0.8em; text-align: center;}
-        td.diff_header {text-align: right;}
-        .diff_next {background-color: #c0c0c0;}
-        .diff_add {background-color: #aaffaa;}
-        .diff_chg {background-color: #ffff77;}
-        .diff_sub {background-color: #ffaaaa;}
-    </style>
+# Same look as the difflib.HtmlDiff table this view used to embed.
+DIFF_CSS = """
+<style>
+    table.diff {font-family: Courier; border: medium; width: 100%; border-collapse: collapse;}
+    table.diff td {vertical-align: top; white-space: pre-wrap; word-break: break-word;}
+    .diff_header {background-color: #e0e0e0; font-size: 0.8em; text-align: center;}
+    td.diff_header {text-align: right; width: 3em;}
+    .diff_next {background-color: #c0c0c0; text-align: center;}
+    .diff_add {background-color: #aaffaa;}
+    .diff_chg {background-color: #ffff77;}
+    .diff_sub {background-color: #ffaaaa;}
+</style>
+"""
+
+def _mark_change(old, new):
+    # Highlight the differing middle of a changed line pair (common prefix/suffix trimmed).
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]:
+        suffix += 1
+    def mark(line):
+        mid_end = len(line) - suffix
+        return (html.escape(line[:prefix]) + '<span class="diff_chg">' + html.escape(line[prefix:mid_end])
+                + "</span>" + html.escape(line[mid_end:]))
+    return mark(old), mark(new)
+
+def _row(from_no, from_text, to_no, to_text, from_class="", to_class=""):
+    return (f'<tr><td class="diff_header">{from_no}</td><td class="{from_class}">{from_text}</td>'
+            f'<td class="diff_header">{to_no}</td><td class="{to_class}">{to_text}</td></tr>')
+
+def generate_html_diff(base_content, proposed_content, context=3):
     """
-    return html_diff.replace("<head>", f"<head>{custom_css}")
+    Side-by-side HTML diff of two documents, `context` lines around each change.
+    Uses the patience line diff in utils/text_delta.py; changed line pairs only
+    get a prefix/suffix highlight, not difflib.HtmlDiff's quadratic intraline diff.
+    """
+    a = base_content.splitlines()
+    b = proposed_content.splitlines()
+    rows = []
+    for group in grouped_opcodes(opcodes(a, b), context):
+        rows.append('<tr><td class="diff_next" colspan="4">⋯</td></tr>')
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for k in range(i2 - i1):
+                    text = html.escape(a[i1 + k])
+                    rows.append(_row(i1 + k + 1, text, j1 + k + 1, text))
+                continue
+            for k in range(max(i2 - i1, j2 - j1)):
+                old = a[i1 + k] if i1 + k < i2 else None
+                new = b[j1 + k] if j1 + k < j2 else None
+                if old is not None and new is not None:
+                    old_html, new_html = _mark_change(old, new)
+                    rows.append(_row(i1 + k + 1, old_html, j1 + k + 1, new_html))
+                elif old is not None:
+                    rows.append(_row(i1 + k + 1, html.escape(old), "", "", "diff_sub"))
+                else:
+                    rows.append(_row("", "", j1 + k + 1, html.escape(new), "", "diff_add"))
+    if not rows:
+        rows.append('<tr><td class="diff_next" colspan="4">No Differences Found</td></tr>')
+    return (
+        f"<html><head>{DIFF_CSS}</head><body><table class=\"diff\">"
+        '<thead><tr><th colspan="2" class="diff_header">Live Document</th>'
+        '<th colspan="2" class="diff_header">Proposed Changes</th></tr></thead>'
+        f"<tbody>{''.join(rows)}</tbody></table></body></html>"
+    )
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_html_diff(base_version_id, proposed_version_id):
+    # Versions are immutable, so the ids fully determine the diff.
+    return generate_html_diff(get_version_content(base_version_id), get_version_content(proposed_version_id))
 
 def render_guestbook(docs):
     st.header("Community Guestbook")
@@ -49,10 +104,11 @@ def render_guestbook(docs):
         with st.expander(f"Suggestion for: {req['document_id']} by {req['created_by']}"):
             st.write(f"**Status:** {req['status']}")
             
-            # Show diff
-            st.subheader("Changes")
-            diff_html = generate_html_diff(req['base_content'], req['proposed_content'])
-            components.html(diff_html, height=400, scrolling=True)
+            # Show diff (computed only when opened, cached per version pair)
+            if st.toggle("Show changes", key=f"show_{req['id']}"):
+                st.subheader("Changes")
+                diff_html = cached_html_diff(req['base_version_id'], req['proposed_version_id'])
+                components.html(diff_html, height=400, scrolling=True)
             
             # Review Actions
             if st.session_state.get("user_role") in ["Reviewer", "Admin"]:
@@ -70,12 +126,14 @@ def render_guestbook(docs):
                         import os
                         doc_path = os.path.join("data", doc_id)
                         try:
+                            _, proposed_content = get_change_request_content(req['id'])
                             with open(doc_path, "w", encoding="utf-8") as f:
-                                f.write(req['proposed_content'])
+                                f.write(proposed_content)
                             st.success(f"Applied suggestion to file: {doc_path}")
                             
-                            # Clear cache
-                            st.cache_data.clear()
+                            # Publish the change: only this document is reloaded and
+                            # only caches derived from it are invalidated.
+                            get_corpus_store().document_changed(doc_id)
                             
                         except Exception as e:
                             st.error(f"Failed to update file: {e}")
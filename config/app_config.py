@@ -11,10 +11,66 @@ PAGE_LAYOUT = "wide"
 MODEL_ID = "models/gemma-4-31b-it"
 EMBEDDING_MODEL_ID = "models/gemini-embedding-2-preview"
 
+# Classifier models for the Checkpoint Engine and Workflow Intelligence, in
+# priority order. Gemma can leak text into strict JSON, so these use Gemini
+# (lower rate limit). engines/model_router.py reorders them by health.
+CLASSIFIER_MODELS = [
+    "gemini-3.1-flash-lite-preview",
+    "gemini-3.0-flash",
+    "gemini-2.0-flash",
+    "gemini-1.5-flash",
+    "gemini-1.5-flash-8b",
+]
+
 # --- Token Thresholds ---
 # Token count above which a rate-limit warning is shown to the user.
 HIGH_TOKEN_WARNING_THRESHOLD = 15000
 
+# --- API Rate Limits ---
+# Per-model budgets enforced by engines/request_scheduler.py across all
+# Streamlit sessions. Quotas are per model, so each model gets its own window.
+# Defaults (free-tier limits for MODEL_ID) apply to models not listed below.
+GENAI_REQUESTS_PER_MINUTE = 30
+GENAI_TOKENS_PER_MINUTE = 15000
+GENAI_MODEL_RATE_LIMITS = {   # model id -> (requests/min, tokens/min)
+    MODEL_ID: (30, 15000),
+    EMBEDDING_MODEL_ID: (100, 30000),
+    "gemini-3.1-flash-lite-preview": (15, 250000),
+    "gemini-3.0-flash": (10, 250000),
+    "gemini-2.0-flash": (15, 1000000),
+    "gemini-1.5-flash": (15, 1000000),
+    "gemini-1.5-flash-8b": (15, 1000000),
+}
+
+# --- RLM Sub-LLM Fan-out ---
+# Max concurrent sub-LLM calls per llm_query_batched() call. The request
+# scheduler still paces them against the per-minute budget.
+SUB_LLM_MAX_CONCURRENCY = 4
+
+# --- RLM Chat History ---
+# Once a step's prompt exceeds this many tokens, older REPL observations are
+# compacted to a short head. The most recent exchanges are kept verbatim.
+RLM_HISTORY_TOKEN_BUDGET = 6000
+RLM_HISTORY_KEEP_RECENT = 2
+
+# --- RLM Sub-LLM Memo ---
+# Identical temperature-0 sub-LLM prompts are answered once per run
+# (agents/rlm/llm_memo.py). The shared LRU also reuses them across runs on
+# the same corpus generation.
+RLM_MEMO_SHARED = True
+RLM_MEMO_SHARED_SIZE = 512
+
+# --- RLM Sandbox ---
+# Model-written REPL code runs in worker processes (agents/rlm/sandbox_pool.py).
+RLM_SANDBOX_ENABLED = True
+RLM_SANDBOX_POOL_SIZE = 2          # warm workers kept between agent runs
+RLM_SANDBOX_MAX_WORKERS = 8        # concurrent agent runs; further runs wait for a worker
+RLM_SANDBOX_TIMEOUT_SECONDS = 20   # wall-clock cap per snippet (llm_query time excluded)
+RLM_SANDBOX_MEMORY_MB = 512        # address-space cap per worker (POSIX only)
+# Per-line timing, peak memory and llm_query latency for every REPL snippet,
+# logged to the Thinking Process steps. Adds tracing overhead; leave off in production.
+RLM_PROFILE_REPL = False
+
 # --- Agent Modes ---
 MODE_FILE_BASED = "File-Based Context"
 MODE_RLM = "Recursive Language Model (RLM)"
@@ -37,3 +93,29 @@ CHECKPOINT_TYPES = [
     "direction_choice",
     "assumption_confirmation",
 ]
+
+# --- Prompt Cache ---
+# Static classifier prompt prefixes (instructions + capabilities guide) are
+# registered as server-side cached content where the model supports it.
+PROMPT_CACHE_ENABLED = True
+PROMPT_CACHE_TTL_SECONDS = 3600
+
+# --- SQLite ---
+# Connection settings for utils/db_pool.py (workflow.db and guestbook.db).
+SQLITE_BUSY_TIMEOUT_MS = 5000   # how long a writer waits on a locked database
+SQLITE_CACHE_KB = 8192          # page cache per connection
+SQLITE_STATEMENT_CACHE = 64     # prepared statements kept per connection
+
+# Concern, activity and audit inserts are committed off the request path by
+# utils/write_behind.py, grouped into one transaction per flush window.
+WRITE_BEHIND_FLUSH_SECONDS = 0.5   # max delay before a queued write is committed
+WRITE_BEHIND_MAX_BATCH = 200       # max writes per transaction
+
+# --- Image Variants ---
+# Resized WebP/JPEG copies of gallery and project images, built once per
+# source file by utils/image_variants.py and served from Streamlit's static
+# folder (server.enableStaticServing).
+IMAGE_VARIANT_DIR = "static/variants"
+IMAGE_VARIANT_WIDTHS = (400, 800, 1200)   # px; widths above the source width are skipped
+IMAGE_VARIANT_QUALITY = 82
+IMAGE_VARIANT_BUILD_TIMEOUT_SECONDS = 600   # cap on one background build (python -m utils.image_variants)
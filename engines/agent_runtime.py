@@ -0,0 +1,129 @@
+"""
+Agent Runtime — one asyncio event loop shared by every agent turn.
+
+The agents used to run their whole multi-step loop synchronously on the
+Streamlit script thread, one blocking SDK call at a time. They now expose
+`acompletion()` coroutines built on the SDK's async client (`client.aio`),
+and this module runs them on a single process-wide event loop:
+
+  * independent model calls inside a turn (batched sub-queries, sub-problem
+    solves) overlap on the loop instead of queuing behind each other;
+  * many concurrent conversations share one loop thread, instead of each
+    in-flight turn pinning a thread in a blocking HTTP call;
+  * the sync `completion()` entry points are thin wrappers around run(), so
+    components/agent_dispatch.py is unchanged.
+
+Streamlit widgets can only be written from the script thread, so agents log
+through a LogRelay: messages emitted on the loop (or on sandbox threads) are
+queued and delivered by run() on the thread that is waiting for the result.
+
+Usage:
+    relay = LogRelay(log_callback)
+    answer, usage = run(agent.acompletion(query), relay=relay)
+
+    # From a sandbox thread (sync REPL helper) back into the loop:
+    text = call_sync(agent._asub_query(prompt))
+"""
+import asyncio
+import concurrent.futures
+import queue
+import threading
+
+# How often run() wakes up to deliver relayed log messages.
+_POLL_SECONDS = 0.05
+
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared event loop, starting its daemon thread on first use."""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(
+                target=_loop.run_forever, name="agent-runtime", daemon=True
+            )
+            _loop_thread.start()
+    return _loop
+
+
+def _check_not_on_loop(fn_name):
+    if _loop_thread is not None and threading.current_thread() is _loop_thread:
+        raise RuntimeError(f"{fn_name}() would deadlock when called from the agent runtime loop; await the coroutine instead")
+
+
+class LogRelay:
+    """
+    Thread-safe wrapper around a UI log callback.
+
+    Calls made on the thread that created the relay (the Streamlit script
+    thread) go straight through; calls from the event loop or worker threads
+    are queued until drain() runs on the owner thread.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self._owner = threading.get_ident()
+        self._queue = queue.SimpleQueue()
+
+    def __call__(self, msg):
+        if threading.get_ident() == self._owner:
+            self.drain()
+            self.callback(msg)
+        else:
+            self._queue.put(msg)
+
+    def drain(self):
+        """Deliver queued messages in order. Must run on the owner thread."""
+        while True:
+            try:
+                msg = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self.callback(msg)
+
+
+def run(coro, relay=None):
+    """
+    Run `coro` on the shared loop and block the calling thread until it
+    finishes, delivering `relay` log messages on this thread meanwhile.
+    Exceptions raised by the coroutine propagate to the caller.
+    """
+    _check_not_on_loop("run")
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    try:
+        while True:
+            done, _ = concurrent.futures.wait([future], timeout=_POLL_SECONDS)
+            if relay:
+                relay.drain()
+            if done:
+                return future.result()
+    except BaseException:
+        # Streamlit stops a rerun by raising in the script thread; don't
+        # leave the turn running on the loop with nobody waiting for it.
+        future.cancel()
+        raise
+
+
+def call_sync(coro):
+    """Run `coro` on the shared loop from a worker thread and return its result."""
+    _check_not_on_loop("call_sync")
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
+
+
+async def gather_bounded(coros, limit):
+    """
+    Await `coros` with at most `limit` running at once. Results come back
+    in input order; an exception is returned in its item's position instead
+    of cancelling the others.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def _bounded(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(_bounded(c) for c in coros), return_exceptions=True)
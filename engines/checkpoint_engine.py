@@ -12,29 +12,21 @@ Flow:
   4. Agent generates with the enriched prompt (zero agent code changes)
 """
 import json
-import os
 import re
 import time
 import uuid
 from google import genai
 
-from config.app_config import CHECKPOINT_TYPES
+from config.app_config import CHECKPOINT_TYPES, CLASSIFIER_MODELS
+from engines.model_router import get_router
+from engines.prompt_templates import PromptTemplate
+from engines.request_scheduler import PRIORITY_CHECKPOINT, estimate_tokens, get_scheduler
 
 
 # ---------------------------------------------------------------------------
 # Internal helpers
 # ---------------------------------------------------------------------------
 
-def _load_capabilities() -> str:
-    """Load portfolio capabilities so the classifier knows what the app can do."""
-    path = os.path.join("data", "portfolio_capabilities.md")
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
-    except Exception:
-        return ""
-
-
 def _extract_json(text: str) -> dict:
     """Extract a JSON object from LLM output, stripping thinking blocks and markdown fences."""
     text = text.strip()
@@ -45,71 +37,79 @@ def _extract_json(text: str) -> dict:
     return json.loads(text.strip())
 
 
-def _generate_with_fallback(client, prompt: str, status_placeholder=None) -> tuple[str, str, int]:
-    """Call Gemini with retry + model fallback. Streams thinking blocks to UI."""
-    # Gemini as Gemma can leak text to json
-    models = [
-        "gemini-3.1-flash-lite-preview", 
-        "gemini-3.0-flash",
-        "gemini-1.5-flash",
-        "gemini-1.5-flash-8b"
-    ]
+def _generate_with_fallback(client, template: PromptTemplate, fields: dict, status_placeholder=None) -> tuple[str, str, int]:
+    """
+    Call Gemini with retry + model fallback. Streams thinking blocks to UI.
+
+    The static part of `template` is sent as server-side cached content when
+    available, so only the rendered `fields` travel with each request.
+    """
+    router = get_router()
+    scheduler = get_scheduler()
     last_error = None
     
-    for model in models:
+    for model in router.route(CLASSIFIER_MODELS):
+        contents, cached_content = template.request(client, model, PRIORITY_CHECKPOINT, **fields)
         try:
-            # Added config for speed and token efficiency
-            response_stream = client.models.generate_content_stream(
-                model=model, 
-                contents=prompt,
-                config=genai.types.GenerateContentConfig(
-                    temperature=0.1,
-                    max_output_tokens=800, # Sufficient for <think> + JSON
+            with scheduler.slot(PRIORITY_CHECKPOINT, estimate_tokens(contents),
+                                pause_on_rate_limit=False, model=model) as slot:
+                t0 = time.perf_counter()
+                # Added config for speed and token efficiency
+                response_stream = client.models.generate_content_stream(
+                    model=model, 
+                    contents=contents,
+                    config=genai.types.GenerateContentConfig(
+                        temperature=0.1,
+                        max_output_tokens=800, # Sufficient for <think> + JSON
+                        cached_content=cached_content,
+                    )
                 )
-            )
             
-            full_text = ""
-            thoughts = ""
-            in_think = False
-            chunk_tokens = 0
+                full_text = ""
+                thoughts = ""
+                in_think = False
+                chunk_tokens = 0
             
-            for chunk in response_stream:
-                if hasattr(chunk, "usage_metadata") and chunk.usage_metadata:
-                    chunk_tokens = chunk.usage_metadata.total_token_count or chunk_tokens
+                for chunk in response_stream:
+                    if hasattr(chunk, "usage_metadata") and chunk.usage_metadata:
+                        chunk_tokens = chunk.usage_metadata.total_token_count or chunk_tokens
                     
-                if not chunk.text: continue
-                full_text += chunk.text
+                    if not chunk.text: continue
+                    full_text += chunk.text
                 
-                if "<think>" in full_text and not in_think:
-                    in_think = True
+                    if "<think>" in full_text and not in_think:
+                        in_think = True
                     
-                if in_think:
-                    start_idx = full_text.find("<think>") + 7
-                    end_idx = full_text.find("</think>")
+                    if in_think:
+                        start_idx = full_text.find("<think>") + 7
+                        end_idx = full_text.find("</think>")
                     
-                    if end_idx != -1:
-                        thoughts = full_text[start_idx:end_idx].strip()
-                        in_think = False
-                    else:
-                        thoughts = full_text[start_idx:].strip()
+                        if end_idx != -1:
+                            thoughts = full_text[start_idx:end_idx].strip()
+                            in_think = False
+                        else:
+                            thoughts = full_text[start_idx:].strip()
                         
-                    if status_placeholder and thoughts:
-                        # Clean thinking status (remove trailing characters if it's getting long)
-                        status_placeholder.markdown(thoughts + " ▌")
+                        if status_placeholder and thoughts:
+                            # Clean thinking status (remove trailing characters if it's getting long)
+                            status_placeholder.markdown(thoughts + " ▌")
                         
-            if status_placeholder and thoughts:
-                status_placeholder.markdown(thoughts)
+                if status_placeholder and thoughts:
+                    status_placeholder.markdown(thoughts)
                 
-            return thoughts, full_text, chunk_tokens
+                slot.record(chunk_tokens)
+                router.record_success(model, time.perf_counter() - t0)
+                return thoughts, full_text, chunk_tokens
             
         except Exception as e:
             last_error = e
-            # Log the error and try the next model immediately unless it's a transient server error
+            if cached_content:
+                # Rebuilt next time only if the cache itself was the problem.
+                template.invalidate_server_cache(client, model, cached_content, e)
+            # The router opens the circuit / rate-limit window so later turns
+            # skip this model; this turn moves on to the next one immediately.
+            router.record_failure(model, e)
             print(f"[checkpoint_engine] Model {model} failed: {e}")
-            if "503" in str(e) or "UNAVAILABLE" in str(e) or "429" in str(e):
-                time.sleep(0.5) # Minimal sleep for transient errors
-                continue # Try next model or next iteration
-            # For other errors (like 404 or auth), we also try the next model
             continue
 
     if last_error:
@@ -121,7 +121,7 @@ def _generate_with_fallback(client, prompt: str, status_placeholder=None) -> tup
 # System prompt for the checkpoint classifier
 # ---------------------------------------------------------------------------
 
-_CLASSIFIER_PROMPT = """You are a checkpoint classifier for a portfolio chatbot.
+_CLASSIFIER_PREFIX = """You are a checkpoint classifier for a portfolio chatbot.
 The chatbot answers questions about Khuong Nguyen's skills, projects, and experience.
 
 Your job: decide if the user's message is ambiguous enough that the model should
@@ -160,9 +160,16 @@ Your step-by-step reasoning about whether this is ambiguous and requires a check
 
 If no checkpoint is needed, set needs_checkpoint to false and all other fields to null.
 
-User message: "{user_message}"
 """
 
+_CLASSIFIER_TEMPLATE = PromptTemplate(
+    "checkpoint_classifier",
+    prefix_template=_CLASSIFIER_PREFIX,
+    turn_template='User message: "{user_message}"\n',
+    missing_capabilities="",
+    max_capabilities_chars=10000,  # Ensure we don't cut off the 'NOT Supported' section
+)
+
 
 # ---------------------------------------------------------------------------
 # Public API
@@ -195,14 +202,10 @@ def should_checkpoint(client, user_message: str, chat_history: list = None, stat
                 len(user_message.split()) < 15):
             return None
 
-    capabilities = _load_capabilities()
-    prompt = _CLASSIFIER_PROMPT.format(
-        capabilities=capabilities[:10000],  # Ensure we don't cut off the 'NOT Supported' section
-        user_message=user_message,
-    )
-
     try:
-        thoughts, text, chunk_tokens = _generate_with_fallback(client, prompt, status_placeholder)
+        thoughts, text, chunk_tokens = _generate_with_fallback(
+            client, _CLASSIFIER_TEMPLATE, {"user_message": user_message}, status_placeholder
+        )
         result = _extract_json(text)
 
         if not result.get("needs_checkpoint"):
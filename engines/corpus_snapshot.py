@@ -0,0 +1,198 @@
+"""
+Corpus Snapshot — one shared, read-only view of the corpus per generation.
+
+Every chat turn used to rebuild the same data from the cached docs dict:
+agent_dispatch copied a filtered `raw_docs` dict, and each RLM agent
+concatenated the whole corpus into a fresh pseudo-XML string (and hashed
+it again to find its navigation index). A CorpusSnapshot is built once per
+corpus generation and handed to agents by reference. It owns:
+
+  * docs        : user-facing documents (internal-only files removed)
+  * raw_docs    : docs minus generated summaries (what the agents retrieve from)
+  * file_hashes : md5 per raw doc (the vector index's change detection),
+                  carried over from the previous generation for unchanged files
+  * context     : build_corpus(raw_docs), built on first use
+  * navigator   : CorpusNavigator over `context` (file offsets, line index,
+                  outline, inverted index), built on first use
+
+Snapshots are shared across sessions and threads; treat every attribute as
+read-only.
+
+The CorpusStore (get_corpus_store()) holds the current snapshot for the
+process. app.py asks it for current() on every rerun: files under data/
+whose mtime or size changed are reloaded one by one, and everything else is
+reused. A guestbook merge calls document_changed(name) directly. Either way
+subscribers are told which documents changed, so they can drop only what
+depended on them; nothing else (gallery images, project pages) is flushed.
+"""
+import hashlib
+import os
+import threading
+
+from agents.rlm.base import CorpusNavigator, build_corpus
+from engines.trace_engine import CORPUS_EXTENSIONS, load_corpus, load_document
+
+# Files used only by the Workflow Intelligence classifier. Including them in
+# retrieval makes the AI see near-duplicate content and repeat answers.
+INTERNAL_DOCS = {"portfolio_capabilities.md"}
+
+
+def _normalize(name):
+    name = name.replace("\\", "/")
+    return name[len("data/"):] if name.startswith("data/") else name
+
+
+class CorpusSnapshot:
+    """Read-only corpus views for one generation (see module docstring)."""
+
+    def __init__(self, all_docs, generation=None):
+        self.generation = generation
+        self._all_docs = all_docs
+        self.docs = {k: v for k, v in all_docs.items() if _normalize(k) not in INTERNAL_DOCS}
+        self.raw_docs = {k: v for k, v in self.docs.items() if "summaries/" not in _normalize(k)}
+        self._file_hashes = {}
+        self._context = None
+        self._navigator = None
+        self._lock = threading.Lock()
+
+    def replace(self, updates, generation=None):
+        """
+        New snapshot with `updates` ({name: content, or None to remove})
+        applied. Unchanged documents and their hashes are shared.
+        """
+        all_docs = dict(self._all_docs)
+        for name, content in updates.items():
+            if content:
+                all_docs[name] = content
+            else:
+                all_docs.pop(name, None)
+        snapshot = CorpusSnapshot(all_docs, generation)
+        with self._lock:
+            snapshot._file_hashes = {
+                name: digest for name, digest in self._file_hashes.items()
+                if name not in updates and name in snapshot.raw_docs
+            }
+        return snapshot
+
+    @property
+    def file_hashes(self) -> dict:
+        """md5 of every raw doc, hashed once per document content."""
+        with self._lock:
+            for name, content in self.raw_docs.items():
+                if name not in self._file_hashes:
+                    self._file_hashes[name] = hashlib.md5(content.encode(errors="replace")).hexdigest()
+            return dict(self._file_hashes)
+
+    def built_navigator(self):
+        """The navigator if it has been built, else None (does not build it)."""
+        return self._navigator
+
+    @property
+    def context(self) -> str:
+        """The pseudo-XML corpus string the RLM agents navigate."""
+        if self._context is None:
+            with self._lock:
+                if self._context is None:
+                    self._context = build_corpus(self.raw_docs)
+        return self._context
+
+    @property
+    def navigator(self) -> CorpusNavigator:
+        """Navigation index over `context`, shared by every agent on this generation."""
+        if self._navigator is None:
+            context = self.context
+            with self._lock:
+                if self._navigator is None:
+                    self._navigator = CorpusNavigator(context)
+        return self._navigator
+
+
+def _scan(data_dir):
+    """{relative name: (mtime_ns, size)} for every corpus file under data_dir."""
+    stats = {}
+    for root, _, files in os.walk(data_dir):
+        for f in files:
+            if f.endswith(CORPUS_EXTENSIONS):
+                path = os.path.join(root, f)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                stats[os.path.relpath(path, data_dir).replace("\\", "/")] = (st.st_mtime_ns, st.st_size)
+    return stats
+
+
+class CorpusStore:
+    """The process's current CorpusSnapshot, updated one document at a time."""
+
+    def __init__(self, data_dir="data"):
+        self.data_dir = data_dir
+        self._snapshot = None
+        self._stats = {}
+        self._subscribers = []
+        self._lock = threading.RLock()
+
+    def subscribe(self, callback):
+        """Call `callback(names, previous, snapshot)` after documents change."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def current(self) -> CorpusSnapshot:
+        """The snapshot of data/ as it is on disk now (changed files are reloaded individually)."""
+        stats = _scan(self.data_dir)
+        with self._lock:
+            if self._snapshot is None:
+                self._stats = stats
+                self._snapshot = CorpusSnapshot(load_corpus(self.data_dir), generation=1)
+                return self._snapshot
+            changed = [name for name in stats.keys() | self._stats.keys()
+                       if stats.get(name) != self._stats.get(name)]
+            if not changed:
+                return self._snapshot
+            return self.document_changed(*changed)
+
+    def document_changed(self, *names) -> CorpusSnapshot:
+        """
+        Reload the given data/-relative documents, publish the new snapshot
+        and notify subscribers. Returns the new snapshot.
+        """
+        with self._lock:
+            if self._snapshot is None:
+                return self.current()
+            previous = self._snapshot
+            updates = {}
+            for name in names:
+                path = os.path.join(self.data_dir, name)
+                try:
+                    st = os.stat(path)
+                    self._stats[name] = (st.st_mtime_ns, st.st_size)
+                    updates[name] = load_document(path) or None
+                except OSError:
+                    self._stats.pop(name, None)
+                    updates[name] = None
+            updates = {name: content for name, content in updates.items()
+                       if content != previous._all_docs.get(name)}
+            if not updates:
+                return previous
+            self._snapshot = previous.replace(updates, generation=(previous.generation or 0) + 1)
+            snapshot, subscribers = self._snapshot, list(self._subscribers)
+        print(f"[CorpusStore] Generation {snapshot.generation}: reloaded {', '.join(sorted(updates))}")
+        for callback in subscribers:
+            try:
+                callback(sorted(updates), previous, snapshot)
+            except Exception as e:
+                print(f"[CorpusStore] Subscriber failed: {e}")
+        return snapshot
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_corpus_store() -> CorpusStore:
+    """The process-wide CorpusStore (shared by every Streamlit session)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CorpusStore()
+        return _store
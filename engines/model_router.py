@@ -0,0 +1,200 @@
+"""
+Model Router — health-aware ordering for the classifier model fallback lists.
+
+The Checkpoint Engine and Workflow Intelligence both walk a list of Gemini
+models until one answers. Without shared state, every chat turn re-tried
+models that had just returned 404/503/429 seconds earlier. The router keeps
+process-wide, per-model health:
+
+  * latency      : exponentially weighted moving average of successful calls
+  * error rate   : exponentially weighted failure ratio
+  * rate limits  : 429s close the model until the server-suggested retry delay
+  * circuit      : consecutive failures (or a 404) open the circuit for a
+                   cooldown; afterwards one half-open probe decides whether
+                   it closes again or re-opens with a longer cooldown
+
+Usage:
+    router = get_router()
+    for model in router.route(CLASSIFIER_MODELS):
+        t0 = time.perf_counter()
+        try:
+            ...call model...
+            router.record_success(model, time.perf_counter() - t0)
+            break
+        except Exception as e:
+            router.record_failure(model, e)
+"""
+import re
+import threading
+import time
+
+# Consecutive failures before a model's circuit opens
+FAILURE_THRESHOLD = 2
+# First cooldown after the circuit opens; doubles on each failed probe
+BASE_COOLDOWN_SECONDS = 30
+MAX_COOLDOWN_SECONDS = 600
+# A 404 / NOT_FOUND model will not start working in 30s
+NOT_FOUND_COOLDOWN_SECONDS = 600
+# Used when a 429 does not carry a retryDelay hint
+DEFAULT_RATE_LIMIT_SECONDS = 30
+# A half-open probe that never reports back is abandoned after this long
+PROBE_TIMEOUT_SECONDS = 60
+# EWMA smoothing for latency and error rate
+_ALPHA = 0.3
+
+
+class ModelHealth:
+    """Rolling health statistics for a single model."""
+
+    def __init__(self, name):
+        self.name = name
+        self.latency = None           # EWMA seconds, None until first success
+        self.error_rate = 0.0         # EWMA of failures (0 = healthy, 1 = always failing)
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldown = BASE_COOLDOWN_SECONDS
+        self.open_until = 0.0         # circuit open (skip) until this time
+        self.rate_limited_until = 0.0
+        self.probe_started = 0.0      # when the in-flight half-open probe began (0 = none)
+
+    def available_at(self):
+        return max(self.open_until, self.rate_limited_until)
+
+    def score(self):
+        """Lower is better. Unmeasured models sort by list position instead."""
+        return self.latency * (1.0 + 2.0 * self.error_rate)
+
+    def as_dict(self, now):
+        return {
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "calls": self.calls,
+            "failures": self.failures,
+            "circuit_open_for": max(0.0, round(self.open_until - now, 1)),
+            "rate_limited_for": max(0.0, round(self.rate_limited_until - now, 1)),
+        }
+
+
+def classify_error(error):
+    """Return 'rate_limit' | 'not_found' | 'transient' for an API exception."""
+    msg = str(error)
+    if "429" in msg or "RESOURCE_EXHAUSTED" in msg:
+        return "rate_limit"
+    if "404" in msg or "NOT_FOUND" in msg:
+        return "not_found"
+    return "transient"
+
+
+def retry_delay_seconds(error):
+    """Extract the server-suggested retry delay (e.g. 'retryDelay': '33s')."""
+    match = re.search(r"retryDelay.*?(\d+)s", str(error))
+    return int(match.group(1)) if match else DEFAULT_RATE_LIMIT_SECONDS
+
+
+class ModelRouter:
+    """Thread-safe, process-wide model health tracker and call ordering."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._health = {}
+
+    def _get(self, model):
+        if model not in self._health:
+            self._health[model] = ModelHealth(model)
+        return self._health[model]
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+
+    def route(self, models):
+        """
+        Return `models` in the order they should be tried for this call.
+
+        Healthy models come first, fastest (latency weighted by error rate)
+        first; models never measured keep their configured priority. A model
+        whose cooldown just elapsed is tried once as a half-open probe. Models
+        with an open circuit or an active rate-limit window are skipped, unless
+        every model is unavailable — then they are returned soonest-first so
+        the caller still gets an attempt instead of an instant failure.
+        """
+        now = time.time()
+        with self._lock:
+            ready, probes, blocked = [], [], []
+            for position, model in enumerate(models):
+                h = self._get(model)
+                if h.available_at() > now:
+                    blocked.append((h.available_at(), position, model))
+                elif h.open_until and now - h.probe_started > PROBE_TIMEOUT_SECONDS:
+                    # Cooldown elapsed: let exactly one caller probe it.
+                    h.probe_started = now
+                    probes.append(model)
+                elif h.open_until:
+                    blocked.append((now, position, model))
+                else:
+                    measured = h.latency is not None
+                    key = (0, h.score(), position) if measured else (1, 0.0, position)
+                    ready.append((key, model))
+
+            ordered = probes + [m for _, m in sorted(ready)]
+            if ordered:
+                return ordered
+            return [m for _, _, m in sorted(blocked)]
+
+    # ------------------------------------------------------------------
+    # Outcome recording
+    # ------------------------------------------------------------------
+
+    def record_success(self, model, latency):
+        """Record a successful call that took `latency` seconds."""
+        with self._lock:
+            h = self._get(model)
+            h.calls += 1
+            h.latency = latency if h.latency is None else (_ALPHA * latency + (1 - _ALPHA) * h.latency)
+            h.error_rate = (1 - _ALPHA) * h.error_rate
+            h.consecutive_failures = 0
+            h.cooldown = BASE_COOLDOWN_SECONDS
+            h.open_until = 0.0
+            h.probe_started = 0.0
+
+    def record_failure(self, model, error):
+        """Record a failed call and open the circuit / rate-limit window as needed."""
+        kind = classify_error(error)
+        now = time.time()
+        with self._lock:
+            h = self._get(model)
+            h.calls += 1
+            h.failures += 1
+            h.consecutive_failures += 1
+            h.error_rate = _ALPHA + (1 - _ALPHA) * h.error_rate
+
+            if kind == "rate_limit":
+                # Quota windows are not a health problem; just wait them out.
+                h.rate_limited_until = now + retry_delay_seconds(error)
+                h.probe_started = 0.0
+                return
+
+            if kind == "not_found":
+                h.open_until = now + NOT_FOUND_COOLDOWN_SECONDS
+            elif h.probe_started:
+                # Failed half-open probe: re-open with a longer cooldown.
+                h.cooldown = min(h.cooldown * 2, MAX_COOLDOWN_SECONDS)
+                h.open_until = now + h.cooldown
+            elif h.consecutive_failures >= FAILURE_THRESHOLD:
+                h.open_until = now + h.cooldown
+            h.probe_started = 0.0
+
+    def stats(self):
+        """Return a JSON-friendly snapshot of every tracked model's health."""
+        now = time.time()
+        with self._lock:
+            return {name: h.as_dict(now) for name, h in self._health.items()}
+
+
+_router = ModelRouter()
+
+
+def get_router() -> ModelRouter:
+    """Return the process-wide router shared by all Streamlit sessions."""
+    return _router
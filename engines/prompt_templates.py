@@ -0,0 +1,244 @@
+"""
+Prompt Templates — shared static prompt prefixes for the classifier engines.
+
+The Checkpoint Engine and Workflow Intelligence both embed the full
+portfolio capabilities guide in a large classifier prompt. Only the user
+message changes between turns, so this module:
+
+  * loads data/portfolio_capabilities.md once per file generation
+    (mtime + size) instead of re-reading it on every chat turn;
+  * renders each template's static prefix once per generation;
+  * where the model supports it, registers that prefix as server-side
+    cached content so per-turn requests only carry the user message.
+
+Usage:
+    template = PromptTemplate("name", prefix_template, turn_template)
+    contents, cached_content = template.request(client, model, priority, user_message=msg)
+"""
+import os
+import threading
+import time
+
+from google.genai import types
+
+from config.app_config import PROMPT_CACHE_ENABLED, PROMPT_CACHE_TTL_SECONDS
+from engines.request_scheduler import PRIORITY_INTERACTIVE, estimate_tokens, get_scheduler
+
+
+CAPABILITIES_PATH = os.path.join("data", "portfolio_capabilities.md")
+
+# Refresh server-side caches slightly before the API expires them.
+_CACHE_REFRESH_MARGIN = 60
+
+_lock = threading.Lock()
+_capabilities_cache = {}  # path -> (generation, text)
+
+
+# ---------------------------------------------------------------------------
+# Capabilities guide
+# ---------------------------------------------------------------------------
+
+def capabilities_generation(path: str = CAPABILITIES_PATH):
+    """Return a cheap identity for the current file contents, or None if missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def load_capabilities(path: str = CAPABILITIES_PATH) -> str | None:
+    """
+    Return the capabilities guide, re-reading the file only when its
+    generation changes. Returns None if the file is missing or unreadable.
+    """
+    generation = capabilities_generation(path)
+    if generation is None:
+        return None
+
+    with _lock:
+        cached = _capabilities_cache.get(path)
+        if cached and cached[0] == generation:
+            return cached[1]
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except Exception:
+        return None
+
+    with _lock:
+        _capabilities_cache[path] = (generation, text)
+    return text
+
+
+# ---------------------------------------------------------------------------
+# Server cache errors
+# ---------------------------------------------------------------------------
+
+def is_cache_error(error) -> bool:
+    """True if `error` says the cached content was not found, has expired or is not accessible."""
+    msg = str(error)
+    if "429" in msg or "RESOURCE_EXHAUSTED" in msg:
+        return False
+    return any(marker in msg for marker in ("404", "NOT_FOUND", "403", "PERMISSION_DENIED")) \
+        or "expired" in msg.lower()
+
+
+# ---------------------------------------------------------------------------
+# Prompt template
+# ---------------------------------------------------------------------------
+
+class PromptTemplate:
+    """
+    A prompt split into a static prefix and a per-turn suffix.
+
+    Parameters
+    ----------
+    name                   : short identifier, used as the cache display name
+    prefix_template        : str.format template; may reference {capabilities}
+    turn_template          : str.format template for the per-turn fields
+    missing_capabilities   : text substituted when the guide cannot be loaded
+    max_capabilities_chars : optional cap on the embedded guide length
+    """
+
+    def __init__(self, name, prefix_template, turn_template,
+                 missing_capabilities="", max_capabilities_chars=None):
+        self.name = name
+        self.prefix_template = prefix_template
+        self.turn_template = turn_template
+        self.missing_capabilities = missing_capabilities
+        self.max_capabilities_chars = max_capabilities_chars
+
+        self._prefix = None
+        self._prefix_generation = None
+        # model -> {"generation", "name" (None if caching failed), "expires_at"}
+        self._server_caches = {}
+        self._creating = set()   # models whose cache is being created right now
+        self._cache_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+
+    def prefix(self) -> str:
+        """Return the static prefix, rebuilt only when the guide changes."""
+        generation = capabilities_generation()
+        with _lock:
+            if self._prefix is not None and self._prefix_generation == generation:
+                return self._prefix
+
+        capabilities = load_capabilities()
+        if capabilities is None:
+            capabilities = self.missing_capabilities
+        if self.max_capabilities_chars:
+            capabilities = capabilities[:self.max_capabilities_chars]
+        prefix = self.prefix_template.format(capabilities=capabilities)
+
+        with _lock:
+            self._prefix = prefix
+            self._prefix_generation = generation
+        return prefix
+
+    def turn(self, **fields) -> str:
+        """Render only the per-turn suffix."""
+        return self.turn_template.format(**fields)
+
+    def render(self, **fields) -> str:
+        """Render the full prompt (static prefix + per-turn suffix)."""
+        return self.prefix() + self.turn(**fields)
+
+    # ------------------------------------------------------------------
+    # Server-side context caching
+    # ------------------------------------------------------------------
+
+    def request(self, client, model: str, priority: int = PRIORITY_INTERACTIVE,
+                **fields) -> tuple[str, str | None]:
+        """
+        Return (contents, cached_content) for a generate call on `model`.
+        A cache that has to be (re)created first is admitted by the request
+        scheduler at `priority`.
+
+        When a server-side cache holds the static prefix, `contents` is only
+        the per-turn suffix and `cached_content` is the cache name to pass in
+        GenerateContentConfig. Otherwise the full prompt is returned inline.
+        """
+        cache_name = self._server_cache(client, model, priority)
+        if cache_name:
+            return self.turn(**fields), cache_name
+        return self.render(**fields), None
+
+    def invalidate_server_cache(self, client, model: str, cache_name: str, error) -> bool:
+        """
+        Forget and delete `cache_name` for `model` if `error` (raised by a
+        call that used it) shows the cache is gone, expired or not ours.
+        Rate limits and other transient errors keep the cache. Returns True
+        if it was invalidated.
+        """
+        if not is_cache_error(error):
+            return False
+        with self._cache_lock:
+            entry = self._server_caches.get(model)
+            if entry and entry["name"] == cache_name:
+                del self._server_caches[model]
+        try:
+            client.caches.delete(name=cache_name)
+        except Exception:
+            pass  # already expired / deleted server-side
+        return True
+
+    def _server_cache(self, client, model: str, priority: int) -> str | None:
+        if not PROMPT_CACHE_ENABLED:
+            return None
+
+        prefix = self.prefix()
+        generation = self._prefix_generation
+        now = time.time()
+
+        with self._cache_lock:
+            entry = self._server_caches.get(model)
+            if entry and entry["generation"] == generation and entry["expires_at"] > now:
+                return entry["name"]
+            if model in self._creating:
+                # Another caller is creating this model's cache; send this
+                # turn inline instead of waiting for it.
+                return None
+            self._creating.add(model)
+            stale_name = entry["name"] if entry else None
+
+        # The create call runs outside the lock and through the scheduler, so
+        # a slow create only delays its own caller and its tokens count
+        # against the model's window.
+        name = None
+        try:
+            with get_scheduler().slot(priority, estimate_tokens(prefix),
+                                      pause_on_rate_limit=False, model=model) as slot:
+                cache = client.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        contents=[types.Content(role="user", parts=[types.Part(text=prefix)])],
+                        ttl=f"{PROMPT_CACHE_TTL_SECONDS}s",
+                        display_name=f"portfolio-{self.name}",
+                    ),
+                )
+                slot.record(getattr(cache, "usage_metadata", None))
+                name = cache.name
+        except Exception as e:
+            # Unsupported model or prefix below the minimum cacheable size.
+            # Remember the miss so we don't retry on every turn.
+            print(f"[prompt_templates] Server cache unavailable for {self.name} on {model}: {e}")
+        finally:
+            with self._cache_lock:
+                self._creating.discard(model)
+                self._server_caches[model] = {
+                    "generation": generation,
+                    "name": name,
+                    "expires_at": now + PROMPT_CACHE_TTL_SECONDS - _CACHE_REFRESH_MARGIN,
+                }
+
+        if stale_name and stale_name != name:
+            try:
+                client.caches.delete(name=stale_name)
+            except Exception:
+                pass
+        return name
@@ -0,0 +1,280 @@
+"""
+Request Scheduler — process-wide pacing for every Google GenAI call.
+
+Streamlit runs one script thread per visitor, and each thread used to call
+the API on its own: the RLM agents fired sub-LLM queries unpaced, the
+classifiers ran every turn, and VectorEngine slept up to 120s inline on a
+429. The scheduler puts all of those behind a sliding 60-second window of
+requests and tokens per model — API quotas are per model, so answers,
+classifiers and embeddings never wait on each other's usage. Limits come from
+GENAI_MODEL_RATE_LIMITS (GENAI_REQUESTS_PER_MINUTE / GENAI_TOKENS_PER_MINUTE
+for unlisted models). Within a model, waiting calls are admitted by priority:
+
+    PRIORITY_INTERACTIVE  answer generation (agents, sub-LLM calls, query embedding)
+    PRIORITY_CHECKPOINT   Thinking-Mode checkpoint classifier
+    PRIORITY_CONCERN      Workflow Intelligence concern detection
+    PRIORITY_INDEXING     vector index (re)builds
+
+Lower classes may only fill part of the window (PRIORITY_SHARE), so there is
+always headroom for an interactive answer, and a waiting higher-priority call
+is always admitted before a lower one. A request larger than a model's whole
+budget is admitted into an idle window and settles as one full window at
+most. A 429 pauses the class that hit it (and every lower class) on that
+model for the server-suggested delay; callers re-queue instead of sleeping.
+
+Usage:
+    with get_scheduler().slot(PRIORITY_INTERACTIVE, estimate_tokens(prompt), model=model_id) as slot:
+        response = client.models.generate_content(model=model_id, ...)
+        slot.record(response.usage_metadata)
+
+    # From a coroutine on the agent runtime loop:
+    async with get_scheduler().aslot(PRIORITY_INTERACTIVE, tokens, model=model_id) as slot:
+        response = await client.aio.models.generate_content(...)
+"""
+import asyncio
+import contextlib
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+from config.app_config import (
+    GENAI_MODEL_RATE_LIMITS, GENAI_REQUESTS_PER_MINUTE, GENAI_TOKENS_PER_MINUTE, MODEL_ID,
+)
+from engines.model_router import classify_error, retry_delay_seconds
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_CHECKPOINT = 1
+PRIORITY_CONCERN = 2
+PRIORITY_INDEXING = 3
+
+# Fraction of the per-minute budget each class may fill on its own.
+PRIORITY_SHARE = {
+    PRIORITY_INTERACTIVE: 1.0,
+    PRIORITY_CHECKPOINT: 0.9,
+    PRIORITY_CONCERN: 0.7,
+    PRIORITY_INDEXING: 0.5,
+}
+
+_WINDOW_SECONDS = 60.0
+# Async waiters poll instead of blocking a thread on the condition variable.
+_ASYNC_POLL_SECONDS = 0.1
+# Rough allowance for the response when estimating a request's tokens.
+_OUTPUT_TOKEN_ALLOWANCE = 500
+
+
+def estimate_tokens(*texts) -> int:
+    """Cheap token estimate (~4 chars/token) plus a response allowance."""
+    chars = sum(len(t) for t in texts if isinstance(t, str))
+    return chars // 4 + _OUTPUT_TOKEN_ALLOWANCE
+
+
+class Slot:
+    """An admitted request. Call record() with the real usage when known."""
+
+    def __init__(self, scheduler, priority, entry):
+        self.scheduler = scheduler
+        self.priority = priority
+        self._entry = entry
+
+    def record(self, usage):
+        """Replace the token estimate with actual usage (usage_metadata or int)."""
+        if usage is None:
+            return
+        total = usage if isinstance(usage, int) else (getattr(usage, "total_token_count", None) or 0)
+        if total:
+            self.scheduler._settle(self._entry, total)
+
+
+def _model_key(model):
+    """'models/gemma-...' and 'gemma-...' name the same quota."""
+    return model[len("models/"):] if model.startswith("models/") else model
+
+
+class _ModelWindow:
+    """Sliding window, wait queue and 429 pauses for one model's quota (lock held by caller)."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.entries = deque()            # [admitted_at, tokens, in_window, window] entries, oldest first
+        self.tokens = 0
+        self.waiting = []                 # heap of (priority, seq)
+        self.paused_until = {}            # priority -> time
+
+    def expire(self, now):
+        while self.entries and now - self.entries[0][0] >= _WINDOW_SECONDS:
+            entry = self.entries.popleft()
+            entry[2] = False
+            self.tokens -= entry[1]
+
+    def paused_for(self, priority, now):
+        until = max((t for p, t in self.paused_until.items() if p <= priority), default=0.0)
+        return max(0.0, until - now)
+
+    def has_room(self, priority, tokens):
+        share = PRIORITY_SHARE.get(priority, 1.0)
+        if not self.entries:
+            return True  # never block an oversized request on an idle window
+        return (len(self.entries) + 1 <= self.rpm * share
+                and self.tokens + tokens <= self.tpm * share)
+
+    def next_wake(self, now):
+        if not self.entries:
+            return 1.0
+        return max(0.05, _WINDOW_SECONDS - (now - self.entries[0][0]))
+
+
+class RequestScheduler:
+    """Thread-safe sliding-window RPM/TPM limiter with a priority wait queue per model."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute, model_limits=None):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.model_limits = {_model_key(m): limits for m, limits in (model_limits or {}).items()}
+        self._cond = threading.Condition()
+        self._windows = {}                # model key -> _ModelWindow
+        self._seq = itertools.count()
+
+    # ------------------------------------------------------------------
+    # Window bookkeeping (caller holds the lock)
+    # ------------------------------------------------------------------
+
+    def _window(self, model):
+        key = _model_key(model)
+        window = self._windows.get(key)
+        if window is None:
+            rpm, tpm = self.model_limits.get(key, (self.rpm, self.tpm))
+            window = self._windows[key] = _ModelWindow(rpm, tpm)
+        return window
+
+    def _try_admit(self, window, key, priority, tokens, now):
+        """Admit `key` if it is at the head of its model's queue and fits. Returns (entry, wait)."""
+        window.expire(now)
+        paused = window.paused_for(priority, now)
+        if window.waiting[0] == key and not paused and window.has_room(priority, tokens):
+            entry = [now, tokens, True, window]
+            window.entries.append(entry)
+            window.tokens += tokens
+            return entry, 0.0
+        return None, paused or window.next_wake(now)
+
+    def _enqueue(self, window, priority, tokens):
+        tokens = min(tokens, int(window.tpm * PRIORITY_SHARE.get(priority, 1.0)))
+        key = (priority, next(self._seq))
+        heapq.heappush(window.waiting, key)
+        return key, tokens
+
+    def _dequeue(self, window, key):
+        window.waiting.remove(key)
+        heapq.heapify(window.waiting)
+        self._cond.notify_all()
+
+    def _settle(self, entry, tokens):
+        with self._cond:
+            window = entry[3]
+            # An oversized request (e.g. a whole-corpus prompt) counts as at
+            # most one full window of its own model, so it cannot hold that
+            # model's window shut for longer than a minute.
+            tokens = min(tokens, window.tpm)
+            if entry[2]:
+                window.tokens += tokens - entry[1]
+            entry[1] = tokens
+            self._cond.notify_all()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE, tokens=_OUTPUT_TOKEN_ALLOWANCE, model=MODEL_ID):
+        """
+        Block until a request to `model` of `priority` costing ~`tokens` may
+        be sent. Returns the window entry to hand back to _settle().
+        """
+        with self._cond:
+            window = self._window(model)
+            key, tokens = self._enqueue(window, priority, tokens)
+            try:
+                while True:
+                    entry, wait = self._try_admit(window, key, priority, tokens, time.time())
+                    if entry:
+                        return entry
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._dequeue(window, key)
+
+    async def acquire_async(self, priority=PRIORITY_INTERACTIVE, tokens=_OUTPUT_TOKEN_ALLOWANCE, model=MODEL_ID):
+        """acquire() for coroutines: waits without holding an event-loop thread."""
+        with self._cond:
+            window = self._window(model)
+            key, tokens = self._enqueue(window, priority, tokens)
+        try:
+            while True:
+                with self._cond:
+                    entry, wait = self._try_admit(window, key, priority, tokens, time.time())
+                if entry:
+                    return entry
+                await asyncio.sleep(min(wait, _ASYNC_POLL_SECONDS))
+        finally:
+            with self._cond:
+                self._dequeue(window, key)
+
+    def backoff(self, seconds, priority=PRIORITY_INTERACTIVE, model=MODEL_ID):
+        """Pause admissions to `model` for `priority` and every lower class for `seconds`."""
+        with self._cond:
+            paused_until = self._window(model).paused_until
+            until = time.time() + seconds
+            paused_until[priority] = max(paused_until.get(priority, 0.0), until)
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, priority=PRIORITY_INTERACTIVE, tokens=_OUTPUT_TOKEN_ALLOWANCE,
+             pause_on_rate_limit=True, model=MODEL_ID):
+        """
+        Context manager around one API call to `model`. A 429 raised inside
+        the block pauses this priority class of that model for the
+        server-suggested retry delay.
+
+        Callers with their own per-model fallback (the classifier engines,
+        via the model router) pass pause_on_rate_limit=False so one model's
+        quota does not hold back the next model in the list.
+        """
+        entry = self.acquire(priority, tokens, model)
+        try:
+            yield Slot(self, priority, entry)
+        except Exception as e:
+            if pause_on_rate_limit and classify_error(e) == "rate_limit":
+                self.backoff(retry_delay_seconds(e), priority, model)
+            raise
+
+    @contextlib.asynccontextmanager
+    async def aslot(self, priority=PRIORITY_INTERACTIVE, tokens=_OUTPUT_TOKEN_ALLOWANCE,
+                    pause_on_rate_limit=True, model=MODEL_ID):
+        """Async counterpart of slot() for calls made with the SDK's aio client."""
+        entry = await self.acquire_async(priority, tokens, model)
+        try:
+            yield Slot(self, priority, entry)
+        except Exception as e:
+            if pause_on_rate_limit and classify_error(e) == "rate_limit":
+                self.backoff(retry_delay_seconds(e), priority, model)
+            raise
+
+    def stats(self, model=MODEL_ID):
+        """Return current window usage and queue depth of `model` for debugging."""
+        with self._cond:
+            window = self._window(model)
+            window.expire(time.time())
+            return {
+                "requests_in_window": len(window.entries),
+                "tokens_in_window": window.tokens,
+                "waiting": len(window.waiting),
+            }
+
+
+_scheduler = RequestScheduler(GENAI_REQUESTS_PER_MINUTE, GENAI_TOKENS_PER_MINUTE, GENAI_MODEL_RATE_LIMITS)
+
+
+def get_scheduler() -> RequestScheduler:
+    """Return the process-wide scheduler shared by all Streamlit sessions."""
+    return _scheduler
@@ -10,6 +10,33 @@ def clean_extracted_text(text: str) -> str:
     text = text.replace("\n", " ")
     return " ".join(text.split())
 
+# File types load_corpus reads; anything else under data/ is ignored.
+CORPUS_EXTENSIONS = (".txt", ".md", ".pdf", ".docx")
+
+def load_document(file_path: str) -> str:
+    """Loads and normalizes one corpus file ("" if unsupported, empty or unreadable)"""
+    raw_text = ""
+    try:
+        if file_path.endswith(".txt") or file_path.endswith(".md"):
+            with open(file_path, "r", encoding="utf-8") as file:
+                raw_text = file.read()
+        elif file_path.endswith(".pdf"):
+            import PyPDF2
+            with open(file_path, "rb") as file:
+                reader = PyPDF2.PdfReader(file)
+                for page in reader.pages:
+                    extracted = page.extract_text()
+                    if extracted:
+                        raw_text += extracted + " "
+        elif file_path.endswith(".docx"):
+            import docx
+            doc = docx.Document(file_path)
+            raw_text = "\n".join([para.text for para in doc.paragraphs])
+    except Exception as e:
+        print(f"Error loading {os.path.basename(file_path)}: {e}")
+        return ""
+    return clean_extracted_text(raw_text)
+
 def load_corpus(data_dir: str = "data") -> Dict[str, str]:
     """Loads documents from the 'data' folder recursively"""
     if not os.path.exists(data_dir):
@@ -18,32 +45,14 @@ def load_corpus(data_dir: str = "data") -> Dict[str, str]:
     docs = {}
     for root, dirs, files in os.walk(data_dir):
         for f in files:
+            if not f.endswith(CORPUS_EXTENSIONS):
+                continue
             file_path = os.path.join(root, f)
             # Use relative path as key to avoid ambiguity
             rel_path = os.path.relpath(file_path, data_dir).replace("\\", "/") # normalize to forward slash
-            try:
-                raw_text = ""
-                if f.endswith(".txt") or f.endswith(".md"):
-                    with open(file_path, "r", encoding="utf-8") as file:
-                        raw_text = file.read()
-                elif f.endswith(".pdf"):
-                    import PyPDF2
-                    with open(file_path, "rb") as file:
-                        reader = PyPDF2.PdfReader(file)
-                        for page in reader.pages:
-                            extracted = page.extract_text()
-                            if extracted:
-                                raw_text += extracted + " "
-                elif f.endswith(".docx"):
-                    import docx
-                    doc = docx.Document(file_path)
-                    raw_text = "\n".join([para.text for para in doc.paragraphs])
-                
-                if raw_text:
-                    docs[rel_path] = clean_extracted_text(raw_text)
-                
-            except Exception as e:
-                print(f"Error loading {f}: {e}")
+            text = load_document(file_path)
+            if text:
+                docs[rel_path] = text
     return docs
 
 def find_maximal_matches(response_text: str, corpus_docs: Dict[str, str], min_len: int = 15):
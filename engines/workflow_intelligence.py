@@ -6,25 +6,23 @@ Runs on every chat turn to detect if the user is expressing a concern
 backlog candidates for the AI/ML team review dashboard.
 """
 import json
-import os
 import re
 import time
 
+from google import genai
+
+from config.app_config import CLASSIFIER_MODELS
+from engines.model_router import get_router
+from engines.prompt_templates import PromptTemplate
+from engines.request_scheduler import (
+    PRIORITY_CONCERN, PRIORITY_INTERACTIVE, estimate_tokens, get_scheduler,
+)
+
 
 # ---------------------------------------------------------------------------
 # Internal helpers
 # ---------------------------------------------------------------------------
 
-def _load_capabilities() -> str:
-    """Load the portfolio capabilities guide used as ground truth for the detector."""
-    path = os.path.join("data", "portfolio_capabilities.md")
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
-    except Exception:
-        return "No capabilities guide found."
-
-
 def _extract_json(text: str) -> dict:
     """Extract a JSON object from LLM output, stripping markdown code fences."""
     text = text.strip()
@@ -33,57 +31,63 @@ def _extract_json(text: str) -> dict:
     return json.loads(text.strip())
 
 
-def _generate_content_with_fallback(client, prompt: str) -> str:
+def _generate_content_with_fallback(client, prompt, priority=PRIORITY_CONCERN, **fields) -> tuple[str, int]:
     """
     Call generate_content with retry + model fallback.
 
-    Tries gemini-3.1-flash-lite-preview first (good for structured JSON output),
-    falls back to gemini-2.0-flash on 503 / UNAVAILABLE errors.
+    Each attempt is admitted by the shared request scheduler at `priority`.
+
+    `prompt` is either a plain string or a PromptTemplate rendered with
+    `fields`; templates send their static prefix as server-side cached
+    content when the model supports it.
+
+    Models come from CLASSIFIER_MODELS, ordered by the shared model router
+    so models that just failed or are rate limited are skipped.
     Note: the main chat uses Gemma via MODEL_ID; these Gemini models are used
     here because they are more reliable at returning strict JSON.
     """
-    # Gemma can struggle with strict JSON so use Gemini though with lower rate limit
-    models_to_try = [
-        "gemini-3.1-flash-lite-preview", 
-        "gemini-3.0-flash",
-        "gemini-2.0-flash",
-        "gemini-1.5-flash",
-        "gemini-1.5-flash-8b"
-    ]
+    router = get_router()
+    scheduler = get_scheduler()
     last_error = None
-    for model in models_to_try:
+    for model in router.route(CLASSIFIER_MODELS):
+        if isinstance(prompt, PromptTemplate):
+            contents, cached_content = prompt.request(client, model, priority, **fields)
+        else:
+            contents, cached_content = prompt, None
         try:
-            response = client.models.generate_content(
-                model=model, 
-                contents=prompt,
-                config=genai.types.GenerateContentConfig(
-                    temperature=0.1,
-                    max_output_tokens=500, # Workflow analysis is short
+            with scheduler.slot(priority, estimate_tokens(contents), pause_on_rate_limit=False,
+                                model=model) as slot:
+                t0 = time.perf_counter()
+                response = client.models.generate_content(
+                    model=model, 
+                    contents=contents,
+                    config=genai.types.GenerateContentConfig(
+                        temperature=0.1,
+                        max_output_tokens=500, # Workflow analysis is short
+                        cached_content=cached_content,
+                    )
                 )
-            )
-            tokens = response.usage_metadata.total_token_count if hasattr(response, "usage_metadata") and response.usage_metadata else 0
-            return response.text, tokens
+                tokens = response.usage_metadata.total_token_count if hasattr(response, "usage_metadata") and response.usage_metadata else 0
+                slot.record(tokens)
+                router.record_success(model, time.perf_counter() - t0)
+                return response.text, tokens
         except Exception as e:
             last_error = e
-            # If 503 or 429, don't wait too long, just try the next model in our robust list
+            if cached_content:
+                # Rebuilt next time only if the cache itself was the problem.
+                prompt.invalidate_server_cache(client, model, cached_content, e)
+            # If 503 or 429, don't wait, just try the next model in our robust list
+            router.record_failure(model, e)
             print(f"[workflow_intelligence] Model {model} failed: {e}")
             continue
     raise last_error  # type: ignore[misc]
 
 
 # ---------------------------------------------------------------------------
-# Public API
+# Concern detector prompt
 # ---------------------------------------------------------------------------
 
-def detect_concern(client, message_text: str) -> dict:
-    """
-    Analyze a user message to detect workflow concerns in the portfolio context.
-
-    Returns a dict with at minimum an ``is_concern`` boolean key.
-    On any error, returns ``{"is_concern": False}`` so the caller is never blocked.
-    """
-    capabilities = _load_capabilities()
-    prompt = f"""
+_CONCERN_PREFIX = """
     You are an intelligent workflow detector for a portfolio Streamlit app.
     A visitor is interacting with the portfolio chatbot.
 
@@ -119,10 +123,31 @@ def detect_concern(client, message_text: str) -> dict:
         "analysis": "A brief 1-sentence summary of the pain point."
     }}
 
-    User Message: "{message_text}"
+"""
+
+_CONCERN_TEMPLATE = PromptTemplate(
+    "concern_detector",
+    prefix_template=_CONCERN_PREFIX,
+    turn_template='    User Message: "{message_text}"\n    ',
+    missing_capabilities="No capabilities guide found.",
+)
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def detect_concern(client, message_text: str) -> dict:
+    """
+    Analyze a user message to detect workflow concerns in the portfolio context.
+
+    Returns a dict with at minimum an ``is_concern`` boolean key.
+    On any error, returns ``{"is_concern": False}`` so the caller is never blocked.
     """
     try:
-        text, tokens = _generate_content_with_fallback(client, prompt)
+        text, tokens = _generate_content_with_fallback(
+            client, _CONCERN_TEMPLATE, message_text=message_text
+        )
         result = _extract_json(text)
         return result, tokens
     except Exception as e:
@@ -161,5 +186,6 @@ def generate_backlog_candidate(client, concerns_list: list) -> dict:
         "acceptance_criteria": "Comma-separated list of acceptance criteria"
     }}
     """
-    text, _ = _generate_content_with_fallback(client, prompt)
+    # An admin is waiting on the dashboard, so this runs at answer priority.
+    text, _ = _generate_content_with_fallback(client, prompt, priority=PRIORITY_INTERACTIVE)
     return _extract_json(text)
@@ -10,10 +10,9 @@ import os
 from google import genai
 from utils.sidebar import render_sidebar
 from utils.workflow_db import (
-    get_unresolved_concerns, get_all_concerns,
     mark_concern_resolved, discard_concern, mark_concern_accepted,
-    get_backlog_candidates, insert_backlog_candidate,
-    get_activity_log
+    insert_backlog_candidate, get_concern_metrics,
+    get_concerns_page, get_backlog_candidates_page, get_activity_log_page, failed_writes
 )
 from engines.workflow_intelligence import generate_backlog_candidate
 from state import init_session_state
@@ -39,15 +38,53 @@ def get_client():
         return None
     return genai.Client(api_key=api_key)
 
+def load_page(key, fetch_page):
+    """
+    Fetch the current page of a keyset-paginated list. The cursors of the
+    pages walked so far are kept in session_state[key], newest page first.
+    Returns (rows, next_cursor).
+    """
+    cursors = st.session_state.setdefault(key, [None])
+    rows, next_cursor = fetch_page(after=cursors[-1])
+    if not rows and len(cursors) > 1:
+        # Everything on this page was triaged away; step back a page.
+        cursors.pop()
+        rows, next_cursor = fetch_page(after=cursors[-1])
+    return rows, next_cursor
+
+def render_pager(key, next_cursor):
+    """Newer/Older buttons for a list loaded with load_page()."""
+    cursors = st.session_state[key]
+    if len(cursors) == 1 and next_cursor is None:
+        return
+    prev_col, info_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        if st.button("← Newer", key=f"{key}_prev", disabled=len(cursors) == 1, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    info_col.caption(f"Page {len(cursors)}")
+    with next_col:
+        if st.button("Older →", key=f"{key}_next", disabled=next_cursor is None, use_container_width=True):
+            cursors.append(next_cursor)
+            st.rerun()
+
 
 st.title("⚙️ Review Dashboard")
 st.markdown("Monitor workflow pain points, feature requests, and trust concerns.")
 
+dropped = failed_writes()
+if dropped:
+    st.error(f"{len(dropped)} queued database write(s) could not be saved since the server started:")
+    for item in dropped[-5:]:
+        st.caption(f"{item['name']} — {item['error']}")
+
 tab1, tab2, tab3, tab4 = st.tabs(["Unresolved Concerns", "Backlog Candidates", "Metrics", "Audit Log"])
 
 with tab1:
     st.subheader("Top Unresolved Concerns")
-    concerns = get_unresolved_concerns()
+    concerns, concerns_next = load_page(
+        "unresolved_cursors", lambda after: get_concerns_page("unresolved", after)
+    )
     
     if not concerns:
         st.info("No unresolved concerns at the moment!")
@@ -138,9 +175,11 @@ with tab1:
                             except Exception as e:
                                 st.error(f"Error generating candidate: {e}")
 
+        render_pager("unresolved_cursors", concerns_next)
+
 with tab2:
     st.subheader("Backlog Candidates")
-    candidates = get_backlog_candidates()
+    candidates, candidates_next = load_page("backlog_cursors", get_backlog_candidates_page)
     if not candidates:
         st.info("No backlog candidates yet. Select concerns in the 'Unresolved Concerns' tab and click 'Generate Backlog Candidate'.")
     for cand in candidates:
@@ -160,41 +199,39 @@ with tab2:
             st.markdown(cand['acceptance_criteria'])
             st.markdown("#### Original Evidence")
             st.text(cand['original_evidence'])
+    render_pager("backlog_cursors", candidates_next)
             
 with tab3:
     st.subheader("Workflow Intelligence Metrics")
-    all_concerns = get_all_concerns()
-    unresolved = get_unresolved_concerns()
-    all_candidates = get_backlog_candidates()
-    
-    # Count by status
-    status_counts = {}
-    for c in all_concerns:
-        s = c.get("status", "unknown")
-        status_counts[s] = status_counts.get(s, 0) + 1
+    metrics = get_concern_metrics()
+    status_counts = metrics["status"]
+    total = sum(status_counts.values())
     
     col1, col2, col3, col4, col5 = st.columns(5)
-    col1.metric("Total Captured", len(all_concerns))
-    col2.metric("🟡 Unresolved", len(unresolved))
+    col1.metric("Total Captured", total)
+    col2.metric("🟡 Unresolved", status_counts.get("unresolved", 0))
     col3.metric("✅ Solved", status_counts.get("solved", 0))
     col4.metric("🗑️ Discarded", status_counts.get("discarded", 0))
     col5.metric("🟢 In Backlog", status_counts.get("accepted_to_backlog", 0))
     
-    if all_concerns:
+    if total:
         st.markdown("---")
         st.markdown("#### Breakdown by Category")
-        cat_counts = {}
-        for c in all_concerns:
-            cat = c.get("concern_category", "Unknown")
-            cat_counts[cat] = cat_counts.get(cat, 0) + 1
-        for cat, count in sorted(cat_counts.items(), key=lambda x: -x[1]):
-            st.markdown(f"- **{cat}**: {count} concern(s)")
+        for cat, count in sorted(metrics["category"].items(), key=lambda x: -x[1]):
+            st.markdown(f"- **{cat or 'Unknown'}**: {count} concern(s)")
+
+        st.markdown("#### Breakdown by Workflow Stage")
+        for stage, count in sorted(metrics["workflow_stage"].items(), key=lambda x: -x[1]):
+            st.markdown(f"- **{stage or 'Unknown'}**: {count} concern(s)")
+
+        st.markdown("#### Concerns Captured per Day")
+        st.bar_chart({"Concerns": dict(sorted(metrics["day"].items()))})
 
 with tab4:
     st.subheader("Audit Log")
     st.caption("Every action taken on a concern is logged here.")
     
-    log = get_activity_log()
+    log, log_next = load_page("audit_cursors", get_activity_log_page)
     if not log:
         st.info("No actions logged yet.")
     else:
@@ -218,3 +255,4 @@ with tab4:
                     + (f"  \n**Category:** {category}" if category else "")
                 )
             st.markdown("---")
+        render_pager("audit_cursors", log_next)
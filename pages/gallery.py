@@ -1,10 +1,8 @@
 import streamlit as st
 import os
-import io
-import base64
 import random
-from PIL import Image
 from utils.sidebar import render_sidebar
+from utils.image_variants import get_variant_store, list_images
 from config.about_data import GALLERY_CAPTIONS, GALLERY_SUBTITLES, GALLERY_MAIN_TITLE, GALLERY_MAIN_SUBTITLE
 import streamlit.components.v1 as components
 
@@ -44,34 +42,24 @@ st.markdown("""
 
 render_sidebar()
 
-@st.cache_data
-def get_image_data(path):
-    """Returns base64 string, original dimensions (w, h), and filename."""
+def get_image_data(path, entry):
+    """Returns image URLs (src + srcsets), original dimensions (w, h), and filename."""
+    # Variants are precomputed by utils/image_variants.py and served from
+    # /app/static, so the browser fetches (and caches) each file once instead
+    # of receiving it base64-inlined into the gallery HTML.
     try:
-        with Image.open(path) as img:
-            # Capture original size for ratio
-            orig_w, orig_h = img.size
-            
-            # Resize if too large (Max 1200px) - Maintains aspect ratio
-            img.thumbnail((1200, 1200))
-            
-            # Convert to efficient format (JPEG) for transfer
-            # Convert RGBA to RGB if needed
-            if img.mode in ("RGBA", "P"):
-                img = img.convert("RGB")
-            
-            # Save to Bytes
-            buffered = io.BytesIO()
-            img.save(buffered, format="JPEG", quality=85)
-            
-            # Encode
-            encoded = base64.b64encode(buffered.getvalue()).decode()
-            b64 = f"data:image/jpeg;base64,{encoded}"
-            
-            # Return filename for captioning
-            filename = os.path.basename(path)
-            
-            return b64, orig_w, orig_h, filename
+        store = get_variant_store()
+        base_url_path = st.get_option("server.baseUrlPath")
+        image = {
+            "src": store.url(entry["variants"][-1]["jpeg"], base_url_path),
+            "webp": store.srcset(entry, "webp", base_url_path),
+            "fallback": store.srcset(entry, "jpeg", base_url_path),
+        }
+        
+        # Return filename for captioning
+        filename = os.path.basename(path)
+        
+        return image, entry["width"], entry["height"], filename
     except Exception as e:
         print(f"Error loading {path}: {e}")
         return None, 0, 0, ""
@@ -291,7 +279,7 @@ def generate_gallery_html(image_data_list):
     
     sections = ""
     
-    for idx, (b64, w, h, fname) in enumerate(image_data_list):
+    for idx, (image, w, h, fname) in enumerate(image_data_list):
         cols, rows = calculate_grid_coverage(w, h)
         GRID_COLS = 8
         GRID_ROWS = 6
@@ -340,6 +328,13 @@ def generate_gallery_html(image_data_list):
         text_transform = "translateY(0px)" if is_first else "translateY(20px)"
 
         # Image Tiles
+        # Every tile shows the same file, so the browser downloads it once; it
+        # picks the WebP (or JPEG/PNG) width matching the image's on-screen
+        # width, and only the first slide loads before it is scrolled near.
+        sizes = f"{cols * 100 // GRID_COLS}vw"
+        loading = 'loading="eager" fetchpriority="high"' if is_first else 'loading="lazy"'
+        # No WebP srcset while the variants are still being built (original served)
+        webp_source = f'<source type="image/webp" srcset="{image["webp"]}" sizes="{sizes}">' if image["webp"] else ""
         inner_tiles = ""
         for r_i in range(rows):
             for c_i in range(cols):
@@ -355,7 +350,10 @@ def generate_gallery_html(image_data_list):
                 style = " ".join(style.split()) 
                 inner_tiles += f"""
                 <div class="grid-tile image-part" style="position: relative; overflow: hidden;">
-                    <img src="{b64}" class="tile-img" style="{style}">
+                    <picture>
+                        {webp_source}
+                        <img src="{image['src']}" srcset="{image['fallback']}" sizes="{sizes}" {loading} decoding="async" alt="{fname}" class="tile-img" style="{style}">
+                    </picture>
                 </div>
                 """
         
@@ -563,14 +561,17 @@ gallery_dir = "gallery"
 if not os.path.exists(gallery_dir):
     st.error("Gallery folder missing")
 else:
-    files = sorted([os.path.join(gallery_dir, f) for f in os.listdir(gallery_dir) if f.lower().endswith(('.png','.jpg','.jpeg'))])
+    files = list_images(gallery_dir)
     if not files:
         st.warning("No images")
     else:
-        # Load data
+        # Load data (renders variants only for new or changed photos)
+        entries = get_variant_store().ensure(files)
         img_data = []
         for f in files:
-            d = get_image_data(f)
+            if f not in entries:
+                continue
+            d = get_image_data(f, entries[f])
             if d[0]: img_data.append(d)
         
         # Duplicate for demo effectiveness if needed
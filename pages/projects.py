@@ -3,8 +3,8 @@ import os
 from utils.sidebar import render_sidebar
 from utils.video_modal import handle_video_state, render_video_modal, render_replay_button
 from st_click_detector import click_detector
+from utils.image_variants import get_variant_store, list_images
 import html
-import base64
 import re
 
 st.set_page_config(layout="wide", page_title="Projects", page_icon="🛋️")
@@ -16,6 +16,9 @@ render_sidebar()
 
 
 # --- HELPER FUNCTIONS ---
+# Project images fill the content column (80% of the wide layout, full width on mobile).
+PROJECT_IMAGE_SIZES = "(max-width: 800px) 100vw, 80vw"
+
 def load_projects(data_dir=os.path.join("data", "projects")):
     projects = []
     if not os.path.exists(data_dir):
@@ -70,6 +73,98 @@ def load_projects(data_dir=os.path.join("data", "projects")):
             })
     return projects
 
+def inject_images_and_get_toc(markdown_text, base_path):
+    # Image Injection
+    img_pattern = r'!\[(.*?)\]\((.*?)\)'
+    
+    # Images are served by URL from precomputed variants (utils/image_variants.py)
+    # instead of being base64-inlined into the page on every view.
+    store = get_variant_store()
+    base_url_path = st.get_option("server.baseUrlPath")
+    image_paths = {
+        m.group(2): os.path.normpath(os.path.join(base_path, m.group(2)))
+        for m in re.finditer(img_pattern, markdown_text)
+    }
+    entries = store.ensure(set(image_paths.values()))
+    
+    def replace_img(match):
+        alt_text = match.group(1)
+        entry = entries.get(image_paths[match.group(2)])
+        
+        if entry:
+            largest = entry["variants"][-1]
+            webp = store.srcset(entry, "webp", base_url_path)
+            webp_source = f'<source type="image/webp" srcset="{webp}" sizes="{PROJECT_IMAGE_SIZES}">' if webp else ""
+            return (
+                f'<picture>{webp_source}'
+                f'<img src="{store.url(largest["jpeg"], base_url_path)}" srcset="{store.srcset(entry, "jpeg", base_url_path)}" sizes="{PROJECT_IMAGE_SIZES}" '
+                f'width="{largest["width"]}" height="{largest["height"]}" loading="lazy" decoding="async" alt="{alt_text}" '
+                f'style="display: block; margin: 20px auto; max-width: 100%; height: auto; border-radius: 8px;"></picture>'
+            )
+        return match.group(0) 
+
+    processed_content = re.sub(img_pattern, replace_img, markdown_text)
+    
+    # Extract Headers for TOC and inject Anchors
+    toc_entries = []
+    final_lines = []
+    existing_slugs = set()
+    in_code_block = False
+
+    for line in processed_content.split('\n'):
+        stripped = line.strip()
+        
+        if stripped.startswith('```'):
+            in_code_block = not in_code_block
+        
+        if not in_code_block and stripped.startswith('#'):
+            # Determine level
+            level = len(line.split(' ')[0])
+            # Clean title
+            title_text = stripped.lstrip('#').strip()
+            
+            if title_text and level <= 3:
+                # Generate slug
+                raw_slug = title_text.lower().replace(' ', '-').replace('.', '')
+                cleaned_slug = re.sub(r'[^a-z0-9\-]', '', raw_slug)
+                
+                # Handle duplicates
+                slug = cleaned_slug
+                counter = 1
+                while slug in existing_slugs:
+                    slug = f"{cleaned_slug}-{counter}"
+                    counter += 1
+                existing_slugs.add(slug)
+                
+                toc_entries.append((level, title_text, slug))
+                
+                anchor_tag = f'<span id="{slug}"></span>'
+                final_lines.append(f'{anchor_tag}\n\n{line}')
+            else:
+                final_lines.append(line)
+        else:
+            final_lines.append(line)
+    
+    return '\n'.join(final_lines), toc_entries
+
+
+def project_mtime(project_path):
+    """Latest mtime of a project file and the images next to it (the render cache key)."""
+    images = list_images(os.path.join(os.path.dirname(project_path), "images"))
+    return max(os.stat(p).st_mtime_ns for p in [project_path] + images)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def render_project(project_path, mtime_ns, variants_version):
+    """
+    Processed Markdown and TOC of one project, cached until it or its images
+    change, or a background variant build lands (so figures first served as
+    originals switch to their resized variants).
+    """
+    with open(project_path, "r", encoding="utf-8") as f:
+        content = f.read()
+    return inject_images_and_get_toc(content, os.path.dirname(project_path))
+
+
 # --- MAIN UI ---
 
 # Check Query Params for Detail View
@@ -80,76 +175,8 @@ if current_project:
     project_path = os.path.join("data", "projects", current_project)
     
     if os.path.exists(project_path):
-        with open(project_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        
-        def inject_images_and_get_toc(markdown_text, base_path=os.path.dirname(project_path)):
-            # Image Injection
-            img_pattern = r'!\[(.*?)\]\((.*?)\)'
-            
-            def replace_img(match):
-                alt_text = match.group(1)
-                img_path = match.group(2)
-                full_path = os.path.join(base_path, img_path)
-                
-                if os.path.exists(full_path):
-                    try:
-                        with open(full_path, "rb") as img_f:
-                            encoded_string = base64.b64encode(img_f.read()).decode()
-                        
-                        ext = os.path.splitext(full_path)[1].lower().replace(".", "")
-                        mime = f"image/{ext}" if ext != "jpg" else "image/jpeg"
-                        
-                        return f'<img src="data:{mime};base64,{encoded_string}" alt="{alt_text}" style="display: block; margin: 20px auto; max-width: 100%; border-radius: 8px;">'
-                    except Exception:
-                        return match.group(0)
-                return match.group(0) 
-
-            processed_content = re.sub(img_pattern, replace_img, markdown_text)
-            
-            # Extract Headers for TOC and inject Anchors
-            toc_entries = []
-            final_lines = []
-            existing_slugs = set()
-            in_code_block = False
-
-            for line in processed_content.split('\n'):
-                stripped = line.strip()
-                
-                if stripped.startswith('```'):
-                    in_code_block = not in_code_block
-                
-                if not in_code_block and stripped.startswith('#'):
-                    # Determine level
-                    level = len(line.split(' ')[0])
-                    # Clean title
-                    title_text = stripped.lstrip('#').strip()
-                    
-                    if title_text and level <= 3:
-                        # Generate slug
-                        raw_slug = title_text.lower().replace(' ', '-').replace('.', '')
-                        cleaned_slug = re.sub(r'[^a-z0-9\-]', '', raw_slug)
-                        
-                        # Handle duplicates
-                        slug = cleaned_slug
-                        counter = 1
-                        while slug in existing_slugs:
-                            slug = f"{cleaned_slug}-{counter}"
-                            counter += 1
-                        existing_slugs.add(slug)
-                        
-                        toc_entries.append((level, title_text, slug))
-                        
-                        anchor_tag = f'<span id="{slug}"></span>'
-                        final_lines.append(f'{anchor_tag}\n\n{line}')
-                    else:
-                        final_lines.append(line)
-                else:
-                    final_lines.append(line)
-            
-            return '\n'.join(final_lines), toc_entries
-
-        content, toc_headers = inject_images_and_get_toc(content)
+        content, toc_headers = render_project(project_path, project_mtime(project_path),
+                                               get_variant_store().version)
         
         # Reduce top padding of the page
         st.markdown("""
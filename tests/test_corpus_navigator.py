@@ -0,0 +1,62 @@
+"""CorpusNavigator over the corpus as load_corpus() actually returns it."""
+import pytest
+
+from agents.rlm.base import _LINE_CHARS, CorpusNavigator, build_corpus
+from engines.trace_engine import load_corpus
+
+GUIDE = """# How It Works
+
+This portfolio is a working AI application. {filler}
+
+## Retrieval Modes
+
+The RLM navigates the corpus with Python instead of reading all of it. {filler}
+
+```python
+# not a heading
+x = 1
+```
+
+## Trace Engine
+
+Citations are matched back to their source documents. {filler}
+"""
+
+
+@pytest.fixture
+def navigator(tmp_path):
+    filler = " ".join(f"word{i}" for i in range(300))
+    (tmp_path / "guide.md").write_text(GUIDE.format(filler=filler), encoding="utf-8")
+    (tmp_path / "notes.txt").write_text("Short note about streamlit caching.\n", encoding="utf-8")
+    docs = load_corpus(str(tmp_path))
+    assert "\n" not in docs["guide.md"]   # load_corpus flattens newlines
+    return CorpusNavigator(build_corpus(docs)), docs
+
+
+def test_lines_are_bounded_windows(navigator):
+    nav, docs = navigator
+    files = dict(nav.list_files())
+    assert files["guide.md"] > 10
+    assert files["notes.txt"] == 1
+    assert max(len(line) for line in nav.lines) <= _LINE_CHARS
+    assert nav.read_file("guide.md") == docs["guide.md"]
+
+
+def test_outline_finds_flattened_headings(navigator):
+    nav, _ = navigator
+    headings = [heading for _, heading in nav.outline("guide.md")]
+    assert [h.split(" ", 1)[0] for h in headings] == ["#", "##", "##"]
+    assert headings[0].startswith("# How It Works This portfolio")
+    assert headings[1].startswith("## Retrieval Modes")
+    assert all(len(h) <= 90 for h in headings)
+
+
+def test_search_returns_the_hit_line_only(navigator):
+    nav, _ = navigator
+    (name, line, text), = nav.search("navigates the corpus")
+    assert name == "guide.md"
+    assert "navigates the corpus" in text
+    assert len(text) <= _LINE_CHARS
+    window = nav.read_file(name, line - 5, line + 15)
+    assert "navigates the corpus" in window
+    assert len(window) <= 21 * (_LINE_CHARS + 1)
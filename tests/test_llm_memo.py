@@ -0,0 +1,39 @@
+"""Response handling in agents/rlm/llm_memo.py."""
+import asyncio
+from types import SimpleNamespace
+
+from agents.rlm.llm_memo import LLMMemo
+
+
+def _response(text, tokens=10):
+    return SimpleNamespace(text=text, usage_metadata=SimpleNamespace(total_token_count=tokens))
+
+
+def test_blocked_response_is_empty_string_and_not_cached():
+    memo = LLMMemo("test-model", shared=False)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return _response(None)
+
+    async def run():
+        # Two identical prompts in flight: the second waits on the first.
+        return await asyncio.gather(memo.call("p", fetch), memo.call("p", fetch))
+
+    assert asyncio.run(run()) == ["", ""]
+    assert len(calls) == 1
+    assert asyncio.run(memo.call("p", fetch)) == ""
+    assert len(calls) == 2   # empty responses are not memoized
+
+
+def test_text_response_is_reused():
+    memo = LLMMemo("test-model", shared=False)
+
+    async def fetch():
+        return _response("answer", tokens=42)
+
+    assert asyncio.run(memo.call("p", fetch)) == "answer"
+    assert asyncio.run(memo.call("p", fetch)) == "answer"
+    assert (memo.hits, memo.tokens_saved) == (1, 42)
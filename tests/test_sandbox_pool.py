@@ -0,0 +1,55 @@
+"""Corpus publishing and worker accounting in agents/rlm/sandbox_pool.py."""
+import pytest
+
+from agents.rlm.base import build_corpus, get_navigator
+from agents.rlm.sandbox_pool import SandboxPool, SandboxUnavailable
+
+
+@pytest.fixture
+def pool():
+    pool = SandboxPool(pool_size=2, max_workers=2)
+    yield pool
+    pool.shutdown()
+
+
+def _namespace(sandbox):
+    return sandbox.namespace({"search": get_navigator(sandbox.context).search})
+
+
+def test_leased_generation_survives_eviction(pool):
+    context = build_corpus({"a.md": "alpha text"})
+    sandbox = pool.lease(context)
+    for i in range(3):   # push it out of the published generations
+        pool.lease(build_corpus({f"g{i}.md": f"generation {i}"})).release()
+
+    ns = _namespace(sandbox)
+    sandbox._restart()   # what a snippet timeout or OOM does
+    result = ns.execute("print(search('alpha'))")
+    assert result["stderr"] == ""
+    assert "alpha text" in result["stdout"]
+
+    key = sandbox._key
+    sandbox.release()
+    assert key not in pool._corpora or pool._corpora[key].leases == 0
+
+
+def test_attach_failure_is_sandbox_unavailable(pool):
+    sandbox = pool.lease(build_corpus({"a.md": "alpha text"}))
+    ns = _namespace(sandbox)
+    sandbox._shm.unlink()
+    with pytest.raises(SandboxUnavailable):
+        sandbox._restart()
+    assert "could not load the corpus" in ns.execute("print(1)")["stderr"]
+    sandbox.release()
+
+
+
+def test_top_up_stays_within_max_workers():
+    pool = SandboxPool(pool_size=2, max_workers=1)
+    try:
+        sandbox = pool.lease(build_corpus({"a.md": "alpha"}))
+        pool._top_up()
+        assert pool._busy + len(pool._idle) + pool._preforking == 1
+        sandbox.release()
+    finally:
+        pool.shutdown()
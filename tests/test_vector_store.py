@@ -0,0 +1,46 @@
+"""Incremental re-indexing in agents/vector/vector_store.py."""
+import hashlib
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+from agents.vector.vector_store import VectorEngine
+
+
+def _paragraph(seed, words=60):
+    return " ".join(f"{seed}{i}" for i in range(words))
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = VectorEngine(api_key="test-key", model_id="test-embedding", persist_dir=str(tmp_path))
+    embedded = []
+
+    def fake_embedding(text, max_retries=5, priority=None):
+        embedded.append(text)
+        digest = hashlib.md5(text.encode()).digest()
+        return [b / 255 for b in digest[:8]]
+
+    monkeypatch.setattr(engine, "get_embedding", fake_embedding)
+    engine.embedded = embedded
+    return engine
+
+
+def test_rebuild_reembeds_only_changed_chunk(engine):
+    paragraphs = [_paragraph(tag) for tag in ("alpha", "beta", "gamma", "delta")]
+    # One chunk per paragraph, so editing a paragraph changes exactly one chunk.
+    engine.chunk_text = lambda text, **_: text.split("\n\n")
+    docs = {"notes.md": "\n\n".join(paragraphs), "other.md": _paragraph("other")}
+
+    assert engine.build_index(docs) == 5
+    assert len(engine.embedded) == 5
+
+    engine.embedded.clear()
+    paragraphs[2] = _paragraph("changed")
+    docs["notes.md"] = "\n\n".join(paragraphs)
+
+    assert engine.build_index(docs) == 4          # every chunk of notes.md is rewritten...
+    assert engine.embedded == [paragraphs[2]]     # ...but only the changed one is embedded
+    assert not engine.is_stale(docs)
+    assert engine.collection.count() == 5
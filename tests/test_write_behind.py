@@ -0,0 +1,28 @@
+"""Failure handling in utils/write_behind.py."""
+import logging
+from functools import partial
+
+from utils.db_pool import SQLitePool
+from utils.write_behind import WriteBehindQueue
+
+
+def _insert(conn, value):
+    conn.execute("INSERT INTO items (value) VALUES (?)", (value,))
+
+
+def test_failed_write_is_dead_lettered(tmp_path, caplog):
+    pool = SQLitePool(str(tmp_path / "test.db"))
+    with pool.write() as conn:
+        conn.execute("CREATE TABLE items (value TEXT NOT NULL)")
+    writes = WriteBehindQueue(pool, name="test", flush_interval=0.05)
+
+    writes.submit(partial(_insert, value="kept"))
+    writes.submit(partial(_insert, value=None))   # violates NOT NULL
+    with caplog.at_level(logging.WARNING, logger="utils.write_behind"):
+        assert writes.flush(timeout=5)
+
+    assert [row["value"] for row in pool.fetchall("SELECT value FROM items")] == ["kept"]
+    (dead,) = writes.dead_letters()
+    assert dead["name"] == "_insert(value=None)"
+    assert "NOT NULL" in dead["error"]
+    assert any(r.levelno == logging.ERROR and "Dropped write" in r.getMessage() for r in caplog.records)
@@ -1,24 +1,42 @@
-import sqlite3
+import hashlib
 import os
 import uuid
 from datetime import datetime
+from functools import partial
+
+from utils import text_delta
+from utils.db_pool import SQLitePool
+from utils.write_behind import WriteBehindQueue
 
 DB_DIR = os.path.join("data", "db")
 DB_PATH = os.path.join(DB_DIR, "guestbook.db")
 
+_pool = SQLitePool(DB_PATH)
+_writes = WriteBehindQueue(_pool, name="guestbook")
+
+# Schema migrations, applied once each by init_db() (see SQLitePool.migrate).
+# Append new entries; never edit or reorder applied ones.
+_MIGRATIONS = [
+    # 1. Content-addressed version storage. Document text is stored once in
+    #    content_blobs (zlib, keyed by sha256); a version references its base
+    #    blob and, for a proposal, a compact line delta against it
+    #    (utils/text_delta.py). content_markdown is only kept on legacy rows.
+    (
+        "CREATE TABLE IF NOT EXISTS content_blobs (hash TEXT PRIMARY KEY, content BLOB NOT NULL) WITHOUT ROWID",
+        "ALTER TABLE document_versions ADD COLUMN base_hash TEXT",
+        "ALTER TABLE document_versions ADD COLUMN delta BLOB",
+        "CREATE INDEX IF NOT EXISTS idx_versions_document_base ON document_versions (document_id, base_hash)",
+        "CREATE INDEX IF NOT EXISTS idx_change_requests_status ON change_requests (status)",
+    ),
+]
+
 def get_connection():
-    if not os.path.exists(DB_DIR):
-        os.makedirs(DB_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Pooled, per-thread WAL connection (utils/db_pool.py); do not close it.
+    return _pool.connection()
 
 def init_db():
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     # Tables as proposed
-    cursor.executescript('''
+    get_connection().executescript('''
         CREATE TABLE IF NOT EXISTS documents (
             id TEXT PRIMARY KEY,
             title TEXT,
@@ -67,84 +85,136 @@ def init_db():
             timestamp TEXT
         );
     ''')
-    conn.commit()
-    conn.close()
+    if 1 in _pool.migrate(_MIGRATIONS):
+        _compact_legacy_versions()
+
+def _put_blob(conn, content):
+    # Store `content` once, keyed by its hash; returns the hash.
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    conn.execute("INSERT OR IGNORE INTO content_blobs (hash, content) VALUES (?, ?)",
+                 (content_hash, text_delta.compress(content)))
+    return content_hash
+
+def _get_blob(conn, content_hash):
+    row = conn.execute("SELECT content FROM content_blobs WHERE hash = ?", (content_hash,)).fetchone()
+    return text_delta.decompress(row["content"])
+
+def _load_version(conn, version_id):
+    # Rebuild a version's text from its base blob and delta.
+    row = conn.execute("SELECT content_markdown, base_hash, delta FROM document_versions WHERE id = ?",
+                       (version_id,)).fetchone()
+    if row is None:
+        return None
+    if row["content_markdown"] is not None:
+        return row["content_markdown"]
+    base = _get_blob(conn, row["base_hash"])
+    return text_delta.apply(base, row["delta"]) if row["delta"] is not None else base
+
+def _compact_legacy_versions():
+    # Move full-text rows written before migration 1 into blob + delta storage.
+    with _pool.write() as conn:
+        legacy = conn.execute("""
+            SELECT cr.base_version_id, cr.proposed_version_id,
+                   v_base.content_markdown AS base_content,
+                   v_prop.content_markdown AS proposed_content
+            FROM change_requests cr
+            JOIN document_versions v_base ON cr.base_version_id = v_base.id
+            JOIN document_versions v_prop ON cr.proposed_version_id = v_prop.id
+            WHERE v_prop.content_markdown IS NOT NULL
+        """).fetchall()
+        for row in legacy:
+            base = row["base_content"] if row["base_content"] is not None else _load_version(conn, row["base_version_id"])
+            base_hash = _put_blob(conn, base or "")
+            conn.execute("UPDATE document_versions SET base_hash = ?, delta = NULL, content_markdown = NULL WHERE id = ?",
+                         (base_hash, row["base_version_id"]))
+            conn.execute("UPDATE document_versions SET base_hash = ?, delta = ?, content_markdown = NULL WHERE id = ?",
+                         (base_hash, text_delta.encode(base or "", row["proposed_content"]), row["proposed_version_id"]))
+        for row in conn.execute("SELECT id, content_markdown FROM document_versions WHERE content_markdown IS NOT NULL").fetchall():
+            conn.execute("UPDATE document_versions SET base_hash = ?, content_markdown = NULL WHERE id = ?",
+                         (_put_blob(conn, row["content_markdown"]), row["id"]))
+
+def _insert_audit(conn, row):
+    conn.execute("INSERT INTO audit_log (id, action, user_id, target_id, timestamp) VALUES (?, ?, ?, ?, ?)", row)
+
+def failed_writes():
+    """Queued audit writes that could not be committed (see WriteBehindQueue.dead_letters)."""
+    _writes.flush()
+    return _writes.dead_letters()
 
 def log_audit(action, user_id, target_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO audit_log (id, action, user_id, target_id, timestamp) VALUES (?, ?, ?, ?, ?)",
-        (str(uuid.uuid4()), action, user_id, target_id, datetime.now().isoformat())
-    )
-    conn.commit()
-    conn.close()
+    # Queued; committed in a batch off the request path (utils/write_behind.py).
+    row = (str(uuid.uuid4()), action, user_id, target_id, datetime.now().isoformat())
+    _writes.submit(partial(_insert_audit, row=row))
 
 def create_change_request(document_id, original_content, proposed_content, user_id):
     """Creates a new change request with the original and proposed versions."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # 1. Ensure document exists
-    cursor.execute("SELECT id FROM documents WHERE id = ?", (document_id,))
-    if not cursor.fetchone():
-        cursor.execute("INSERT INTO documents (id, title, status) VALUES (?, ?, ?)",
-                       (document_id, document_id, "active"))
-    
-    # 2. Create Base Version
-    base_version_id = str(uuid.uuid4())
-    cursor.execute("""
-        INSERT INTO document_versions (id, document_id, content_markdown, created_by, created_at, is_live)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (base_version_id, document_id, original_content, "system", datetime.now().isoformat(), True))
+    with _pool.write() as conn:
+        cursor = conn.cursor()
     
-    # 3. Create Proposed Version
-    proposed_version_id = str(uuid.uuid4())
-    cursor.execute("""
-        INSERT INTO document_versions (id, document_id, content_markdown, created_by, created_at, is_live)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (proposed_version_id, document_id, proposed_content, user_id, datetime.now().isoformat(), False))
+        # 1. Ensure document exists
+        cursor.execute("SELECT id FROM documents WHERE id = ?", (document_id,))
+        if not cursor.fetchone():
+            cursor.execute("INSERT INTO documents (id, title, status) VALUES (?, ?, ?)",
+                           (document_id, document_id, "active"))
     
-    # 4. Create Change Request
-    request_id = str(uuid.uuid4())
-    cursor.execute("""
-        INSERT INTO change_requests (id, document_id, base_version_id, proposed_version_id, created_by, status)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (request_id, document_id, base_version_id, proposed_version_id, user_id, "in_review"))
+        # 2. Find or create the Base Version (identical live content is stored once)
+        base_hash = _put_blob(conn, original_content)
+        cursor.execute("SELECT id FROM document_versions WHERE document_id = ? AND base_hash = ? AND delta IS NULL",
+                       (document_id, base_hash))
+        existing = cursor.fetchone()
+        if existing:
+            base_version_id = existing["id"]
+        else:
+            base_version_id = str(uuid.uuid4())
+            cursor.execute("""
+                INSERT INTO document_versions (id, document_id, base_hash, created_by, created_at, is_live)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (base_version_id, document_id, base_hash, "system", datetime.now().isoformat(), True))
     
-    conn.commit()
-    conn.close()
+        # 3. Create Proposed Version as a delta against the base
+        proposed_version_id = str(uuid.uuid4())
+        cursor.execute("""
+            INSERT INTO document_versions (id, document_id, base_hash, delta, created_by, created_at, is_live)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (proposed_version_id, document_id, base_hash, text_delta.encode(original_content, proposed_content),
+              user_id, datetime.now().isoformat(), False))
     
-    log_audit("create_request", user_id, request_id)
+        # 4. Create Change Request
+        request_id = str(uuid.uuid4())
+        cursor.execute("""
+            INSERT INTO change_requests (id, document_id, base_version_id, proposed_version_id, created_by, status)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (request_id, document_id, base_version_id, proposed_version_id, user_id, "in_review"))
+        
+        log_audit("create_request", user_id, request_id)
     return request_id
 
 def get_open_change_requests():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT cr.id, cr.document_id, cr.created_by, cr.status, 
-               v_base.content_markdown as base_content, 
-               v_prop.content_markdown as proposed_content
-        FROM change_requests cr
-        JOIN document_versions v_base ON cr.base_version_id = v_base.id
-        JOIN document_versions v_prop ON cr.proposed_version_id = v_prop.id
-        WHERE cr.status = 'in_review'
+    # Metadata only; load the texts with get_change_request_content() when a request is opened.
+    return _pool.fetchall("""
+        SELECT id, document_id, created_by, status, base_version_id, proposed_version_id
+        FROM change_requests
+        WHERE status = 'in_review'
     """)
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
 
-def update_change_request_status(request_id, status, user_id):
+def get_version_content(version_id):
+    """Returns the full text of a document version (versions are immutable)."""
+    return _load_version(get_connection(), version_id)
+
+def get_change_request_content(request_id):
+    """Returns (base_content, proposed_content) for a change request, or None if it does not exist."""
     conn = get_connection()
-    cursor = conn.cursor()
-    
-    if status == 'merged':
-        cursor.execute("UPDATE change_requests SET status = ?, merged_by = ?, merged_at = ? WHERE id = ?",
-                       (status, user_id, datetime.now().isoformat(), request_id))
-    else:
-        cursor.execute("UPDATE change_requests SET status = ? WHERE id = ?", (status, request_id))
-        
-    conn.commit()
-    conn.close()
-    
-    log_audit(f"update_request_{status}", user_id, request_id)
+    row = conn.execute("SELECT base_version_id, proposed_version_id FROM change_requests WHERE id = ?",
+                       (request_id,)).fetchone()
+    if row is None:
+        return None
+    return _load_version(conn, row["base_version_id"]), _load_version(conn, row["proposed_version_id"])
+
+def update_change_request_status(request_id, status, user_id):
+    with _pool.write() as conn:
+        if status == 'merged':
+            conn.execute("UPDATE change_requests SET status = ?, merged_by = ?, merged_at = ? WHERE id = ?",
+                         (status, user_id, datetime.now().isoformat(), request_id))
+        else:
+            conn.execute("UPDATE change_requests SET status = ? WHERE id = ?", (status, request_id))
+        log_audit(f"update_request_{status}", user_id, request_id)
@@ -0,0 +1,419 @@
+"""
+Precomputed image variants for the gallery and project pages.
+
+pages/gallery.py used to open every full-resolution photo with Pillow,
+thumbnail it and re-encode it as JPEG on each cold process start
+(gallery/dmv.jpg alone is 3 MB), and pages/projects.py base64-inlined every
+figure of a project on each view. Images are now decoded once per source
+file, off the request path:
+
+  * each source is keyed by a hash of its bytes, and its variants live in
+    IMAGE_VARIANT_DIR/<hash>/ — one WebP plus one JPEG (PNG when the source
+    has transparency) per width in IMAGE_VARIANT_WIDTHS, never upscaled;
+  * manifest.json records, per source path, its mtime/size, hash, original
+    dimensions and the variant files (or the error that stopped it from
+    rendering, so a broken file is not retried until it changes). A source
+    whose mtime and size match is never re-read, so page startup is one JSON
+    read plus a stat per image;
+  * ensure() never renders on the request path. Missing or changed sources
+    are handed to a background thread that runs this module's CLI (which
+    renders in a process pool) with a timeout; until their variants exist,
+    pages are served the original file, hard-linked into originals/;
+  * variant directories no longer referenced by the manifest are removed.
+
+The directory is a disposable cache (ignored by git), so a fresh deploy
+starts empty. Build it as a deploy step, before the first visitor, with:
+    python -m utils.image_variants gallery data/projects/images
+
+Variant files are content-addressed, so their /app/static/ URLs never
+change meaning and browsers can cache them across visits.
+
+Usage:
+    store = get_variant_store()
+    entries = store.ensure(paths)                      # {path: entry}
+    store.url(entries[path]["variants"][-1]["jpeg"])   # largest fallback
+    store.srcset(entries[path], "webp")                # "…/400.webp 400w, …"
+"""
+import hashlib
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from config.app_config import (
+    IMAGE_VARIANT_BUILD_TIMEOUT_SECONDS, IMAGE_VARIANT_DIR, IMAGE_VARIANT_QUALITY, IMAGE_VARIANT_WIDTHS,
+)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+MANIFEST_NAME = "manifest.json"
+ORIGINALS_DIR = "originals"
+MANIFEST_VERSION = 1
+_RESULT_KEYS = ("hash", "width", "height", "variants")
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _original_name(key):
+    """Stable ORIGINALS_DIR file name for a source path key."""
+    ext = os.path.splitext(key)[1].lower()
+    return f"{ORIGINALS_DIR}/{hashlib.sha1(key.encode()).hexdigest()[:16]}{ext}"
+
+
+def _render(path, digest, root, widths, quality):
+    """Write every variant of one source image. Runs in a worker process."""
+    out_dir = os.path.join(root, digest)
+    os.makedirs(out_dir, exist_ok=True)
+    with Image.open(path) as img:
+        orig_w, orig_h = img.size
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        img = img.convert("RGBA" if has_alpha else "RGB")
+        fallback = "png" if has_alpha else "jpg"
+        targets = [w for w in widths if w < orig_w] + [min(orig_w, max(widths))]
+        variants = []
+        for width in sorted(set(targets)):
+            height = max(1, round(orig_h * width / orig_w))
+            resized = img if width == orig_w else img.resize((width, height), Image.LANCZOS)
+            webp_name = f"{digest}/{width}.webp"
+            fallback_name = f"{digest}/{width}.{fallback}"
+            resized.save(os.path.join(root, webp_name), format="WEBP", quality=quality, method=4)
+            if has_alpha:
+                resized.save(os.path.join(root, fallback_name), format="PNG", optimize=True)
+            else:
+                resized.save(os.path.join(root, fallback_name), format="JPEG", quality=quality,
+                             optimize=True, progressive=True)
+            variants.append({"width": width, "height": height, "webp": webp_name, "jpeg": fallback_name})
+    return {"hash": digest, "width": orig_w, "height": orig_h, "variants": variants}
+
+
+class VariantStore:
+    """Manifest of precomputed variants under `root` (see module docstring)."""
+
+    def __init__(self, root=IMAGE_VARIANT_DIR, widths=IMAGE_VARIANT_WIDTHS, quality=IMAGE_VARIANT_QUALITY):
+        self.root = root
+        self.widths = tuple(widths)
+        self.quality = quality
+        self.version = 0                  # bumped whenever a background build lands
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._queued = set()              # stale paths waiting for the background build
+        self._building = set()            # paths the running build was started with
+        self._timed_out = {}              # path -> (mtime_ns, size) of sources whose build timed out
+        self._unservable = {}             # path -> (mtime_ns, size) of sources that are not images
+        self._builder = None
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MANIFEST_NAME)
+
+    def _load(self):
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path, encoding="utf-8") as f:
+                    data = json.load(f)
+                valid = data.get("version") == MANIFEST_VERSION and data.get("widths") == list(self.widths)
+                self._manifest = data["sources"] if valid else {}
+            except (OSError, ValueError, KeyError):
+                self._manifest = {}
+        return self._manifest
+
+    def _save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "widths": list(self.widths), "sources": self._manifest},
+                      f, indent=1, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    @staticmethod
+    def _key(path):
+        return os.path.relpath(path).replace(os.sep, "/")
+
+    def _has_files(self, entry):
+        return "variants" in entry and all(
+            os.path.exists(self.path(v["webp"])) and os.path.exists(self.path(v["jpeg"]))
+            for v in entry["variants"]
+        )
+
+    def _is_current(self, entry, stat):
+        """Entry matches the source's mtime/size and is either rendered or a recorded failure."""
+        return (
+            entry is not None
+            and entry.get("mtime_ns") == stat.st_mtime_ns
+            and entry.get("size") == stat.st_size
+            and ("error" in entry or self._has_files(entry))
+        )
+
+    def _lookup(self, paths):
+        """
+        Split `paths` into {path: rendered entry}, {path: stat} of stale
+        sources and {path: stat} of sources whose current version failed.
+        """
+        manifest = self._load()
+        entries, stale, failed = {}, {}, {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                print(f"[ImageVariants] Skipping {path}: {e}")
+                continue
+            entry = manifest.get(self._key(path))
+            if not self._is_current(entry, stat):
+                stale[path] = stat
+            elif "error" in entry:
+                failed[path] = stat
+            else:
+                entries[path] = entry
+        return entries, stale, failed
+
+    def ensure(self, paths):
+        """
+        Return {path: entry} for every readable image in `paths`, without
+        ever decoding or rendering on the caller's thread. Sources whose
+        variants are missing or out of date get a provisional entry that
+        serves the original file and are queued for a background build;
+        sources that failed to render keep serving the original until they
+        change.
+        """
+        with self._lock:
+            entries, stale, failed = self._lookup(paths)
+            for path, stat in stale.items():
+                if self._timed_out.get(path) == (stat.st_mtime_ns, stat.st_size):
+                    failed[path] = stat
+                elif path not in self._building:
+                    self._queued.add(path)
+            if self._queued and (self._builder is None or not self._builder.is_alive()):
+                self._builder = threading.Thread(target=self._build_in_background,
+                                                 name="image-variants", daemon=True)
+                self._builder.start()
+            for path, stat in {**stale, **failed}.items():
+                entry = self._provisional(path, stat)
+                if entry is not None:
+                    entries[path] = entry
+            return entries
+
+    def _build_in_background(self):
+        """
+        Run `python -m utils.image_variants` on the queued paths until the
+        queue is empty. Streamlit runs page scripts as __main__, which pool
+        workers spawned from the server would re-execute, so rendering
+        happens in a child interpreter.
+        """
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [_REPO_ROOT, env.get("PYTHONPATH")]))
+        while True:
+            with self._lock:
+                self._building = set(self._queued)
+                self._queued.clear()
+                if not self._building:
+                    return
+            paths = sorted(self._building)
+            # Own session, so a timeout also stops the CLI's pool workers.
+            proc = subprocess.Popen([sys.executable, "-m", "utils.image_variants", *paths], env=env,
+                                    start_new_session=(os.name == "posix"))
+            try:
+                proc.wait(timeout=IMAGE_VARIANT_BUILD_TIMEOUT_SECONDS)
+            except subprocess.TimeoutExpired:
+                if os.name == "posix":
+                    os.killpg(proc.pid, signal.SIGKILL)
+                else:
+                    proc.kill()
+                proc.wait()
+                print(f"[ImageVariants] Build of {len(paths)} image(s) timed out; serving originals")
+                with self._lock:
+                    for path in paths:
+                        try:
+                            stat = os.stat(path)
+                            self._timed_out[path] = (stat.st_mtime_ns, stat.st_size)
+                        except OSError:
+                            pass
+            with self._lock:
+                self._manifest = None
+                self.version += 1
+
+    def _provisional(self, path, stat):
+        """
+        Entry serving the source file itself (hard-linked, or copied, into
+        ORIGINALS_DIR so static serving can reach it). Only the header is
+        read, for the dimensions. None if the file is not a readable image.
+        """
+        if self._unservable.get(path) == (stat.st_mtime_ns, stat.st_size):
+            return None
+        key = self._key(path)
+        name = _original_name(key)
+        target = self.path(name)
+        try:
+            with Image.open(path) as img:
+                width, height = img.size
+            current = os.stat(target) if os.path.exists(target) else None
+            if current is None or (current.st_mtime_ns, current.st_size) != (stat.st_mtime_ns, stat.st_size):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                tmp = target + ".tmp"
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                try:
+                    os.link(path, tmp)
+                except OSError:
+                    shutil.copy2(path, tmp)
+                os.replace(tmp, target)
+        except Exception as e:
+            print(f"[ImageVariants] Cannot serve {path}: {e}")
+            self._unservable[path] = (stat.st_mtime_ns, stat.st_size)
+            return None
+        return {
+            "width": width, "height": height, "provisional": True,
+            "variants": [{"width": width, "height": height, "webp": None, "jpeg": name}],
+        }
+
+    def build(self, paths, workers=None):
+        """
+        Render the variants of new or changed sources in a process pool and
+        update the manifest; sources that fail are recorded with their error
+        so they are not retried until they change. Returns {path: entry} of
+        rendered sources; call it only from an import-safe __main__ (the CLI
+        below).
+        """
+        with self._lock:
+            self._manifest = None
+            entries, stale, _ = self._lookup(paths)
+            if not stale:
+                return entries
+
+            # Identical bytes under a new name or mtime reuse the rendered files.
+            rendered = {e["hash"]: e for e in self._manifest.values() if self._has_files(e)}
+            pending = {}
+            for path, stat in stale.items():
+                digest = _hash_file(path)
+                if digest in rendered:
+                    known = rendered[digest]
+                    self._record(path, stat, {k: known[k] for k in _RESULT_KEYS}, entries)
+                else:
+                    pending[path] = digest
+
+            results, errors = self._render_all(pending, workers)
+            for path, result in results.items():
+                self._record(path, stale[path], result, entries)
+            for path, error in errors.items():
+                self._record(path, stale[path], {"error": error}, {})
+            self._prune()
+            self._save()
+            return entries
+
+    def _render_all(self, pending, workers):
+        """Render `pending` ({path: digest}). Returns ({path: result}, {path: error message})."""
+        results, errors = {}, {}
+        if not pending:
+            return results, errors
+        print(f"[ImageVariants] Rendering variants for {len(pending)} image(s)")
+        jobs = {path: (path, digest, self.root, self.widths, self.quality) for path, digest in pending.items()}
+        if len(jobs) == 1:
+            (path, args), = jobs.items()
+            self._collect(results, errors, path, lambda: _render(*args))
+            return results, errors
+        with ProcessPoolExecutor(max_workers=min(len(jobs), workers or os.cpu_count() or 1)) as pool:
+            futures = {path: pool.submit(_render, *args) for path, args in jobs.items()}
+            for path, future in futures.items():
+                self._collect(results, errors, path, future.result)
+        return results, errors
+
+    @staticmethod
+    def _collect(results, errors, path, run):
+        try:
+            results[path] = run()
+        except Exception as e:
+            print(f"[ImageVariants] Error rendering {path}: {e}")
+            errors[path] = str(e) or type(e).__name__
+
+    def _record(self, path, stat, result, entries):
+        entry = dict(result, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        self._manifest[self._key(path)] = entry
+        if "error" not in entry:
+            entries[path] = entry
+
+    def _prune(self):
+        """Forget deleted sources and remove variant directories and originals nothing refers to."""
+        for key in [k for k in self._manifest if not os.path.exists(k)]:
+            del self._manifest[key]
+            original = self.path(_original_name(key))
+            if os.path.exists(original):
+                os.remove(original)
+        if not os.path.isdir(self.root):
+            return
+        live = {e["hash"] for e in self._manifest.values() if "hash" in e}
+        for name in os.listdir(self.root):
+            full = os.path.join(self.root, name)
+            if os.path.isdir(full) and name not in live and name != ORIGINALS_DIR:
+                shutil.rmtree(full, ignore_errors=True)
+
+    def path(self, relative):
+        """Filesystem path of a variant file named in a manifest entry."""
+        return os.path.join(self.root, relative)
+
+    def url(self, relative, base_url_path=""):
+        """
+        Browser URL of a variant file, served by Streamlit's static file
+        serving (server.enableStaticServing) under /app/static/. Pass
+        server.baseUrlPath when the app is not served from the site root.
+        """
+        served = os.path.relpath(self.path(relative), "static").replace(os.sep, "/")
+        prefix = "/" + base_url_path.strip("/") if base_url_path.strip("/") else ""
+        return f"{prefix}/app/static/{served}"
+
+    def srcset(self, entry, kind="webp", base_url_path=""):
+        """
+        `srcset` attribute value listing every width of one format ("webp"
+        or "jpeg"); empty when the entry has none (a provisional original).
+        """
+        return ", ".join(f"{self.url(v[kind], base_url_path)} {v['width']}w"
+                         for v in entry["variants"] if v.get(kind))
+
+
+def list_images(directory):
+    """Sorted image files directly inside `directory`."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, f) for f in os.listdir(directory)
+        if f.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_variant_store() -> VariantStore:
+    """The process-wide VariantStore."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = VariantStore()
+    return _store
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Precompute resized image variants")
+    parser.add_argument("paths", nargs="*", default=["gallery", os.path.join("data", "projects", "images")],
+                        help="image files or directories of images")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    files = [f for p in args.paths for f in (list_images(p) if os.path.isdir(p) else [p])]
+    entries = get_variant_store().build(files, workers=args.workers)
+    print(f"[ImageVariants] {len(entries)}/{len(files)} images ready in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,161 @@
+"""
+Compact line deltas between two versions of a text document.
+
+Guestbook change requests store the proposed version of a document as a
+delta against its (content-addressed) base, instead of a second full copy.
+A delta is the list of line ranges of `base` that change and the text that
+replaces each, JSON-encoded and zlib-compressed:
+
+    [[start, end, "replacement lines..."], ...]   # base lines [start, end)
+
+Unchanged lines are implied, so a one-word edit to a long document costs a
+few dozen bytes. Lines keep their endings, so apply(base, encode(base, t))
+== t exactly.
+
+opcodes() is the line diff behind both the deltas and the guestbook's HTML
+diff view. It is a patience diff over hashed lines: every distinct line is
+mapped to an int once, common prefixes/suffixes are trimmed, and lines that
+occur exactly once on both sides anchor the alignment (longest increasing
+subsequence). Only the short gaps between anchors fall back to
+difflib.SequenceMatcher, so long documents with scattered edits diff in
+near-linear time.
+"""
+import bisect
+import difflib
+import json
+import zlib
+
+
+def compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def decompress(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def _unique_anchors(a, b, alo, ahi, blo, bhi):
+    """(i, j) pairs of lines unique on both sides, longest increasing run in j."""
+    seen_a, seen_b = {}, {}
+    for i in range(alo, ahi):
+        seen_a[a[i]] = -1 if a[i] in seen_a else i
+    for j in range(blo, bhi):
+        seen_b[b[j]] = -1 if b[j] in seen_b else j
+    pairs = sorted((i, seen_b[line]) for line, i in seen_a.items()
+                   if i >= 0 and seen_b.get(line, -1) >= 0)
+    # Patience sorting: tails[k] is the smallest j ending an increasing run of length k+1.
+    tails, tail_idx, prev = [], [], [None] * len(pairs)
+    for n, (_, j) in enumerate(pairs):
+        k = bisect.bisect_left(tails, j)
+        if k == len(tails):
+            tails.append(j)
+            tail_idx.append(n)
+        else:
+            tails[k] = j
+            tail_idx[k] = n
+        prev[n] = tail_idx[k - 1] if k else None
+    anchors, n = [], tail_idx[-1] if tail_idx else None
+    while n is not None:
+        anchors.append(pairs[n])
+        n = prev[n]
+    return anchors[::-1]
+
+
+def _matching_blocks(a, b):
+    blocks = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            blocks.append((alo, blo, 1))
+            alo, blo = alo + 1, blo + 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi, bhi = ahi - 1, bhi - 1
+            blocks.append((ahi, bhi, 1))
+        if alo == ahi or blo == bhi:
+            continue
+        anchors = _unique_anchors(a, b, alo, ahi, blo, bhi)
+        if not anchors:
+            matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            blocks.extend((alo + i, blo + j, size) for i, j, size in matcher.get_matching_blocks() if size)
+            continue
+        for i, j in anchors:
+            stack.append((alo, i, blo, j))
+            blocks.append((i, j, 1))
+            alo, blo = i + 1, j + 1
+        stack.append((alo, ahi, blo, bhi))
+    blocks.sort()
+    merged = []
+    for i, j, size in blocks:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1] = (merged[-1][0], merged[-1][1], merged[-1][2] + size)
+        else:
+            merged.append((i, j, size))
+    return merged
+
+
+def opcodes(a_lines, b_lines):
+    """difflib-style (tag, i1, i2, j1, j2) opcodes turning a_lines into b_lines."""
+    ids = {}
+    a = [ids.setdefault(line, len(ids)) for line in a_lines]
+    b = [ids.setdefault(line, len(ids)) for line in b_lines]
+    ops, i, j = [], 0, 0
+    for ai, bj, size in _matching_blocks(a, b) + [(len(a), len(b), 0)]:
+        if i < ai and j < bj:
+            ops.append(("replace", i, ai, j, bj))
+        elif i < ai:
+            ops.append(("delete", i, ai, j, bj))
+        elif j < bj:
+            ops.append(("insert", i, ai, j, bj))
+        i, j = ai + size, bj + size
+        if size:
+            ops.append(("equal", ai, i, bj, j))
+    return ops
+
+
+def grouped_opcodes(ops, context=3):
+    """Split opcodes into hunks with up to `context` equal lines around each change."""
+    if not ops or (len(ops) == 1 and ops[0][0] == "equal"):
+        return []
+    ops = list(ops)
+    if ops[0][0] == "equal":
+        tag, i1, i2, j1, j2 = ops[0]
+        ops[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    if ops[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = ops[-1]
+        ops[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+    groups, group = [], []
+    for tag, i1, i2, j1, j2 in ops:
+        if tag == "equal" and i2 - i1 > 2 * context:
+            group.append((tag, i1, i1 + context, j1, j1 + context))
+            groups.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        groups.append(group)
+    return groups
+
+
+def encode(base: str, target: str) -> bytes:
+    """Delta that turns `base` into `target`."""
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    ops = [
+        [i1, i2, "".join(target_lines[j1:j2])]
+        for tag, i1, i2, j1, j2 in opcodes(base_lines, target_lines)
+        if tag != "equal"
+    ]
+    return compress(json.dumps(ops, separators=(",", ":"), ensure_ascii=False))
+
+
+def apply(base: str, delta: bytes) -> str:
+    """Rebuild the target text from `base` and a delta produced by encode()."""
+    base_lines = base.splitlines(keepends=True)
+    out, pos = [], 0
+    for start, end, replacement in json.loads(decompress(delta)):
+        out.extend(base_lines[pos:start])
+        out.append(replacement)
+        pos = end
+    out.extend(base_lines[pos:])
+    return "".join(out)
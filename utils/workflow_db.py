@@ -3,29 +3,68 @@ Workflow Intelligence database layer.
 
 Manages SQLite persistence for visitor feedback concerns, backlog candidates,
 and the admin activity log. Mirrors the pattern used in guestbook_db.py.
+Connections come from a shared WAL-mode pool (utils/db_pool.py). Concern,
+status and activity writes are queued and committed in batches off the
+request path (utils/write_behind.py); every read flushes the queue first.
 """
-import sqlite3
 import os
 import uuid
 from datetime import datetime
+from functools import partial
+
+from utils.db_pool import SQLitePool
+from utils.write_behind import WriteBehindQueue
 
 DB_DIR = os.path.join("data", "db")
 DB_PATH = os.path.join(DB_DIR, "workflow.db")
 
+_pool = SQLitePool(DB_PATH)
+_writes = WriteBehindQueue(_pool, name="workflow")
+
+# Rows per Review Dashboard page.
+PAGE_SIZE = 50
+
+# Schema migrations, applied once each by init_db() (see SQLitePool.migrate).
+# Append new entries; never edit or reorder applied ones.
+_MIGRATIONS = [
+    # 1. Indexes for the dashboard's status filters, newest-first ordering,
+    #    keyset pagination (id breaks created_at ties) and the audit log join.
+    (
+        "CREATE INDEX IF NOT EXISTS idx_concerns_status_created ON feedback_concerns (status, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_concerns_created ON feedback_concerns (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_backlog_created ON backlog_candidates (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_activity_timestamp ON activity_log (timestamp, id)",
+        "CREATE INDEX IF NOT EXISTS idx_activity_concern ON activity_log (concern_id)",
+    ),
+    # 2. Pre-aggregated concern counts for the Metrics tab, backfilled from
+    #    existing rows and kept current by the concern write helpers.
+    (
+        """CREATE TABLE IF NOT EXISTS concern_metrics (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID""",
+        *(
+            f"""INSERT OR REPLACE INTO concern_metrics (dimension, value, count)
+                SELECT '{dimension}', COALESCE({expr}, ''), COUNT(*) FROM feedback_concerns GROUP BY 2"""
+            for dimension, expr in (
+                ("category", "concern_category"),
+                ("status", "status"),
+                ("workflow_stage", "workflow_stage"),
+                ("day", "substr(created_at, 1, 10)"),
+            )
+        ),
+    ),
+]
+
 def get_connection():
-    """Return a sqlite3 connection, creating the DB directory if needed."""
-    if not os.path.exists(DB_DIR):
-        os.makedirs(DB_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Return this thread's pooled connection (do not close it)."""
+    return _pool.connection()
 
 def init_db():
     """Create all tables if they do not already exist."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.executescript('''
+    get_connection().executescript('''
         CREATE TABLE IF NOT EXISTS feedback_concerns (
             id TEXT PRIMARY KEY,
             original_quote TEXT,
@@ -64,20 +103,50 @@ def init_db():
             timestamp TEXT
         );
     ''')
-    conn.commit()
-    conn.close()
+    _pool.migrate(_MIGRATIONS)
 
-def insert_concern(concern_data: dict, original_quote: str) -> str:
-    """Persist a new concern and return its UUID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    concern_id = str(uuid.uuid4())
-    cursor.execute("""
+def _read(sql, params=()) -> list[dict]:
+    """Run a read query after committing any queued writes (read-your-writes)."""
+    _writes.flush()
+    return _pool.fetchall(sql, params)
+
+def failed_writes() -> list[dict]:
+    """Queued writes that could not be committed (see WriteBehindQueue.dead_letters)."""
+    _writes.flush()
+    return _writes.dead_letters()
+
+def _split_page(rows, limit, order_key):
+    """Trim a LIMIT limit+1 result to one page and build the cursor for the next."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1][order_key], rows[-1]["id"])
+
+def _bump_metrics(conn, counts: dict, delta: int) -> None:
+    """Add `delta` to the concern_metrics row of each (dimension, value) in `counts`."""
+    conn.executemany("""
+        INSERT INTO concern_metrics (dimension, value, count) VALUES (?, ?, ?)
+        ON CONFLICT (dimension, value) DO UPDATE SET count = count + excluded.count
+    """, [(dimension, value or "", delta) for dimension, value in counts.items()])
+
+def _insert_concern(conn, row: tuple) -> None:
+    conn.execute("""
         INSERT INTO feedback_concerns (
             id, original_quote, concern_category, workflow_stage, 
             affected_role, likely_root_cause, existing_tool_match, status, created_at
         ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+    """, row)
+    _bump_metrics(conn, {
+        "category": row[2],
+        "status": row[7],
+        "workflow_stage": row[3],
+        "day": row[8][:10],
+    }, 1)
+
+def insert_concern(concern_data: dict, original_quote: str) -> str:
+    """Queue a new concern for persistence (see utils/write_behind.py) and return its UUID."""
+    concern_id = str(uuid.uuid4())
+    row = (
         concern_id,
         original_quote,
         concern_data.get("category", ""),
@@ -87,119 +156,149 @@ def insert_concern(concern_data: dict, original_quote: str) -> str:
         concern_data.get("tool_match", ""),
         "unresolved",
         datetime.now().isoformat()
-    ))
-    conn.commit()
-    conn.close()
+    )
+    _writes.submit(partial(_insert_concern, row=row))
     return concern_id
 
 def get_unresolved_concerns() -> list[dict]:
     """Return all concerns with status 'unresolved', newest first."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM feedback_concerns WHERE status = 'unresolved' ORDER BY created_at DESC")
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    return _read("SELECT * FROM feedback_concerns WHERE status = 'unresolved' ORDER BY created_at DESC")
 
 def get_all_concerns() -> list[dict]:
     """Return all concerns regardless of status, newest first."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM feedback_concerns ORDER BY created_at DESC")
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    return _read("SELECT * FROM feedback_concerns ORDER BY created_at DESC")
+
+def _insert_activity(conn, row: tuple) -> None:
+    conn.execute("INSERT INTO activity_log (id, action, concern_id, note, timestamp) VALUES (?, ?, ?, ?, ?)", row)
 
 def log_activity(action, concern_id, note=""):
-    """Logs an action to the activity_log table."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO activity_log (id, action, concern_id, note, timestamp) VALUES (?, ?, ?, ?, ?)",
-        (str(uuid.uuid4()), action, concern_id, note, datetime.now().isoformat())
-    )
-    conn.commit()
-    conn.close()
+    """Queues an action for the activity_log table."""
+    row = (str(uuid.uuid4()), action, concern_id, note, datetime.now().isoformat())
+    _writes.submit(partial(_insert_activity, row=row))
+
+def _update_status(conn, concern_id: str, status: str, activity: tuple) -> None:
+    row = conn.execute("SELECT status FROM feedback_concerns WHERE id = ?", (concern_id,)).fetchone()
+    conn.execute("UPDATE feedback_concerns SET status = ? WHERE id = ?", (status, concern_id))
+    if row is not None and row["status"] != status:
+        _bump_metrics(conn, {"status": row["status"]}, -1)
+        _bump_metrics(conn, {"status": status}, 1)
+    _insert_activity(conn, activity)
+
+def _set_status(concern_id: str, status: str, note: str) -> None:
+    """Queue a status change; it commits with its status counts and activity log row."""
+    activity = (str(uuid.uuid4()), status, concern_id, note, datetime.now().isoformat())
+    _writes.submit(partial(_update_status, concern_id=concern_id, status=status, activity=activity))
 
 def mark_concern_resolved(concern_id: str) -> None:
     """Mark a concern as solved and log the action."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE feedback_concerns SET status = 'solved' WHERE id = ?", (concern_id,))
-    conn.commit()
-    conn.close()
-    log_activity("solved", concern_id, "Manually marked as solved by Admin.")
+    _set_status(concern_id, "solved", "Manually marked as solved by Admin.")
 
 def discard_concern(concern_id: str, reason: str = "") -> None:
     """Mark a concern as discarded with an optional reason and log the action."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE feedback_concerns SET status = 'discarded' WHERE id = ?", (concern_id,))
-    conn.commit()
-    conn.close()
-    log_activity("discarded", concern_id, reason or "Discarded by Admin.")
+    _set_status(concern_id, "discarded", reason or "Discarded by Admin.")
 
 def mark_concern_accepted(concern_id: str, backlog_id: str) -> None:
     """Mark a concern as accepted to the backlog and log the link."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE feedback_concerns SET status = 'accepted_to_backlog' WHERE id = ?", (concern_id,))
-    conn.commit()
-    conn.close()
-    log_activity("accepted_to_backlog", concern_id, f"Linked to backlog candidate {backlog_id[:8]}.")
+    _set_status(concern_id, "accepted_to_backlog", f"Linked to backlog candidate {backlog_id[:8]}.")
 
 def get_activity_log() -> list[dict]:
     """Return all audit log entries joined with their source concern, newest first."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+    return _read("""
         SELECT al.*, fc.original_quote, fc.concern_category
         FROM activity_log al
         LEFT JOIN feedback_concerns fc ON al.concern_id = fc.id
         ORDER BY al.timestamp DESC
     """)
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
 
 def insert_backlog_candidate(candidate_data: dict) -> str:
     """Persist a new backlog candidate and return its UUID."""
-    conn = get_connection()
-    cursor = conn.cursor()
     candidate_id = str(uuid.uuid4())
-    cursor.execute("""
-        INSERT INTO backlog_candidates (
-            id, title, problem, original_evidence, workflow_stage, 
-            user_group, existing_tool_check, hypothesized_root_causes, 
-            impact, risk, suggested_validation, potential_mvp, 
-            acceptance_criteria, status, created_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        candidate_id,
-        candidate_data.get("title", ""),
-        candidate_data.get("problem", ""),
-        candidate_data.get("original_evidence", ""),
-        candidate_data.get("workflow_stage", ""),
-        candidate_data.get("user_group", ""),
-        candidate_data.get("existing_tool_check", ""),
-        candidate_data.get("hypothesized_root_causes", ""),
-        candidate_data.get("impact", ""),
-        candidate_data.get("risk", ""),
-        candidate_data.get("suggested_validation", ""),
-        candidate_data.get("potential_mvp", ""),
-        candidate_data.get("acceptance_criteria", ""),
-        "draft",
-        datetime.now().isoformat()
-    ))
-    conn.commit()
-    conn.close()
+    with _pool.write() as conn:
+        conn.execute("""
+            INSERT INTO backlog_candidates (
+                id, title, problem, original_evidence, workflow_stage, 
+                user_group, existing_tool_check, hypothesized_root_causes, 
+                impact, risk, suggested_validation, potential_mvp, 
+                acceptance_criteria, status, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            candidate_id,
+            candidate_data.get("title", ""),
+            candidate_data.get("problem", ""),
+            candidate_data.get("original_evidence", ""),
+            candidate_data.get("workflow_stage", ""),
+            candidate_data.get("user_group", ""),
+            candidate_data.get("existing_tool_check", ""),
+            candidate_data.get("hypothesized_root_causes", ""),
+            candidate_data.get("impact", ""),
+            candidate_data.get("risk", ""),
+            candidate_data.get("suggested_validation", ""),
+            candidate_data.get("potential_mvp", ""),
+            candidate_data.get("acceptance_criteria", ""),
+            "draft",
+            datetime.now().isoformat()
+        ))
     return candidate_id
 
 def get_backlog_candidates() -> list[dict]:
     """Return all backlog candidates, newest first."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM backlog_candidates ORDER BY created_at DESC")
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    return _read("SELECT * FROM backlog_candidates ORDER BY created_at DESC")
+
+
+# ── Keyset-paginated reads (Review Dashboard) ────────────────────────────────
+# Each returns (rows, next_cursor), newest first. Pass next_cursor back as
+# `after` to get the following page; it is None on the last page. Cursors are
+# (sort value, id) pairs, so a page costs the same however deep it is.
+
+def get_concerns_page(status: str | None = None, after: tuple | None = None,
+                      limit: int = PAGE_SIZE) -> tuple[list[dict], tuple | None]:
+    """Return one page of concerns, optionally filtered by status."""
+    clauses, params = [], []
+    if status is not None:
+        clauses.append("status = ?")
+        params.append(status)
+    if after is not None:
+        clauses.append("(created_at, id) < (?, ?)")
+        params.extend(after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = _read(
+        f"SELECT * FROM feedback_concerns {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+        (*params, limit + 1)
+    )
+    return _split_page(rows, limit, "created_at")
+
+def get_backlog_candidates_page(after: tuple | None = None,
+                                limit: int = PAGE_SIZE) -> tuple[list[dict], tuple | None]:
+    """Return one page of backlog candidates."""
+    where = "WHERE (created_at, id) < (?, ?)" if after is not None else ""
+    rows = _read(
+        f"SELECT * FROM backlog_candidates {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+        (*(after or ()), limit + 1)
+    )
+    return _split_page(rows, limit, "created_at")
+
+def get_activity_log_page(after: tuple | None = None,
+                          limit: int = PAGE_SIZE) -> tuple[list[dict], tuple | None]:
+    """Return one page of audit log entries joined with their source concern."""
+    where = "WHERE (al.timestamp, al.id) < (?, ?)" if after is not None else ""
+    rows = _read(f"""
+        SELECT al.*, fc.original_quote, fc.concern_category
+        FROM activity_log al
+        LEFT JOIN feedback_concerns fc ON al.concern_id = fc.id
+        {where}
+        ORDER BY al.timestamp DESC, al.id DESC
+        LIMIT ?
+    """, (*(after or ()), limit + 1))
+    return _split_page(rows, limit, "timestamp")
+
+
+def get_concern_metrics() -> dict[str, dict[str, int]]:
+    """
+    Return concern counts by dimension ("category", "status", "workflow_stage",
+    "day") from the pre-aggregated concern_metrics table, e.g.
+    {"status": {"unresolved": 12, "solved": 3}, ...}. Zero counts are omitted.
+    """
+    metrics = {"category": {}, "status": {}, "workflow_stage": {}, "day": {}}
+    for row in _read("SELECT dimension, value, count FROM concern_metrics WHERE count > 0"):
+        metrics.setdefault(row["dimension"], {})[row["value"]] = row["count"]
+    return metrics
@@ -0,0 +1,139 @@
+"""
+Write-behind queue for fire-and-forget SQLite inserts.
+
+insert_concern, log_activity and log_audit used to commit (and fsync)
+inside the user-facing request: a chat turn that auto-submits a concern
+waited on the disk before its answer rendered. Callers now hand the write
+to a WriteBehindQueue and return immediately:
+
+  * one background thread per database drains the queue, grouping every
+    write that arrives within WRITE_BEHIND_FLUSH_SECONDS (up to
+    WRITE_BEHIND_MAX_BATCH) into a single transaction — one commit for many
+    rows;
+  * if a grouped transaction fails, its writes are retried one by one, so a
+    single bad row cannot drop its neighbours. A write that fails on its own
+    too is logged at error level and kept in dead_letters(), so a caller
+    that already reported success can find out after flush();
+  * flush() blocks until everything submitted so far is committed. Readers
+    call it first (read-your-writes; free when nothing is pending), and an
+    atexit hook calls it so queued rows survive a normal shutdown.
+
+A write is a callable taking the pooled connection; it runs inside the
+batch transaction and must not commit.
+
+Usage:
+    writes = WriteBehindQueue(pool, name="workflow")
+    writes.submit(lambda conn: conn.execute("INSERT ...", params))
+    writes.flush()
+    writes.dead_letters()   # [{"write", "name", "error", "failed_at"}, ...]
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from config.app_config import WRITE_BEHIND_FLUSH_SECONDS, WRITE_BEHIND_MAX_BATCH
+
+logger = logging.getLogger(__name__)
+
+
+def _describe(write):
+    """Readable name of a queued write (usually a functools.partial)."""
+    func = getattr(write, "func", write)
+    name = getattr(func, "__name__", repr(func))
+    keywords = getattr(write, "keywords", None)
+    return f"{name}({', '.join(f'{k}={v!r}' for k, v in keywords.items())})" if keywords else name
+
+
+class WriteBehindQueue:
+    """Batches writes for one SQLitePool on a background thread (see module docstring)."""
+
+    def __init__(self, pool, name="db", flush_interval=WRITE_BEHIND_FLUSH_SECONDS,
+                 max_batch=WRITE_BEHIND_MAX_BATCH):
+        self.pool = pool
+        self.name = name
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._dead_letters = []
+        self._thread = None
+        atexit.register(self.flush, timeout=10)
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True)
+            self._thread.start()
+
+    def submit(self, write):
+        """Queue `write(conn)` for the next batch and return immediately."""
+        with self._lock:
+            self._pending += 1
+            self._ensure_worker()
+        self._queue.put(write)
+
+    def flush(self, timeout=None):
+        """Block until every write submitted before this call is committed."""
+        with self._lock:
+            if self._pending == 0:
+                return True
+            self._ensure_worker()
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def dead_letters(self):
+        """
+        Writes dropped after failing both in their batch and on their own,
+        oldest first: [{"write", "name", "error", "failed_at"}, ...]. Call
+        flush() first to include everything submitted so far.
+        """
+        with self._lock:
+            return list(self._dead_letters)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch, markers = [], []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    markers.append(item)
+                    break   # a flush() is waiting: commit now
+                batch.append(item)
+                if len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+            for marker in markers:
+                marker.set()
+
+    def _commit(self, batch):
+        if not batch:
+            return
+        try:
+            with self.pool.write() as conn:
+                for write in batch:
+                    write(conn)
+        except Exception as e:
+            logger.warning("[WriteBehind:%s] Batch of %d failed (%s); retrying individually",
+                           self.name, len(batch), e)
+            for write in batch:
+                try:
+                    with self.pool.write() as conn:
+                        write(conn)
+                except Exception as e:
+                    name = _describe(write)
+                    logger.error("[WriteBehind:%s] Dropped write %s", self.name, name, exc_info=True)
+                    with self._lock:
+                        self._dead_letters.append(
+                            {"write": write, "name": name, "error": str(e), "failed_at": time.time()}
+                        )
+        finally:
+            with self._lock:
+                self._pending -= len(batch)